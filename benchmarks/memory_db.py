@@ -0,0 +1,229 @@
+"""
+Sustituto en memoria de una base de datos Motor para los benchmarks.
+
+Solo implementa lo que usan los caminos medidos (find con filtros de
+igualdad/$lt/$lte/$gt/$gte/$exists/$in y proyección, find_one, insert_one,
+insert_many, count_documents, find_one_and_update con $set/$inc/$unset y
+bulk_write con UpdateOne). Mantiene un índice de igualdad sobre `id`,
+`accountId` y `_id` como lo haría Mongo con sus índices, de modo que las
+consultas por cuenta no recorren toda la colección.
+"""
+import copy
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+INDEXED_FIELDS = ("id", "accountId")
+
+
+def _stored(value):
+    # Mongo guarda datetimes UTC con precisión de milisegundos y los devuelve naive
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    if isinstance(value, dict):
+        return {k: _stored(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_stored(v) for v in value]
+    return value
+
+
+def _get(doc: dict, path: str):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+_MISSING = object()
+
+_OPERATORS = {
+    "$lt": lambda v, x: v is not _MISSING and v is not None and v < x,
+    "$lte": lambda v, x: v is not _MISSING and v is not None and v <= x,
+    "$gt": lambda v, x: v is not _MISSING and v is not None and v > x,
+    "$gte": lambda v, x: v is not _MISSING and v is not None and v >= x,
+    "$ne": lambda v, x: v != x,
+    "$in": lambda v, x: v in x,
+    "$exists": lambda v, x: (v is not _MISSING) == bool(x),
+}
+
+
+def _matches(doc: dict, flt: dict) -> bool:
+    for field, condition in flt.items():
+        value = _get(doc, field)
+        if isinstance(condition, dict) and condition and next(iter(condition)).startswith("$"):
+            for op, operand in condition.items():
+                if not _OPERATORS[op](value, _stored(operand)):
+                    return False
+        elif value is _MISSING or value != _stored(condition):
+            return False
+    return True
+
+
+def _project(doc: dict, projection: dict | None) -> dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        out = {k: copy.deepcopy(doc[k]) for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    exclude = {k for k, v in projection.items() if not v}
+    return {k: copy.deepcopy(v) for k, v in doc.items() if k not in exclude}
+
+
+class _Result:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class MemoryCursor:
+    def __init__(self, docs: list[dict], projection: dict | None):
+        self._docs = docs
+        self._projection = projection
+        self._limit = 0
+
+    def sort(self, key: str, direction: int = 1):
+        self._docs.sort(key=lambda d: (_get(d, key) is _MISSING, _get(d, key)), reverse=direction < 0)
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    def __aiter__(self):
+        docs = self._docs[:self._limit] if self._limit else self._docs
+        self._iter = iter(docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return _project(next(self._iter), self._projection)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class MemoryCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: dict[object, dict] = {}
+        self._indexes: dict[str, dict[object, set]] = {field: {} for field in INDEXED_FIELDS}
+
+    # Índices de igualdad
+
+    def _index_add(self, doc: dict) -> None:
+        for field, index in self._indexes.items():
+            if field in doc:
+                index.setdefault(doc[field], set()).add(doc["_id"])
+
+    def _index_remove(self, doc: dict) -> None:
+        for field, index in self._indexes.items():
+            if field in doc:
+                index.get(doc[field], set()).discard(doc["_id"])
+
+    def _candidates(self, flt: dict):
+        if "_id" in flt and not isinstance(flt["_id"], dict):
+            doc = self._docs.get(flt["_id"])
+            return [doc] if doc is not None else []
+        for field, index in self._indexes.items():
+            value = flt.get(field)
+            if value is not None and not isinstance(value, dict):
+                return [self._docs[i] for i in index.get(value, ())]
+        return list(self._docs.values())
+
+    def _select(self, flt: dict) -> list[dict]:
+        return [doc for doc in self._candidates(flt) if _matches(doc, flt)]
+
+    # API Motor
+
+    async def insert_one(self, document: dict):
+        doc = _stored(document)
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self._docs or ("id" in doc and self._indexes["id"].get(doc["id"])):
+            raise DuplicateKeyError("E11000 duplicate key")
+        document.setdefault("_id", doc["_id"])
+        self._docs[doc["_id"]] = doc
+        self._index_add(doc)
+        return _Result(inserted_id=doc["_id"], acknowledged=True)
+
+    async def insert_many(self, documents: list[dict], ordered: bool = True):
+        inserted = []
+        for document in documents:
+            try:
+                inserted.append((await self.insert_one(document)).inserted_id)
+            except DuplicateKeyError:
+                if ordered:
+                    raise
+        return _Result(inserted_ids=inserted, acknowledged=True)
+
+    def find(self, flt: dict | None = None, projection: dict | None = None) -> MemoryCursor:
+        return MemoryCursor(self._select(flt or {}), projection)
+
+    async def find_one(self, flt: dict | None = None, projection: dict | None = None):
+        docs = self._select(flt or {})
+        return _project(docs[0], projection) if docs else None
+
+    async def count_documents(self, flt: dict) -> int:
+        return len(self._select(flt))
+
+    async def find_one_and_update(self, flt: dict, update: dict, projection: dict | None = None,
+                                  upsert: bool = False, return_document=ReturnDocument.BEFORE):
+        docs = self._select(flt)
+        if not docs:
+            if not upsert:
+                return None
+            seed = {k: v for k, v in flt.items() if not isinstance(v, dict)}
+            await self.insert_one(seed)
+            docs = [self._docs[seed["_id"]]]
+        doc = docs[0]
+        before = _project(doc, projection)
+        self._apply(doc, update)
+        return _project(doc, projection) if return_document == ReturnDocument.AFTER else before
+
+    async def update_one(self, flt: dict, update: dict, upsert: bool = False):
+        return await self.bulk_write([UpdateOne(flt, update, upsert=upsert)])
+
+    async def bulk_write(self, requests: list[UpdateOne], ordered: bool = True):
+        matched = 0
+        for request in requests:
+            spec = request._doc
+            docs = self._select(request._filter)
+            if not docs:
+                continue
+            matched += 1
+            self._apply(docs[0], spec)
+        return _Result(matched_count=matched, modified_count=matched)
+
+    def _apply(self, doc: dict, update: dict) -> None:
+        if isinstance(update, list):
+            raise NotImplementedError("pipeline updates are not supported by the stand-in")
+        self._index_remove(doc)
+        for field, value in update.get("$set", {}).items():
+            doc[field] = _stored(value)
+        for field, value in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + value
+        for field in update.get("$unset", {}):
+            doc.pop(field, None)
+        self._index_add(doc)
+
+    async def create_index(self, *args, **kwargs):
+        return kwargs.get("name")
+
+    async def index_information(self) -> dict:
+        return {}
+
+
+class MemoryDatabase:
+    def __init__(self):
+        self._collections: dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+        return self._collections[name]
@@ -0,0 +1,74 @@
+"""
+Benchmark de los limitadores de peticiones en memoria.
+
+Simula tráfico con `--keys-per-second` claves distintas nuevas cada segundo
+(p. ej. un escaneo por IP) repartido entre `--concurrency` corrutinas, y mide
+el rendimiento de `allow()` y las claves (y memoria) retenidas al final.
+Con ventana de 60s ninguna clave caduca durante el benchmark: la diferencia
+en memoria viene del tope `--max-keys` del limitador deslizante.
+
+    PYTHONPATH=src python benchmarks/rate_limiter_bench.py --seconds 5
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from scheduled_payments.core.rate_limiter import InMemoryFixedWindowRateLimiter, SlidingWindowRateLimiter
+
+async def run(limiter, seconds: int, keys_per_second: int, concurrency: int, limit: int) -> dict:
+    per_worker = keys_per_second // concurrency
+
+    async def worker(worker_id: int, second: int):
+        base = f"ip:{second}:{worker_id}:"
+        for i in range(per_worker):
+            # 2 peticiones por clave: una nueva y una repetida
+            await limiter.allow(base + str(i), limit)
+            await limiter.allow(base + str(i), limit)
+
+    started = time.perf_counter()
+    for second in range(seconds):
+        await asyncio.gather(*(worker(w, second) for w in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    retained = len(limiter._buckets)
+
+    requests = seconds * per_worker * concurrency * 2
+    return {
+        "limiter": type(limiter).__name__,
+        "requests": requests,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed),
+        "retained_keys": retained,
+        "retained_memory_mb": round(_deep_size(limiter._buckets) / 1024 / 1024, 1),
+    }
+
+def _deep_size(buckets: dict) -> int:
+    size = sys.getsizeof(buckets)
+    for key, value in buckets.items():
+        size += sys.getsizeof(key) + sys.getsizeof(value)
+        if isinstance(value, (list, tuple)):
+            size += sum(sys.getsizeof(v) for v in value)
+    return size
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=10, help="segundos de tráfico simulados")
+    parser.add_argument("--keys-per-second", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=120)
+    parser.add_argument("--max-keys", type=int, default=100_000)
+    args = parser.parse_args()
+
+    limiters = [
+        InMemoryFixedWindowRateLimiter(60),
+        SlidingWindowRateLimiter(60, max_keys=args.max_keys),
+    ]
+    results = [
+        await run(limiter, args.seconds, args.keys_per_second, args.concurrency, args.limit)
+        for limiter in limiters
+    ]
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
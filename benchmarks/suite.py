@@ -0,0 +1,290 @@
+"""
+Suite de benchmarks del servicio de pagos programados.
+
+Mide, sobre datos sintéticos (ver synthetic.py):
+- load:            carga del dataset (insert_many por lotes)
+- scheduler_scan:  lectura de pagos vencidos + _should_execute (solo lectura)
+- should_execute:  evaluación de due-ness en CPU (_should_execute) por pago
+- upcoming:        find_upcoming_payments_for_account sobre una muestra de cuentas
+- create:          ScheduledPaymentService.create_new_scheduled_payment (secuencial y concurrente)
+
+Por defecto usa un sustituto en memoria (memory_db.py); con --mongo-uri se
+ejecuta contra un Mongo real (la base de datos indicada se borra al empezar).
+
+    PYTHONPATH=src python benchmarks/suite.py --sizes 10000 100000 --output results.json
+    PYTHONPATH=src python benchmarks/suite.py --sizes 10000 --compare results.json
+
+Los resultados (JSON) incluyen la mediana de `--repeats` repeticiones; con
+--compare se muestra la variación respecto a una ejecución anterior y el
+proceso termina con código 1 si algún benchmark empeora más de --max-regression.
+"""
+import os
+
+# La configuración del servicio exige estas variables; para los benchmarks no se usan
+for name, value in {
+    "MONGO_CONNECTION_STRING": "mongodb://localhost:27017",
+    "TRANSFER_SERVICE_URL": "http://transfers.invalid/v1/transactions",
+    "ACCOUNTS_SERVICE_URL": "http://accounts.invalid/v1/accounts/{iban}",
+    "SUBSCRIPTION_BASIC": "1000000",
+    "SUBSCRIPTION_STUDENT": "1000000",
+    "SUBSCRIPTION_PRO": "1000000",
+    "LOG_LEVEL": "WARNING",
+    "LOG_FILE": os.devnull,
+}.items():
+    os.environ.setdefault(name, value)
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from memory_db import MemoryDatabase
+from synthetic import benchmark_now, generate_payments
+
+from scheduled_payments.core.compiled_schedule import Instant
+from scheduled_payments.db.AccountCountersRepository import AccountCountersRepository
+from scheduled_payments.db.ExecutionJobsRepository import ExecutionJobsRepository
+from scheduled_payments.db.ScheduledPaymentsRepository import SCHEDULER_PROJECTION, ScheduledPaymentRepository
+from scheduled_payments.db.indexes import ensure_indexes
+from scheduled_payments.models.ScheduledPayments import ScheduledPaymentCreate
+from scheduled_payments.services.ScheduledPayments_service import ScheduledPaymentService
+
+LOAD_BATCH_SIZE = 5000
+
+
+class BenchmarkService(ScheduledPaymentService):
+    """Servicio sin dependencias HTTP: la suscripción se resuelve en local."""
+    async def _get_account_subscription(self, account_id: str) -> str:
+        return "pro"
+
+
+async def open_database(args):
+    if not args.mongo_uri:
+        return MemoryDatabase(), None
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(args.mongo_uri)
+    await client.drop_database(args.mongo_database)
+    db = client[args.mongo_database]
+    await ensure_indexes(db)
+    return db, client
+
+
+async def load(db, payments: list[dict], now: datetime) -> float:
+    repo = ScheduledPaymentRepository(db)
+    started = time.perf_counter()
+    for offset in range(0, len(payments), LOAD_BATCH_SIZE):
+        docs = []
+        for raw in payments[offset:offset + LOAD_BATCH_SIZE]:
+            payment = ScheduledPaymentCreate.model_validate(raw)
+            doc = payment.model_dump(by_alias=True)
+            doc["nextExecutionAt"] = repo.next_due_at(payment, now)
+            docs.append(doc)
+        await db["scheduled_payments"].insert_many(docs, ordered=False)
+    return time.perf_counter() - started
+
+
+def summarize(name: str, size: int, backend: str, samples: list[float], operations: int, **extra) -> dict:
+    median = statistics.median(samples)
+    return {
+        "benchmark": name,
+        "size": size,
+        "backend": backend,
+        "repeats": len(samples),
+        "median_seconds": round(median, 6),
+        "min_seconds": round(min(samples), 6),
+        "operations": operations,
+        "ops_per_second": round(operations / median, 1) if median > 0 else None,
+        **extra,
+    }
+
+
+async def scan_due_payments(repo: ScheduledPaymentRepository, now: datetime) -> int:
+    """
+    Fixture de solo lectura: recorre los pagos activos vencidos y evalúa
+    `_should_execute`, sin reprogramar ni reclamar nada, para que las
+    repeticiones midan siempre el mismo trabajo.
+    """
+    now = repo._to_utc_aware(now)
+    instant = Instant(now)
+    due = 0
+    cursor = repo.collection.find({"isActive": True, "nextExecutionAt": {"$lte": now}}, SCHEDULER_PROJECTION)
+    async for doc in cursor:
+        if repo._should_execute(repo._construct_view(doc), instant):
+            due += 1
+    return due
+
+
+async def bench_scheduler_scan(db, now: datetime, repeats: int) -> tuple[list[float], int]:
+    repo = ScheduledPaymentRepository(db)
+    samples, due = [], 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        due = await scan_due_payments(repo, now)
+        samples.append(time.perf_counter() - started)
+    return samples, due
+
+
+async def bench_should_execute(db, now: datetime, repeats: int) -> tuple[list[float], int]:
+    repo = ScheduledPaymentRepository(db)
+    views = [
+        repo._construct_view(doc)
+        async for doc in db["scheduled_payments"].find({"isActive": True})
+    ]
+    instant = Instant(now)
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for view in views:
+            repo._should_execute(view, instant)
+        samples.append(time.perf_counter() - started)
+    return samples, len(views)
+
+
+async def bench_upcoming(db, payments: list[dict], now: datetime, repeats: int, accounts: int) -> tuple[list[float], int, dict]:
+    repo = ScheduledPaymentRepository(db)
+    # Muestra determinista que incluye las cuentas con más pagos
+    all_accounts = sorted({p["accountId"] for p in payments})
+    sample = all_accounts[:: max(1, len(all_accounts) // accounts)][:accounts]
+
+    samples, latencies = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for account_id in sample:
+            call_started = time.perf_counter()
+            await repo.find_upcoming_payments_for_account(account_id, now, 10)
+            latencies.append(time.perf_counter() - call_started)
+        samples.append(time.perf_counter() - started)
+
+    latencies.sort()
+    percentiles = {
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+    return samples, len(sample), percentiles
+
+
+async def bench_create(db, now: datetime, count: int, concurrency: int, seed: int) -> tuple[float, float]:
+    service = BenchmarkService(ScheduledPaymentRepository(db), AccountCountersRepository(db), ExecutionJobsRepository(db))
+    creates = [ScheduledPaymentCreate.model_validate(p) for p in generate_payments(2 * count, now, seed=seed)]
+    sequential, concurrent = creates[:count], creates[count:]
+
+    started = time.perf_counter()
+    for data in sequential:
+        await service.create_new_scheduled_payment(data)
+    sequential_seconds = time.perf_counter() - started
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def create(data):
+        async with semaphore:
+            await service.create_new_scheduled_payment(data)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(create(data) for data in concurrent))
+    return sequential_seconds, time.perf_counter() - started
+
+
+async def run_size(args, size: int) -> list[dict]:
+    backend = "mongo" if args.mongo_uri else "memory"
+    now = benchmark_now()
+    payments = generate_payments(size, now, seed=args.seed)
+
+    db, client = await open_database(args)
+    try:
+        results = []
+        load_seconds = await load(db, payments, now)
+        results.append(summarize("load", size, backend, [load_seconds], size))
+
+        samples, due = await bench_scheduler_scan(db, now, args.repeats)
+        results.append(summarize("scheduler_scan", size, backend, samples, size, due_payments=due))
+
+        samples, evaluated = await bench_should_execute(db, now, args.repeats)
+        results.append(summarize("should_execute", size, backend, samples, evaluated))
+
+        samples, sampled, percentiles = await bench_upcoming(db, payments, now, args.repeats, args.upcoming_accounts)
+        results.append(summarize("upcoming", size, backend, samples, sampled, **percentiles))
+
+        count = min(args.creates, size)
+        sequential, concurrent = await bench_create(db, now, count, args.concurrency, args.seed + 1)
+        results.append(summarize("create_sequential", size, backend, [sequential], count))
+        results.append(summarize("create_concurrent", size, backend, [concurrent], count, concurrency=args.concurrency))
+        return results
+    finally:
+        if client is not None:
+            await client.drop_database(args.mongo_database)
+            client.close()
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(current: list[dict], previous_path: str, max_regression: float) -> bool:
+    with open(previous_path, encoding="utf-8") as f:
+        previous = {(r["benchmark"], r["size"], r["backend"]): r for r in json.load(f)["results"]}
+
+    ok = True
+    print(f"{'benchmark':<20} {'size':>8} {'before':>12} {'after':>12} {'change':>8}")
+    for result in current:
+        before = previous.get((result["benchmark"], result["size"], result["backend"]))
+        if before is None:
+            continue
+        change = result["median_seconds"] / before["median_seconds"] - 1 if before["median_seconds"] else 0.0
+        flag = ""
+        if change > max_regression:
+            ok = False
+            flag = "  REGRESSION"
+        print(f"{result['benchmark']:<20} {result['size']:>8} {before['median_seconds']:>12.4f} "
+              f"{result['median_seconds']:>12.4f} {change:>+8.1%}{flag}")
+    return ok
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--upcoming-accounts", type=int, default=200)
+    parser.add_argument("--creates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mongo-uri", help="Mongo real en lugar del sustituto en memoria")
+    parser.add_argument("--mongo-database", default="scheduled_payments_bench")
+    parser.add_argument("--output", help="fichero JSON de resultados")
+    parser.add_argument("--compare", help="resultados JSON de una ejecución anterior")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        print(f"size={size} ...", file=sys.stderr)
+        results.extend(await run_size(args, size))
+
+    report = {"meta": metadata(), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare and not compare(results, args.compare, args.max_regression):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
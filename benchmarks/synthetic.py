@@ -0,0 +1,73 @@
+"""
+Generador de datos sintéticos de pagos programados.
+
+Mezcla por defecto (aprox. la de producción): 20% ONCE, 30% WEEKLY, 50% MONTHLY,
+con un 10% de pagos inactivos y cuentas con distinto volumen (unas pocas
+cuentas "empresa" concentran muchos pagos). Todo es determinista por semilla.
+"""
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+WEEKDAYS = ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY"]
+
+DEFAULT_MIX = {"ONCE": 0.2, "WEEKLY": 0.3, "MONTHLY": 0.5}
+
+
+def account_ids(count: int) -> list[str]:
+    return [f"ES{index:022d}" for index in range(count)]
+
+
+def _schedule(rng: random.Random, frequency: str, now: datetime) -> dict:
+    if frequency == "ONCE":
+        return {"frequency": "ONCE", "executionDate": now + timedelta(minutes=rng.randint(-2 * 24 * 60, 60 * 24 * 60))}
+
+    start = now - timedelta(days=rng.randint(0, 365))
+    end = now + timedelta(days=rng.randint(30, 3 * 365))
+    if frequency == "WEEKLY":
+        return {
+            "frequency": "WEEKLY",
+            "daysOfWeek": rng.sample(WEEKDAYS, rng.randint(1, 3)),
+            "startDate": start,
+            "endDate": end,
+        }
+    return {
+        "frequency": "MONTHLY",
+        # Los días 1 y 15 concentran las nóminas/alquileres
+        "dayOfMonth": rng.choice([1, 1, 1, 15, 15, rng.randint(1, 28)]),
+        "startDate": start,
+        "endDate": end,
+    }
+
+
+def generate_payments(size: int, now: datetime, seed: int = 42, mix: dict[str, float] = DEFAULT_MIX) -> list[dict]:
+    """Documentos listos para `ScheduledPaymentCreate.model_validate`."""
+    rng = random.Random(seed)
+    accounts = account_ids(max(1, size // 20))
+    # 5% de cuentas con 10x más pagos
+    heavy = accounts[: max(1, len(accounts) // 20)]
+    frequencies, weights = zip(*mix.items())
+
+    payments = []
+    for _ in range(size):
+        account = rng.choice(heavy) if rng.random() < 0.35 else rng.choice(accounts)
+        frequency = rng.choices(frequencies, weights)[0]
+        last_execution = None
+        if frequency != "ONCE" and rng.random() < 0.5:
+            last_execution = now - timedelta(days=rng.randint(1, 31), hours=rng.randint(0, 23))
+        payments.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "accountId": account,
+            "description": "Pago sintético",
+            "beneficiary": {"name": "Beneficiario", "iban": f"ES{rng.getrandbits(64):022d}"},
+            "amount": {"value": round(rng.uniform(5, 3000), 2), "currency": "EUR"},
+            "schedule": _schedule(rng, frequency, now),
+            "isActive": rng.random() >= 0.1,
+            "lastExecutionAt": last_execution,
+        })
+    return payments
+
+
+def benchmark_now() -> datetime:
+    # Día 1 de mes a media mañana: el pico mensual
+    return datetime(2026, 6, 1, 9, 30, tzinfo=timezone.utc)
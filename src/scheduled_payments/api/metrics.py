@@ -0,0 +1,54 @@
+import time
+from quart import Blueprint, Response, request, g
+
+from ..core import extensions as ext
+from ..core import metrics
+from ..core.resilience import CLOSED, HALF_OPEN, OPEN
+
+CIRCUIT_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+bp = Blueprint("metrics", __name__)
+
+@bp.get("/metrics")
+async def metrics_endpoint():
+    """Métricas en formato texto de Prometheus."""
+    return Response(metrics.REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+def register_resource_gauges() -> None:
+    """Gauges calculados al exportar a partir de los recursos de `extensions`."""
+    for stat in ("size", "hits", "misses", "coalesced", "evictions"):
+        metrics.ACCOUNT_CACHE_STATS.labels(stat).set_function(
+            lambda stat=stat: ext.account_cache.stats()[stat] if ext.account_cache else 0
+        )
+    metrics.SCHEDULER_WAKEUP_ENTRIES.set_function(
+        lambda: len(ext.wakeup_timer) if ext.wakeup_timer else 0
+    )
+    for dependency in ("accounts", "transfers"):
+        metrics.DEPENDENCY_CIRCUIT_STATE.labels(dependency).set_function(
+            lambda dependency=dependency: _guard_value(dependency, lambda guard: CIRCUIT_STATE_VALUES[guard.breaker.state])
+        )
+        metrics.DEPENDENCY_CONCURRENCY_LIMIT.labels(dependency).set_function(
+            lambda dependency=dependency: _guard_value(dependency, lambda guard: guard.limiter.limit)
+        )
+        metrics.DEPENDENCY_IN_FLIGHT.labels(dependency).set_function(
+            lambda dependency=dependency: _guard_value(dependency, lambda guard: guard.limiter.in_flight)
+        )
+    metrics.RATE_LIMIT_KEYS.set_function(
+        lambda: len(ext.rate_limiter) if ext.rate_limiter is not None else 0
+    )
+
+def _guard_value(dependency: str, read) -> float:
+    # Con las protecciones desactivadas no hay guard: el gauge se exporta a 0
+    guard = ext.dependency_guards().get(dependency)
+    return read(guard) if guard is not None else 0
+
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+async def observe_request(response):
+    started = g.get("request_started")
+    if started is not None:
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            request.endpoint or "unmatched", request.method, response.status_code
+        ).observe(time.perf_counter() - started)
+    return response
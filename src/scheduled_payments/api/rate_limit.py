@@ -0,0 +1,118 @@
+from dataclasses import dataclass
+from quart import request, g
+from logging import getLogger
+
+from ..core.config import settings
+from ..core import extensions as ext
+from ..core.rate_limiter import RateLimitResult
+from ..core import metrics
+
+logger = getLogger(__name__)
+logger.setLevel(settings.LOG_LEVEL)
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    limit: int | None           # None = endpoint exento
+    scope: str = "ip"           # ip | account
+    account_arg: str | None = None  # view_arg con el accountId; None = se resuelve en la vista
+
+DEFAULT_RULE_NAME = "default"
+
+def build_rate_limit_rules() -> dict[str, RateLimitRule]:
+    """
+    Tabla endpoint -> regla. Los límites se pueden sobrescribir por endpoint
+    con RATE_LIMIT_ENDPOINT_LIMITS (nombre de la vista o endpoint completo).
+    """
+    bp = "scheduled_payments_v1"
+    rules = {
+        f"{bp}.create_scheduled_payments": RateLimitRule(settings.RATE_LIMIT_CREATE_PER_WINDOW, "account"),
+        f"{bp}.create_scheduled_payments_bulk": RateLimitRule(settings.RATE_LIMIT_BULK_CREATE_PER_WINDOW),
+        f"{bp}.get_scheduled_payments_by_account": RateLimitRule(settings.RATE_LIMIT_LIST_PER_WINDOW, "account", "account_id"),
+        f"{bp}.get_scheduled_payments_stream": RateLimitRule(settings.RATE_LIMIT_LIST_PER_WINDOW, "account", "account_id"),
+        f"{bp}.deactivate_account_payments": RateLimitRule(settings.RATE_LIMIT_ACCOUNT_OPERATIONS_PER_WINDOW, "account", "account_id"),
+        f"{bp}.reactivate_account_payments": RateLimitRule(settings.RATE_LIMIT_ACCOUNT_OPERATIONS_PER_WINDOW, "account", "account_id"),
+        f"{bp}.delete_account_payments": RateLimitRule(settings.RATE_LIMIT_ACCOUNT_OPERATIONS_PER_WINDOW, "account", "account_id"),
+        f"{bp}.get_upcoming_payments": RateLimitRule(settings.RATE_LIMIT_UPCOMING_PER_WINDOW, "account", "account_id"),
+        f"{bp}.delete_scheduled_payment": RateLimitRule(settings.RATE_LIMIT_DELETE_PER_WINDOW),
+        f"{bp}.health_check": RateLimitRule(None),
+        "metrics.metrics_endpoint": RateLimitRule(None),
+        DEFAULT_RULE_NAME: RateLimitRule(settings.RATE_LIMIT_DEFAULT_PER_WINDOW),
+    }
+
+    for name, limit in settings.RATE_LIMIT_ENDPOINT_LIMITS.items():
+        endpoint = name if "." in name or name == DEFAULT_RULE_NAME else f"{bp}.{name}"
+        rule = rules.get(endpoint, rules[DEFAULT_RULE_NAME])
+        rules[endpoint] = RateLimitRule(limit if limit > 0 else None, rule.scope, rule.account_arg)
+
+    return rules
+
+_rules: dict[str, RateLimitRule] | None = None
+
+def get_rule(endpoint: str | None) -> RateLimitRule:
+    global _rules
+    if _rules is None:
+        _rules = build_rate_limit_rules()
+    rule = _rules.get(endpoint) if endpoint else None
+    return rule if rule is not None else _rules[DEFAULT_RULE_NAME]
+
+def _client_ip() -> str:
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        ip = forwarded.split(",", 1)[0].strip()
+        if ip:
+            return ip
+    return request.remote_addr or "unknown"
+
+async def _check(rule: RateLimitRule, key: str):
+    result = await ext.rate_limiter.allow(key=key, limit=rule.limit)
+    g.rate_limit = result
+    metrics.RATE_LIMIT_DECISIONS.labels(request.endpoint, "allowed" if result.allowed else "rejected").inc()
+    if not result.allowed:
+        return {
+            "error": "Rate limit excedido",
+            "detail": f"Espera {result.reset_in_seconds}s y vuelve a intentarlo."
+        }, 429, {"Retry-After": str(result.reset_in_seconds)}
+    return None
+
+async def apply_rate_limit():
+    """before_request: aplica la regla del endpoint ya resuelto por Quart."""
+    if ext.rate_limiter is None:
+        return None
+
+    endpoint = request.endpoint
+    rule = get_rule(endpoint)
+    if rule.limit is None:
+        return None
+
+    if rule.scope == "account":
+        if rule.account_arg is None:
+            # La cuenta viene en el cuerpo: la vista llama a enforce_account_rate_limit
+            # con el modelo ya validado
+            return None
+        account_id = (request.view_args or {}).get(rule.account_arg) or "unknown"
+        key = f"acct:{account_id}:{endpoint}"
+    else:
+        key = f"ip:{_client_ip()}:{endpoint}"
+
+    return await _check(rule, key)
+
+async def enforce_account_rate_limit(account_id: str):
+    """
+    Límite por cuenta para endpoints cuyo accountId llega en el cuerpo.
+    Devuelve la respuesta 429 si se excede, o None.
+    """
+    if ext.rate_limiter is None:
+        return None
+    endpoint = request.endpoint
+    rule = get_rule(endpoint)
+    if rule.limit is None:
+        return None
+    return await _check(rule, f"acct:{account_id or 'unknown'}:{endpoint}")
+
+async def add_rate_limit_headers(response):
+    result: RateLimitResult | None = g.get("rate_limit")
+    if result is not None:
+        response.headers["X-RateLimit-Limit"] = str(result.limit)
+        response.headers["X-RateLimit-Remaining"] = str(result.remaining)
+        response.headers["X-RateLimit-Reset"] = str(result.reset_in_seconds)
+    return response
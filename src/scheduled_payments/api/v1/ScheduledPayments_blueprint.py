@@ -1,13 +1,21 @@
-from quart import Blueprint, request
+from quart import Blueprint, Response, request, url_for
 from quart_schema import validate_request, validate_response, tag
-from ...models.ScheduledPayments import ScheduledPaymentCreate, ScheduledPaymentUpdate, ScheduledPaymentView, ScheduledPaymentUpcomingView
-from ...services.ScheduledPayments_service import ScheduledPaymentService, AccountNotFoundError, SubscriptionLimitReachedError
+from ...models.ScheduledPayments import ScheduledPaymentCreate, ScheduledPaymentUpdate, ScheduledPaymentView, ScheduledPaymentUpcomingView, UtcDatetime
+from ...services.ScheduledPayments_service import (
+    ScheduledPaymentService, AccountNotFoundError, SubscriptionLimitReachedError,
+    BULK_CREATED, BULK_DUPLICATE, BULK_ACCOUNT_NOT_FOUND, BULK_LIMIT_REACHED, BULK_DEPENDENCY_UNAVAILABLE,
+)
 from logging import getLogger
+import asyncio
+import json
+import math
 from typing import List, Literal
 from ...core.config import settings
 from datetime import datetime, timezone
 from ...core import extensions as ext
-from pydantic import BaseModel, Field
+from ...core.resilience import DependencyUnavailableError, OPEN
+from ..rate_limit import enforce_account_rate_limit
+from pydantic import BaseModel, Field, ValidationError
 
 logger = getLogger(__name__)
 logger.setLevel(settings.LOG_LEVEL)
@@ -19,14 +27,54 @@ class ErrorResponse(BaseModel):
     detail: str | None = Field(None, description="Detalle adicional del error si aplica.")
 
 
+class DependencyStatus(BaseModel):
+    state: str = Field(..., description="Estado del circuit breaker (closed/half_open/open).")
+    retryAfterSeconds: float = Field(..., description="Segundos hasta la siguiente prueba si está abierto.")
+    concurrencyLimit: int = Field(..., description="Límite de concurrencia adaptativo actual.")
+    inFlight: int = Field(..., description="Llamadas en curso.")
+    waiting: int = Field(..., description="Llamadas esperando un hueco.")
+    rejected: dict[str, int] = Field(..., description="Llamadas rechazadas sin enviarse por motivo.")
+
 class HealthResponse(BaseModel):
-    status: str = Field(..., description="Estado del servicio (ok/error).")
+    status: str = Field(..., description="Estado del servicio (ok/degraded/error).")
     service: str = Field(..., description="Nombre del servicio.")
+    dependencies: dict[str, DependencyStatus] = Field(default_factory=dict, description="Estado de los servicios externos.")
 
 class DeleteResponse(BaseModel):
     status: Literal["deleted"] = Field("deleted", description="Confirmación de borrado.")
     id: str = Field(..., description="ID del pago programado eliminado.")
 
+class BulkCreateItem(BaseModel):
+    index: int = Field(..., description="Posición del pago en la petición.")
+    id: str | None = Field(None, description="ID del pago programado (si se pudo leer).")
+    status: int = Field(..., description="Código HTTP equivalente al de la creación individual (201, 400, 403, 404, 409, 503).")
+    error: str | None = Field(None, description="Motivo del rechazo si no se creó.")
+    nextExecutionAt: UtcDatetime | None = Field(None, description="Próxima ejecución del pago creado.")
+
+class BulkCreateResponse(BaseModel):
+    total: int = Field(..., description="Pagos recibidos.")
+    created: int = Field(..., description="Pagos creados.")
+    failed: int = Field(..., description="Pagos rechazados.")
+    results: list[BulkCreateItem] = Field(..., description="Resultado de cada pago, en el orden de la petición.")
+
+class AccountOperationResponse(BaseModel):
+    accountId: str = Field(..., description="Cuenta afectada.")
+    operation: Literal["deactivate", "reactivate", "delete"] = Field(..., description="Operación aplicada.")
+    frequency: str | None = Field(None, description="Frecuencia filtrada (todas si es null).")
+    affected: int = Field(..., description="Pagos desactivados, reactivados o eliminados.")
+    cancelledExecutions: int = Field(0, description="Ejecuciones pendientes canceladas.")
+    skipped: int = Field(0, description="Pagos no reactivados por el límite de la suscripción.")
+
+FREQUENCIES = ("ONCE", "WEEKLY", "MONTHLY")
+
+BULK_STATUS = {
+    BULK_CREATED: 201,
+    BULK_DUPLICATE: 409,
+    BULK_ACCOUNT_NOT_FOUND: 404,
+    BULK_LIMIT_REACHED: 403,
+    BULK_DEPENDENCY_UNAVAILABLE: 503,
+}
+
 @bp.post("/")
 @validate_request(ScheduledPaymentCreate)
 @validate_response(ScheduledPaymentView, 201)
@@ -34,6 +82,7 @@ class DeleteResponse(BaseModel):
 @validate_response(ErrorResponse, 403)
 @validate_response(ErrorResponse, 404)
 @validate_response(ErrorResponse, 409)
+@validate_response(ErrorResponse, 429)
 @validate_response(ErrorResponse, 503)
 @tag(["v1"])
 async def create_scheduled_payments(data: ScheduledPaymentCreate):
@@ -52,9 +101,14 @@ async def create_scheduled_payments(data: ScheduledPaymentCreate):
     - 404: La cuenta no existe.
     - 403: Límite de pagos alcanzado según suscripción.
     - 409: Ya existe un pago con ese id.
+    - 429: Límite de peticiones por cuenta excedido.
     - 503: Error del servicio (dependencias o DB).
     """
 
+    limited = await enforce_account_rate_limit(data.accountId)
+    if limited:
+        return limited
+
     token = request.headers.get("Authorization")
     logger.debug(f"Token recibido: {token}")
     if not token:
@@ -71,6 +125,13 @@ async def create_scheduled_payments(data: ScheduledPaymentCreate):
         return {"error": "La cuenta no existe"}, 404
     except SubscriptionLimitReachedError as e:
         return {"error": f"Límite de pagos programados alcanzado para el plan {e.subscription} (máximo {e.limit})."}, 403
+    except DependencyUnavailableError as e:
+        logger.warning("Creación rechazada: %s", e)
+        return (
+            {"error": "Servicio de cuentas no disponible temporalmente", "detail": e.reason},
+            503,
+            {"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
     except Exception as e:
         logger.exception("Error creando pago programado")
         logger.exception(e)
@@ -81,6 +142,119 @@ async def create_scheduled_payments(data: ScheduledPaymentCreate):
     
     return new_scheduled_payment, 201
 
+async def _read_bulk_items() -> tuple[list, tuple[dict, int] | None]:
+    """
+    Pagos de la petición: un array JSON o NDJSON (application/x-ndjson, un
+    pago por línea). Las líneas NDJSON se decodifican al validarlas, de modo
+    que una línea mal formada solo invalida ese pago.
+    """
+    too_many = {"error": f"La petición supera el máximo de {settings.BULK_CREATE_MAX_ITEMS} pagos"}, 413
+    if request.mimetype == "application/x-ndjson":
+        items: list = []
+        buffer = b""
+        async for chunk in request.body:
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            items.extend(line for line in lines if line.strip())
+            if len(items) > settings.BULK_CREATE_MAX_ITEMS:
+                return [], too_many
+        if buffer.strip():
+            items.append(buffer)
+    else:
+        items = await request.get_json(force=True, silent=True)
+        if not isinstance(items, list):
+            return [], ({"error": "El cuerpo debe ser un array JSON o NDJSON (application/x-ndjson)"}, 400)
+
+    if not items:
+        return [], ({"error": "La petición no contiene pagos"}, 400)
+    if len(items) > settings.BULK_CREATE_MAX_ITEMS:
+        return [], too_many
+    return items, None
+
+def _validate_bulk_item(raw, token: str) -> ScheduledPaymentCreate | str:
+    """El pago validado o el motivo por el que no es válido."""
+    if isinstance(raw, bytes):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            return "JSON inválido"
+    if not isinstance(raw, dict):
+        return "Cada pago debe ser un objeto JSON"
+    try:
+        return ScheduledPaymentCreate.model_validate({**raw, "authToken": token})
+    except ValidationError as e:
+        return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+@bp.post("/bulk")
+@validate_response(BulkCreateResponse, 200)
+@validate_response(ErrorResponse, 400)
+@validate_response(ErrorResponse, 401)
+@validate_response(ErrorResponse, 413)
+@validate_response(ErrorResponse, 429)
+@tag(["v1"])
+async def create_scheduled_payments_bulk():
+    """
+    Crea pagos programados en bloque (altas de clientes empresa).
+
+    Cuerpo: array JSON de pagos o NDJSON (Content-Type application/x-ndjson),
+    con el mismo formato que la creación individual y hasta BULK_CREATE_MAX_ITEMS pagos.
+
+    - Requiere cabecera Authorization (se guarda en todos los pagos).
+    - La suscripción de cada cuenta se consulta una sola vez y el límite de
+      pagos activos se aplica por cuenta al lote completo.
+    - Cada pago se valida e inserta por separado: un pago inválido no
+      impide crear el resto.
+
+    Respuestas típicas:
+    - 200: Resultado por pago (`status` con el código equivalente de la
+      creación individual: 201, 400, 403, 404, 409 o 503).
+    - 400: Cuerpo vacío o con formato incorrecto.
+    - 401: No se envió token de autorización.
+    - 413: Demasiados pagos en una petición.
+    - 429: Límite de peticiones excedido.
+    """
+    token = request.headers.get("Authorization")
+    if not token:
+        return {"error": "Falta token en cabecera (Authorization o X-Auth-Token)"}, 401
+
+    items, error = await _read_bulk_items()
+    if error:
+        return error
+
+    results: list[dict | None] = [None] * len(items)
+    valid: list[tuple[int, ScheduledPaymentCreate]] = []
+    batch_size = max(1, settings.BULK_CREATE_BATCH_SIZE)
+    for offset in range(0, len(items), batch_size):
+        for index in range(offset, min(offset + batch_size, len(items))):
+            payment = _validate_bulk_item(items[index], token)
+            if isinstance(payment, str):
+                raw_id = items[index].get("id") if isinstance(items[index], dict) else None
+                results[index] = {"index": index, "id": raw_id if isinstance(raw_id, str) else None, "status": 400, "error": payment}
+            else:
+                valid.append((index, payment))
+        # Cede el bucle de eventos entre bloques
+        await asyncio.sleep(0)
+
+    service = ScheduledPaymentService()
+    created = await service.create_scheduled_payments_bulk([payment for _, payment in valid])
+    for (index, _), result in zip(valid, created):
+        results[index] = {
+            "index": index,
+            "id": result.id,
+            "status": BULK_STATUS.get(result.outcome, 503),
+            "error": result.error,
+            "nextExecutionAt": result.payment.nextExecutionAt if result.payment else None,
+        }
+
+    created_count = sum(1 for r in results if r["status"] == 201)
+    logger.info("Alta masiva completada: %s de %s pagos creados", created_count, len(results))
+    return {
+        "total": len(results),
+        "created": created_count,
+        "failed": len(results) - created_count,
+        "results": results,
+    }, 200
+
 @bp.get("/<string:scheduled_payment_id>")
 @validate_response(ScheduledPaymentView, 200)
 @validate_response(ErrorResponse, 404)
@@ -144,18 +318,199 @@ async def delete_scheduled_payment(scheduled_payment_id: str):
     
     return {"status": "deleted", "id": scheduled_payment_id}, 200
 
+def _parse_page_args() -> tuple[int | None, str | None, str | None]:
+    """(limit, after, error) a partir de los query params de paginación (None si no vienen)."""
+    limit_raw = request.args.get("limit")
+    limit = None
+    if limit_raw is not None:
+        try:
+            limit = int(limit_raw)
+        except ValueError:
+            return None, None, "limit debe ser un entero"
+        if limit < 1 or limit > settings.LIST_PAGE_MAX_LIMIT:
+            return None, None, f"limit debe estar entre 1 y {settings.LIST_PAGE_MAX_LIMIT}"
+
+    after = request.args.get("after")
+    if after is not None and not after:
+        return None, None, "after no puede estar vacío"
+    return limit, after, None
+
 @bp.get("/accounts/<string:account_id>")
-@validate_response(List[ScheduledPaymentView])
+@validate_response(List[ScheduledPaymentView], 200)
+@validate_response(ErrorResponse, 400)
 @tag(["v1"])
 async def get_scheduled_payments_by_account(account_id: str):
     """
-    Lista los pagos programados asociados a una cuenta.
+    Lista los pagos programados asociados a una cuenta, ordenados por id.
+
+    Query params (opcionales; sin ellos se devuelven todos los pagos):
+    - limit (int): tamaño de página (1..LIST_PAGE_MAX_LIMIT).
+    - after (str): cursor devuelto en la página anterior (id del último pago).
+
+    - 200: Devuelve una lista (posiblemente vacía). Si se pagina y hay más
+      resultados, las cabeceras `X-Next-Cursor` y `Link` (rel="next") indican
+      la siguiente página.
+    - 400: Parámetros de paginación inválidos.
+    """
+    limit, after, error = _parse_page_args()
+    if error:
+        return {"error": error}, 400
 
-    - 200: Devuelve una lista (posiblemente vacía).
+    service = ScheduledPaymentService()
+    payments, next_cursor = await service.get_scheduled_payments_by_account_id(account_id, limit, after)
+
+    headers = {}
+    if next_cursor is not None:
+        next_url = url_for(
+            "scheduled_payments_v1.get_scheduled_payments_by_account",
+            account_id=account_id, limit=limit, after=next_cursor
+        )
+        headers = {"X-Next-Cursor": next_cursor, "Link": f'<{next_url}>; rel="next"'}
+    return payments, 200, headers
+
+@bp.get("/accounts/<string:account_id>/stream")
+@tag(["v1"])
+async def get_scheduled_payments_stream(account_id: str):
     """
+    Exporta los pagos programados de una cuenta en NDJSON (un pago por línea,
+    ordenados por id), serializados según se leen de Mongo sin montar la lista.
+
+    Query params:
+    - limit (int, opcional): máximo de pagos (1..LIST_PAGE_MAX_LIMIT). Por defecto, todos.
+    - after (str, opcional): empieza después de este id.
+
+    - 200: application/x-ndjson
+    - 400: Parámetros de paginación inválidos.
+    """
+    limit, after, error = _parse_page_args()
+    if error:
+        return {"error": error}, 400
+
+    service = ScheduledPaymentService()
+    payments = service.stream_scheduled_payments_by_account_id(account_id, limit, after)
+
+    async def ndjson():
+        sent = 0
+        try:
+            async for payment in payments:
+                yield payment.model_dump_json().encode() + b"\n"
+                sent += 1
+        except Exception:
+            # Las cabeceras ya se enviaron: el cliente verá la respuesta cortada
+            logger.exception("Error exportando pagos de la cuenta %s tras %s pagos", account_id, sent)
+            raise
+
+    return Response(ndjson(), status=200, mimetype="application/x-ndjson")
+
+def _parse_frequency() -> tuple[str | None, str | None]:
+    """(frequency, error) a partir del query param opcional `frequency`."""
+    frequency = request.args.get("frequency")
+    if frequency is None:
+        return None, None
+    frequency = frequency.upper()
+    if frequency not in FREQUENCIES:
+        return None, f"frequency debe ser una de {', '.join(FREQUENCIES)}"
+    return frequency, None
+
+def _account_operation_response(account_id: str, operation: str, frequency: str | None, result) -> dict:
+    return {
+        "accountId": account_id,
+        "operation": operation,
+        "frequency": frequency,
+        "affected": result.affected,
+        "cancelledExecutions": result.cancelled_executions,
+        "skipped": result.skipped,
+    }
+
+@bp.post("/accounts/<string:account_id>/deactivate")
+@validate_response(AccountOperationResponse, 200)
+@validate_response(ErrorResponse, 400)
+@tag(["v1"])
+async def deactivate_account_payments(account_id: str):
+    """
+    Desactiva todos los pagos activos de una cuenta (cuenta cerrada o congelada).
+
+    Query params:
+    - frequency (opcional): solo los pagos ONCE, WEEKLY o MONTHLY.
+
+    Las ejecuciones pendientes de esos pagos (incluidos los reintentos) se cancelan.
+
+    - 200: Número de pagos desactivados (0 si no había ninguno).
+    - 400: frequency inválida.
+    """
+    frequency, error = _parse_frequency()
+    if error:
+        return {"error": error}, 400
+
+    service = ScheduledPaymentService()
+    result = await service.deactivate_account_payments(account_id, frequency)
+    return _account_operation_response(account_id, "deactivate", frequency, result), 200
+
+@bp.post("/accounts/<string:account_id>/reactivate")
+@validate_response(AccountOperationResponse, 200)
+@validate_response(ErrorResponse, 400)
+@validate_response(ErrorResponse, 404)
+@validate_response(ErrorResponse, 503)
+@tag(["v1"])
+async def reactivate_account_payments(account_id: str):
+    """
+    Reactiva los pagos inactivos de una cuenta, hasta el límite de pagos
+    activos de su suscripción, y recalcula su próxima ejecución. Las
+    ocurrencias que vencieron mientras estaban inactivos no se ejecutan.
+
+    Query params:
+    - frequency (opcional): solo los pagos ONCE, WEEKLY o MONTHLY.
+
+    - 200: Pagos reactivados y `skipped` con los que no caben en el límite.
+    - 400: frequency inválida.
+    - 404: La cuenta no existe.
+    - 503: Error del servicio (dependencias o DB).
+    """
+    frequency, error = _parse_frequency()
+    if error:
+        return {"error": error}, 400
+
+    service = ScheduledPaymentService()
+    try:
+        result = await service.reactivate_account_payments(account_id, frequency)
+    except AccountNotFoundError:
+        return {"error": "La cuenta no existe"}, 404
+    except DependencyUnavailableError as e:
+        logger.warning("Reactivación rechazada: %s", e)
+        return (
+            {"error": "Servicio de cuentas no disponible temporalmente", "detail": e.reason},
+            503,
+            {"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    except Exception:
+        logger.exception("Error reactivando los pagos de la cuenta %s", account_id)
+        return {"error": "No se pudieron reactivar los pagos programados"}, 503
+
+    return _account_operation_response(account_id, "reactivate", frequency, result), 200
+
+@bp.delete("/accounts/<string:account_id>")
+@validate_response(AccountOperationResponse, 200)
+@validate_response(ErrorResponse, 400)
+@tag(["v1"])
+async def delete_account_payments(account_id: str):
+    """
+    Elimina todos los pagos programados de una cuenta.
+
+    Query params:
+    - frequency (opcional): solo los pagos ONCE, WEEKLY o MONTHLY.
+
+    Las ejecuciones pendientes de esos pagos (incluidos los reintentos) se cancelan.
+
+    - 200: Número de pagos eliminados (0 si no había ninguno).
+    - 400: frequency inválida.
+    """
+    frequency, error = _parse_frequency()
+    if error:
+        return {"error": error}, 400
+
     service = ScheduledPaymentService()
-    payments = await service.get_scheduled_payments_by_account_id(account_id)
-    return payments, 200
+    result = await service.delete_account_payments(account_id, frequency)
+    return _account_operation_response(account_id, "delete", frequency, result), 200
 
 @bp.get("/health")
 @validate_response(HealthResponse, 200)
@@ -168,10 +523,13 @@ async def health_check():
     - readiness/liveness en docker/k8s
     - validación rápida en CI
 
-    - 200: El servicio está operativo.
+    - 200: El servicio está operativo; `degraded` si algún circuit breaker
+      de una dependencia está abierto.
     """
 
-    return {"status": "ok", "service": "scheduled-payments"}, 200
+    dependencies = {name: guard.snapshot() for name, guard in ext.dependency_guards().items()}
+    status = "degraded" if any(d["state"] == OPEN for d in dependencies.values()) else "ok"
+    return {"status": status, "service": "scheduled-payments", "dependencies": dependencies}, 200
 
 @bp.get("/accounts/<string:account_id>/upcoming")
 @validate_response(list[ScheduledPaymentUpcomingView], 200)
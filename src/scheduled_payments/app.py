@@ -1,6 +1,4 @@
 from quart import Quart
-from quart import request, jsonify
-from .core.rate_limiter import InMemoryFixedWindowRateLimiter
 from quart_schema import QuartSchema, Tag
 
 from .core.config import settings
@@ -11,8 +9,11 @@ from logging.handlers import TimedRotatingFileHandler
 from .utils.LoggerColorFormatter import ColorFormatter
 
 from .api.v1.ScheduledPayments_blueprint import bp as scheduled_payments_bp_v1
+from .api.rate_limit import apply_rate_limit, add_rate_limit_headers
+from .api.metrics import bp as metrics_bp, register_resource_gauges, start_request_timer, observe_request
 
 import asyncio
+import time
 from .services.ScheduledPayments_service import ScheduledPaymentService
 
 ## Logger configuration ##
@@ -44,7 +45,6 @@ logger.addHandler(console_handler)
 logger.propagate = False
 
 scheduler_task: asyncio.Task | None = None
-rate_limiter: InMemoryFixedWindowRateLimiter | None = None
 
 ## Logger configuration ##
 
@@ -58,6 +58,7 @@ def create_app():
     
     # Load blueprints.
     app.register_blueprint(scheduled_payments_bp_v1)
+    app.register_blueprint(metrics_bp)
     logger.info("Routes registered")
     
     # Open API Specification
@@ -69,6 +70,8 @@ def create_app():
     schema.swagger_ui_path = "/api/docs"
     app.config["QUART_SCHEMA_TITLE"] = "Scheduled Payments Service"
     app.config["QUART_SCHEMA_VERSION"] = "1.0.0"
+    # Respuestas volcadas en modo JSON: aplica los serializadores de los modelos (fechas en UTC con "Z")
+    app.config["QUART_SCHEMA_PYDANTIC_DUMP_OPTIONS"] = {"mode": "json"}
     app.config["QUART_SCHEMA_DESCRIPTION"] = (
         "Microservicio responsable de gestionar pagos programados.\n\n"
         "Permite:\n"
@@ -98,6 +101,12 @@ def create_app():
             raise e
         logger.info("Service started successfully")
 
+        # HTTP clients (Accounts / Transfers)
+        ext.init_http_clients()
+        ext.init_account_cache()
+        ext.init_dependency_guards()
+        logger.info("HTTP clients ready")
+
         # NTP service
         try:
             await ext.init_ntp_clock()
@@ -109,27 +118,50 @@ def create_app():
         logger.info("NTP service started successfully")
 
         # Rate limiter
-        global rate_limiter
-        if settings.RATE_LIMIT_ENABLED:
-            rate_limiter = InMemoryFixedWindowRateLimiter(settings.RATE_LIMIT_WINDOW_SECONDS)
-            logger.info(
-                "Rate limit enabled (window=%ss)",
-                settings.RATE_LIMIT_WINDOW_SECONDS
-            )
+        ext.init_rate_limiter()
 
         global scheduler_task
         service = ScheduledPaymentService()
+        ext.init_wakeup_timer()
 
         async def scheduler_loop():
-            logger.info("Scheduler loop started (process_due_payments every 60s)")
+            interval = settings.SCHEDULER_INTERVAL_SECONDS
+            logger.info("Scheduler loop started (wake-up at next due time, resync every %ss)", interval)
+            try:
+                backfilled = await service.backfill_next_executions()
+                if backfilled:
+                    logger.info("nextExecutionAt calculado para %s pagos existentes", backfilled)
+            except Exception as e:
+                logger.error("Error calculando nextExecutionAt de pagos existentes")
+                logger.debug(e)
+
+            def now_epoch() -> float:
+                return ext.ntp_clock.now_epoch() if ext.ntp_clock else time.time()
+
+            timer = ext.wakeup_timer
+            next_resync = 0.0
             while True:
                 try:
-                    await service.process_due_payments()
+                    if time.monotonic() >= next_resync:
+                        next_resync = time.monotonic() + interval
+                        await service.resync_wakeup_timer()
+
+                    tick_epoch = now_epoch()
+                    next_due = timer.next_due()
+                    if next_due is not None and next_due <= tick_epoch:
+                        try:
+                            await service.process_due_payments()
+                        finally:
+                            timer.discard_due(tick_epoch)
                 except Exception as e:
                     logger.error("Scheduler loop error")
                     logger.debug(e)
-                interval = settings.SCHEDULER_INTERVAL_SECONDS
-                await asyncio.sleep(interval)
+
+                delay = next_resync - time.monotonic()
+                next_due = timer.next_due()
+                if next_due is not None:
+                    delay = min(delay, next_due - now_epoch())
+                await timer.wait(delay)
 
         scheduler_task = asyncio.create_task(scheduler_loop())
     
@@ -140,6 +172,10 @@ def create_app():
         
         ext.close_db_client()
         ext.stop_ntp_clock()
+        await ext.close_http_clients()
+        ext.close_account_cache()
+        ext.close_dependency_guards()
+        ext.close_wakeup_timer()
 
         global scheduler_task
         if scheduler_task:
@@ -149,78 +185,33 @@ def create_app():
             except asyncio.CancelledError:
                 pass
         
-        global rate_limiter
-        rate_limiter = None
+        await ext.close_rate_limiter()
         
         logger.info("Service shut down complete.")
 
-    @app.before_request
-    async def apply_rate_limit():
-
-        if not settings.RATE_LIMIT_ENABLED or rate_limiter is None:
-            return
-
-        path = request.path or ""
-        method = (request.method or "GET").upper()
-
-        limit = settings.RATE_LIMIT_DEFAULT_PER_WINDOW
-        key_scope = "ip"  # ip o account
-
-        if method == "POST" and path == "/v1/scheduled-payments/":
-            limit = settings.RATE_LIMIT_CREATE_PER_WINDOW
-            key_scope = "account"
-
-        elif method == "GET" and path.startswith("/v1/scheduled-payments/accounts/") and "/upcoming" not in path:
-            limit = settings.RATE_LIMIT_LIST_PER_WINDOW
-            key_scope = "account"
-
-        elif method == "GET" and path.endswith("/upcoming") and path.startswith("/v1/scheduled-payments/accounts/"):
-            limit = settings.RATE_LIMIT_UPCOMING_PER_WINDOW
-            key_scope = "account"
+    # Mantenimiento (fuera de línea)
+    @app.cli.command("rebuild-account-counters")
+    def rebuild_account_counters():
+        """Recalcula los contadores de pagos activos por cuenta a partir de los pagos."""
+        async def run():
+            await ext.init_db_client()
+            try:
+                changed = await ScheduledPaymentService().rebuild_account_counters()
+                logger.info("Contadores de pagos activos corregidos: %s", changed)
+            finally:
+                ext.close_db_client()
 
-        elif method == "DELETE" and path.startswith("/v1/scheduled-payments/"):
-            limit = settings.RATE_LIMIT_DELETE_PER_WINDOW
-            key_scope = "ip"
+        asyncio.run(run())
 
-        account_id: str | None = None
+    # Metrics
+    register_resource_gauges()
+    app.before_request(start_request_timer)
+    app.after_request(observe_request)
 
-        if key_scope == "account":
-            if path.startswith("/v1/scheduled-payments/accounts/"):
-                parts = path.split("/")
-                if len(parts) >= 5:
-                    account_id = parts[4] or None
+    # Rate limit
+    app.before_request(apply_rate_limit)
+    app.after_request(add_rate_limit_headers)
 
-            if account_id is None and method == "POST" and path == "/v1/scheduled-payments/":
-                try:
-                    body = await request.get_json(force=False, silent=True) or {}
-                    account_id = body.get("accountId")
-                except Exception:
-                    account_id = None
-
-        ip = request.headers.get("X-Forwarded-For", "").split(",")[0].strip()
-        if not ip:
-            ip = request.remote_addr or "unknown"
-
-        if key_scope == "account":
-            key = f"acct:{account_id or 'unknown'}:{path}:{method}"
-        else:
-            key = f"ip:{ip}:{path}:{method}"
-
-        result = await rate_limiter.allow(key=key, limit=limit)
-
-        headers = {
-            "X-RateLimit-Limit": str(result.limit),
-            "X-RateLimit-Remaining": str(result.remaining),
-            "X-RateLimit-Reset": str(result.reset_in_seconds),
-        }
-
-        if not result.allowed:
-            headers["Retry-After"] = str(result.reset_in_seconds)
-            return jsonify({
-                "error": "Rate limit excedido",
-                "detail": f"Espera {result.reset_in_seconds}s y vuelve a intentarlo."
-            }), 429, headers
-        
     return app
 
 app = create_app()
\ No newline at end of file
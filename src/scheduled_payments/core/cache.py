@@ -0,0 +1,103 @@
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple, Type
+
+class AsyncTTLCache:
+    """
+    Caché en memoria acotada (LRU) con caducidad por entrada.
+
+    - Las excepciones indicadas en `negative` se cachean durante
+      `negative_ttl_seconds` y se relanzan en cada acierto.
+    - Los fallos concurrentes sobre una misma clave comparten una única
+      llamada al loader (single-flight).
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float, negative_ttl_seconds: float = 0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+
+        # key -> (expires_at, is_negative, value | exception)
+        self._entries: "OrderedDict[str, Tuple[float, bool, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        negative: Tuple[Type[BaseException], ...] = ()
+    ) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, is_negative, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if is_negative:
+                    raise value.with_traceback(None)
+                return value
+            self._entries.pop(key, None)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader, negative))
+            task.add_done_callback(self._consume_exception)
+            self._inflight[key] = task
+
+        # shield: si se cancela quien espera, la carga sigue para el resto
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader, negative) -> Any:
+        try:
+            value = await loader()
+        except negative as e:
+            if self.negative_ttl_seconds > 0:
+                self._store(key, True, e, self.negative_ttl_seconds)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        self._store(key, False, value, self.ttl_seconds)
+        return value
+
+    def _store(self, key: str, is_negative: bool, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, is_negative, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @staticmethod
+    def _consume_exception(task: asyncio.Task) -> None:
+        if not task.cancelled():
+            task.exception()
+
+    def peek(self, key: str, default: Any = None) -> Any:
+        """Valor cacheado y vigente, sin cargarlo ni contar en las estadísticas."""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] or entry[0] <= time.monotonic():
+            return default
+        return entry[2]
+
+    def invalidate(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
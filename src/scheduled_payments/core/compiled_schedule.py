@@ -0,0 +1,206 @@
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Tuple
+
+# Todas las marcas de tiempo se manejan como enteros en microsegundos UTC
+# desde epoch y los días como número de día desde 1970-01-01 (jueves).
+US_PER_DAY = 86_400_000_000
+ORDINAL_EPOCH = date(1970, 1, 1).toordinal()
+
+EPOCH_AWARE = datetime(1970, 1, 1, tzinfo=timezone.utc)
+EPOCH_NAIVE = datetime(1970, 1, 1)
+ONE_US = timedelta(microseconds=1)
+
+ONCE, WEEKLY, MONTHLY = 0, 1, 2
+
+WEEKDAYS = {
+    "MONDAY": 0,
+    "TUESDAY": 1,
+    "WEDNESDAY": 2,
+    "THURSDAY": 3,
+    "FRIDAY": 4,
+    "SATURDAY": 5,
+    "SUNDAY": 6,
+}
+
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+def to_us(dt: datetime) -> int:
+    # Los datetimes naive se interpretan como UTC (así los devuelve Mongo)
+    if dt.tzinfo is None:
+        return (dt - EPOCH_NAIVE) // ONE_US
+    return (dt - EPOCH_AWARE) // ONE_US
+
+def from_us(us: int) -> datetime:
+    return EPOCH_AWARE + timedelta(microseconds=us)
+
+def _weekday(day: int) -> int:
+    return (day + 3) % 7
+
+def _days_in_month(year: int, month: int) -> int:
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return 29
+    return _DAYS_IN_MONTH[month - 1]
+
+def _ymd(day: int) -> Tuple[int, int, int]:
+    d = date.fromordinal(day + ORDINAL_EPOCH)
+    return d.year, d.month, d.day
+
+def _day_number(year: int, month: int, day: int) -> int:
+    return date(year, month, day).toordinal() - ORDINAL_EPOCH
+
+class Instant:
+    """`now` descompuesto una sola vez por tick para evaluar muchas planificaciones."""
+    __slots__ = ("us", "day", "weekday", "mday")
+
+    def __init__(self, now: datetime):
+        self.us = to_us(now)
+        self.day = self.us // US_PER_DAY
+        self.weekday = _weekday(self.day)
+        self.mday = _ymd(self.day)[2]
+
+class CompiledSchedule:
+    __slots__ = ("kind", "execution_us", "start_us", "end_us", "day_of_month", "weekday_mask", "next_offset")
+
+    def __init__(self, kind: int, execution_us: int = 0, start_us: int = 0, end_us: int = 0,
+                 day_of_month: int = 0, weekday_mask: int = 0):
+        self.kind = kind
+        self.execution_us = execution_us
+        self.start_us = start_us
+        self.end_us = end_us
+        self.day_of_month = day_of_month
+        self.weekday_mask = weekday_mask
+        # next_offset[w]: días desde un día de la semana w hasta el siguiente día marcado (inclusive)
+        self.next_offset = tuple(
+            next((k for k in range(7) if weekday_mask & (1 << ((w + k) % 7))), -1)
+            for w in range(7)
+        ) if weekday_mask else None
+
+    def is_due(self, now: Instant, last_us: int | None) -> bool:
+        if self.kind == ONCE:
+            return last_us is None and self.execution_us <= now.us
+
+        if now.us < self.start_us or now.us > self.end_us:
+            return False
+        if last_us is not None and last_us // US_PER_DAY == now.day:
+            return False
+
+        if self.kind == MONTHLY:
+            return now.mday == self.day_of_month
+        return bool(self.weekday_mask & (1 << now.weekday))
+
+    def next_due(self, now_us: int, last_us: int | None) -> int | None:
+        """Primer instante en el que `is_due` pasa a ser cierto."""
+        if self.kind == ONCE:
+            return None if last_us is not None else self.execution_us
+
+        if now_us > self.end_us:
+            return None
+
+        first_day = max(now_us, self.start_us) // US_PER_DAY
+        if last_us is not None and last_us // US_PER_DAY >= first_day:
+            first_day = last_us // US_PER_DAY + 1
+
+        if self.kind == MONTHLY:
+            day = self._next_month_day(first_day)
+        else:
+            if not self.weekday_mask:
+                return None
+            day = first_day + self.next_offset[_weekday(first_day)]
+
+        due = max(day * US_PER_DAY, self.start_us)
+        return due if due <= self.end_us else None
+
+    def is_occurrence(self, due_us: int) -> bool:
+        """True si `due_us` es el instante de una ocurrencia tal como lo devuelve `next_due` (precisión de ms)."""
+        if self.kind == ONCE:
+            return due_us // 1000 == self.execution_us // 1000
+        if due_us < self.start_us // 1000 * 1000 or due_us > self.end_us:
+            return False
+        day = due_us // US_PER_DAY
+        if due_us // 1000 != max(day * US_PER_DAY, self.start_us) // 1000:
+            return False
+        if self.kind == MONTHLY:
+            return _ymd(day)[2] == self.day_of_month
+        return bool(self.weekday_mask & (1 << _weekday(day)))
+
+    def next_upcoming(self, now_us: int, last_us: int | None) -> int | None:
+        """Próxima ejecución estimada (>= now) mostrada en /upcoming."""
+        last_day = last_us // US_PER_DAY if last_us is not None else None
+
+        if self.kind == ONCE:
+            if last_us is not None:
+                return None
+            return self.execution_us if self.execution_us >= now_us else None
+
+        if self.kind == MONTHLY:
+            base_us = self.start_us if now_us < self.start_us else now_us
+            lower = max(self.start_us, now_us)
+            year, month, _ = _ymd(base_us // US_PER_DAY)
+            for _ in range(3):
+                if self.day_of_month <= _days_in_month(year, month):
+                    day = _day_number(year, month, self.day_of_month)
+                    candidate = day * US_PER_DAY
+                    if lower <= candidate <= self.end_us and day != last_day:
+                        return candidate
+                month += 1
+                if month > 12:
+                    month = 1
+                    year += 1
+            return None
+
+        if now_us > self.end_us or not self.weekday_mask:
+            return None
+
+        base_day = max(now_us, self.start_us) // US_PER_DAY
+        day = max(base_day, -(-now_us // US_PER_DAY))
+        day += self.next_offset[_weekday(day)]
+        if day == last_day:
+            day += 1
+            day += self.next_offset[_weekday(day)]
+
+        if day > base_day + 13 or day * US_PER_DAY > self.end_us:
+            return None
+        return day * US_PER_DAY
+
+    def _next_month_day(self, first_day: int) -> int:
+        year, month, mday = _ymd(first_day)
+        dom = self.day_of_month
+        if mday <= dom <= _days_in_month(year, month):
+            return first_day + (dom - mday)
+        while True:
+            month += 1
+            if month > 12:
+                month = 1
+                year += 1
+            if dom <= _days_in_month(year, month):
+                return _day_number(year, month, dom)
+
+def schedule_key(sched) -> tuple:
+    frequency = sched.frequency
+    if frequency == "ONCE":
+        return (frequency, sched.executionDate)
+    if frequency == "MONTHLY":
+        return (frequency, sched.startDate, sched.endDate, sched.dayOfMonth)
+    return (frequency, sched.startDate, sched.endDate, tuple(sched.daysOfWeek))
+
+@lru_cache(maxsize=65536)
+def _compile(key: tuple) -> CompiledSchedule:
+    frequency = key[0]
+    if frequency == "ONCE":
+        return CompiledSchedule(ONCE, execution_us=to_us(key[1]))
+
+    start_us, end_us = to_us(key[1]), to_us(key[2])
+    if frequency == "MONTHLY":
+        return CompiledSchedule(MONTHLY, start_us=start_us, end_us=end_us, day_of_month=key[3])
+
+    mask = 0
+    for name in key[3]:
+        weekday = WEEKDAYS.get(name.upper())
+        if weekday is not None:
+            mask |= 1 << weekday
+    return CompiledSchedule(WEEKLY, start_us=start_us, end_us=end_us, weekday_mask=mask)
+
+def compile_schedule(sched) -> CompiledSchedule:
+    """Compila (con caché) una planificación ONCE/WEEKLY/MONTHLY."""
+    return _compile(schedule_key(sched))
@@ -6,11 +6,43 @@ class Settings(BaseSettings):
     # Mongo
     MONGO_CONNECTION_STRING: str
     MONGO_DATABASE_NAME: str = "scheduled_payments"
+    MONGO_ENSURE_INDEXES: bool = True
+    # Sin índice único sobre `id` el arranque falla; con False se arranca igualmente
+    # y los duplicados se detectan con una consulta previa a cada inserción
+    MONGO_REQUIRE_UNIQUE_IDS: bool = True
 
     # External services
     TRANSFER_SERVICE_URL: str
     ACCOUNTS_SERVICE_URL: str
 
+    # HTTP clients (external services)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP2_ENABLED: bool = False
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 2.0
+    ACCOUNTS_HTTP_TIMEOUT_SECONDS: float = 5.0
+    TRANSFERS_HTTP_TIMEOUT_SECONDS: float = 10.0
+
+    # Circuit breaker y concurrencia adaptativa (AIMD) por dependencia
+    DEPENDENCY_GUARD_ENABLED: bool = True
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5  # fallos consecutivos para abrir
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = 30.0
+    CIRCUIT_BREAKER_HALF_OPEN_PROBES: int = 1
+    ADAPTIVE_CONCURRENCY_INITIAL: int = 10
+    ADAPTIVE_CONCURRENCY_MIN: int = 1
+    ADAPTIVE_CONCURRENCY_MAX: int = 100
+    ACCOUNTS_LATENCY_TARGET_SECONDS: float = 1.0
+    TRANSFERS_LATENCY_TARGET_SECONDS: float = 2.0
+    # Espera máxima por un hueco en las peticiones de la API antes de responder 503
+    ACCOUNTS_MAX_WAIT_SECONDS: float = 0.5
+
+    # Account subscription cache
+    ACCOUNT_CACHE_ENABLED: bool = True
+    ACCOUNT_CACHE_MAX_ENTRIES: int = 10000
+    ACCOUNT_CACHE_TTL_SECONDS: float = 300.0
+    ACCOUNT_CACHE_NEGATIVE_TTL_SECONDS: float = 30.0
+
     # Subscription limit
     SUBSCRIPTION_BASIC: int
     SUBSCRIPTION_STUDENT: int
@@ -18,7 +50,37 @@ class Settings(BaseSettings):
 
     # Scheduler
     SCHEDULER_INTERVAL_SECONDS: int = 60
+    SCHEDULER_MAX_CONCURRENCY: int = 20
+    SCHEDULER_PAYMENT_TIMEOUT_SECONDS: float = 15.0
+    SCHEDULER_BULK_WRITE_BATCH_SIZE: int = 500
+    SCHEDULER_INSTANCE_ID: str | None = None
+    SCHEDULER_CLAIM_BATCH_SIZE: int = 500
+    SCHEDULER_CLAIM_LEASE_SECONDS: int = 120
+    SCHEDULER_WAKEUP_HORIZON_SECONDS: int = 3600
+    SCHEDULER_WAKEUP_MAX_ENTRIES: int = 100000
+    # Recuperación de ocurrencias perdidas (servicio caído, ticks que cruzan la medianoche):
+    # antigüedad máxima (0 = solo las de hoy) y ritmo máximo de envío de las atrasadas (0 = sin límite)
+    SCHEDULER_CATCHUP_MAX_AGE_SECONDS: int = 3 * 24 * 3600
+    SCHEDULER_CATCHUP_MAX_PER_SECOND: float = 5.0
+    # Cola justa por cuenta: trabajos reclamados pendientes de envío como máximo y
+    # peso por plan de suscripción (p. ej. '{"pro": 3, "premium": 2}'; por defecto 1)
+    SCHEDULER_FAIR_QUEUE_MAX_SIZE: int = 5000
+    SCHEDULER_MAX_IN_FLIGHT_PER_ACCOUNT: int = 1
+    SCHEDULER_PLAN_WEIGHTS: dict[str, float] = {}
+    # Reintentos del outbox de ejecuciones (backoff exponencial con jitter)
+    SCHEDULER_RETRY_MAX_ATTEMPTS: int = 6
+    SCHEDULER_RETRY_BASE_SECONDS: float = 30.0
+    SCHEDULER_RETRY_MAX_SECONDS: float = 3600.0
     
+    # Alta masiva (POST /bulk): pagos por petición, tamaño de bloque de
+    # validación/insert_many y consultas simultáneas al Accounts Service
+    BULK_CREATE_MAX_ITEMS: int = 10000
+    BULK_CREATE_BATCH_SIZE: int = 500
+    BULK_CREATE_ACCOUNT_CONCURRENCY: int = 10
+
+    # Listado de pagos por cuenta (paginación por cursor opcional)
+    LIST_PAGE_MAX_LIMIT: int = 500
+
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "log.txt"
@@ -31,17 +93,28 @@ class Settings(BaseSettings):
     )
 
     # NTP
-    NTP_SERVER: str = "pool.ntp.org"
+    NTP_SERVER: str = "pool.ntp.org"  # uno o varios separados por comas (se usa la mediana)
     NTP_REFRESH_SECONDS: int = 60
-    NTP_TIMEOUT_SECONDS: int = 3
+    NTP_TIMEOUT_SECONDS: float = 3
 
     # Rate limit
     RATE_LIMIT_ENABLED: bool = True
     RATE_LIMIT_WINDOW_SECONDS: int = 60
+    RATE_LIMIT_ALGORITHM: str = "sliding_window"  # sliding_window | fixed_window
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_EVICTION_INTERVAL_SECONDS: float = 30.0
+    RATE_LIMIT_BACKEND: str = "memory"  # memory | mongo (compartido entre réplicas)
+    RATE_LIMIT_SHARED_LEASE_SIZE: int = 10
+    RATE_LIMIT_SHARED_RETRY_SECONDS: float = 5.0  # tras un fallo del backend compartido, límites locales durante este tiempo
     RATE_LIMIT_DEFAULT_PER_WINDOW: int = 120
     RATE_LIMIT_CREATE_PER_WINDOW: int = 5
+    RATE_LIMIT_BULK_CREATE_PER_WINDOW: int = 5
     RATE_LIMIT_LIST_PER_WINDOW: int = 60
     RATE_LIMIT_UPCOMING_PER_WINDOW: int = 30
     RATE_LIMIT_DELETE_PER_WINDOW: int = 20
+    RATE_LIMIT_ACCOUNT_OPERATIONS_PER_WINDOW: int = 20
+    # Límites por endpoint (nombre de la vista -> peticiones por ventana, 0 = exento),
+    # p. ej. RATE_LIMIT_ENDPOINT_LIMITS='{"get_scheduled_payment": 300}'
+    RATE_LIMIT_ENDPOINT_LIMITS: dict[str, int] = {}
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,85 @@
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+from logging import getLogger
+from .fair_queue import FairDispatchQueue
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+@dataclass(frozen=True)
+class DispatchStats:
+    total: int
+    succeeded: int
+    failed: int
+    timed_out: int
+    elapsed_seconds: float
+
+    @property
+    def throughput(self) -> float:
+        if self.elapsed_seconds <= 0:
+            return float(self.total)
+        return self.total / self.elapsed_seconds
+
+class BoundedDispatcher:
+    """
+    Ejecuta un handler asíncrono sobre los elementos de una `FairDispatchQueue`
+    con un máximo de `max_concurrency` ejecuciones simultáneas. Cada elemento
+    tiene su propio timeout y sus errores no afectan al resto.
+
+    El handler devuelve True si el elemento se procesó correctamente.
+    """
+    def __init__(self, max_concurrency: int, timeout_seconds: float):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.timeout_seconds = timeout_seconds if timeout_seconds and timeout_seconds > 0 else None
+
+    async def run_queue(
+        self,
+        queue: FairDispatchQueue[T],
+        handler: Callable[[T], Awaitable[bool]],
+        describe: Callable[[T], str] = lambda item: type(item).__name__
+    ) -> DispatchStats:
+        """
+        Consume la cola (que puede seguir llenándose mientras tanto) hasta que
+        se cierre y vacíe.
+        """
+        counters = {"succeeded": 0, "failed": 0, "timed_out": 0}
+        started = time.perf_counter()
+
+        async def worker():
+            while (entry := await queue.get()) is not None:
+                key, item = entry
+                try:
+                    await self._process(item, handler, describe, counters)
+                finally:
+                    queue.task_done(key)
+
+        await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+
+        return DispatchStats(
+            total=sum(counters.values()),
+            succeeded=counters["succeeded"],
+            failed=counters["failed"],
+            timed_out=counters["timed_out"],
+            elapsed_seconds=time.perf_counter() - started,
+        )
+
+    async def _process(self, item: T, handler, describe, counters: dict) -> None:
+        try:
+            ok = await asyncio.wait_for(handler(item), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            counters["timed_out"] += 1
+            logger.error("Timeout procesando %s (%ss)", describe(item), self.timeout_seconds)
+            return
+        except Exception as e:
+            counters["failed"] += 1
+            logger.error("Error procesando %s: %s", describe(item), e)
+            logger.debug(e, exc_info=True)
+            return
+
+        if ok:
+            counters["succeeded"] += 1
+        else:
+            counters["failed"] += 1
@@ -1,7 +1,14 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+import httpx
 
 from .config import settings
 from .ntp_clock import NtpClock
+from .cache import AsyncTTLCache
+from .wakeup_timer import WakeupTimer
+from .resilience import AdaptiveConcurrencyLimiter, CircuitBreaker, DependencyGuard
+from .rate_limiter import InMemoryFixedWindowRateLimiter, SlidingWindowRateLimiter, SharedRateLimiter
+from ..db.indexes import UNIQUE_ID_KEYS, ensure_indexes, has_unique_index
+from ..db.RateLimitRepository import RateLimitRepository
 
 from logging import getLogger
 
@@ -10,9 +17,22 @@ logger.setLevel(settings.LOG_LEVEL)
 
 db_client: AsyncIOMotorClient | None = None
 db: AsyncIOMotorDatabase | None = None
+# True si está confirmado el índice único sobre `id` (ver check_unique_ids)
+unique_ids_confirmed: bool = False
 
 ntp_clock: NtpClock | None = None
 
+accounts_http_client: httpx.AsyncClient | None = None
+transfers_http_client: httpx.AsyncClient | None = None
+accounts_guard: DependencyGuard | None = None
+transfers_guard: DependencyGuard | None = None
+
+account_cache: AsyncTTLCache | None = None
+
+wakeup_timer: WakeupTimer | None = None
+
+rate_limiter: SharedRateLimiter | SlidingWindowRateLimiter | InMemoryFixedWindowRateLimiter | None = None
+
 async def init_db_client():
     global db_client, db
     logger.info(f"Connecting to Database")
@@ -27,12 +47,33 @@ async def init_db_client():
         
         db = db_client[settings.MONGO_DATABASE_NAME]
         
+        if settings.MONGO_ENSURE_INDEXES:
+            await ensure_indexes(db)
+        
         logger.info("Database connected")
     
     except Exception as e:
         logger.error("Error connecting to database")
         logger.debug(e)
         raise e
+
+    await check_unique_ids()
+
+async def check_unique_ids():
+    """
+    Comprueba que existe el índice único sobre `id`: los 409 dependen de él y,
+    sin él, las operaciones por id podrían tocar cualquiera de los duplicados.
+    `ensure_indexes` solo registra los conflictos (p. ej. ids ya duplicados),
+    así que se comprueba aparte, también con MONGO_ENSURE_INDEXES=False.
+    """
+    global unique_ids_confirmed
+    unique_ids_confirmed = await has_unique_index(db, "scheduled_payments", UNIQUE_ID_KEYS)
+    if unique_ids_confirmed:
+        return
+    if settings.MONGO_REQUIRE_UNIQUE_IDS:
+        logger.critical("Falta el índice único sobre scheduled_payments.id: no se arranca el servicio")
+        raise RuntimeError("scheduled_payments.id no tiene índice único")
+    logger.warning("Sin índice único sobre scheduled_payments.id: los duplicados se comprueban antes de insertar")
     
 def close_db_client():
     global db_client, db
@@ -47,17 +88,178 @@ async def init_ntp_clock():
     global ntp_clock
     if ntp_clock is not None:
         return
+    # No bloquea el arranque: la hora parte del reloj del sistema y se
+    # corrige en cuanto responda el primer sync en segundo plano
     ntp_clock = NtpClock(
-        server=settings.NTP_SERVER,
+        servers=settings.NTP_SERVER,
         refresh_seconds=settings.NTP_REFRESH_SECONDS,
         timeout=settings.NTP_TIMEOUT_SECONDS,
     )
-    logger.info("NTP clock listo (server=%s offset=%.6fs)",
-                settings.NTP_SERVER, ntp_clock.offset_seconds())
+    ntp_clock.start()
+    logger.info("NTP clock listo (servers=%s, sincronizando en segundo plano)", settings.NTP_SERVER)
 
 def stop_ntp_clock():
     global ntp_clock
     if ntp_clock is None:
         return
     ntp_clock.stop()
-    ntp_clock = None
\ No newline at end of file
+    ntp_clock = None
+
+def _build_http_client(timeout_seconds: float) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout_seconds, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        http2=settings.HTTP2_ENABLED,
+    )
+
+def init_http_clients():
+    global accounts_http_client, transfers_http_client
+    logger.info("Creating HTTP clients (max_connections=%s keepalive=%s http2=%s)",
+                settings.HTTP_MAX_CONNECTIONS,
+                settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                settings.HTTP2_ENABLED)
+    if accounts_http_client is None:
+        accounts_http_client = _build_http_client(settings.ACCOUNTS_HTTP_TIMEOUT_SECONDS)
+    if transfers_http_client is None:
+        transfers_http_client = _build_http_client(settings.TRANSFERS_HTTP_TIMEOUT_SECONDS)
+
+def get_accounts_http_client() -> httpx.AsyncClient:
+    if accounts_http_client is None:
+        init_http_clients()
+    return accounts_http_client
+
+def get_transfers_http_client() -> httpx.AsyncClient:
+    if transfers_http_client is None:
+        init_http_clients()
+    return transfers_http_client
+
+async def close_http_clients():
+    global accounts_http_client, transfers_http_client
+    logger.info("Closing HTTP clients")
+    for client in (accounts_http_client, transfers_http_client):
+        if client is None:
+            continue
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.error("Error closing HTTP client")
+            logger.debug(e)
+    accounts_http_client = None
+    transfers_http_client = None
+
+def _build_dependency_guard(name: str, latency_target_seconds: float, max_wait_seconds: float | None) -> DependencyGuard:
+    return DependencyGuard(
+        name,
+        CircuitBreaker(
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            open_seconds=settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+            half_open_probes=settings.CIRCUIT_BREAKER_HALF_OPEN_PROBES,
+        ),
+        AdaptiveConcurrencyLimiter(
+            initial_limit=settings.ADAPTIVE_CONCURRENCY_INITIAL,
+            min_limit=settings.ADAPTIVE_CONCURRENCY_MIN,
+            max_limit=settings.ADAPTIVE_CONCURRENCY_MAX,
+            latency_target_seconds=latency_target_seconds,
+        ),
+        max_wait_seconds=max_wait_seconds,
+    )
+
+def init_dependency_guards():
+    global accounts_guard, transfers_guard
+    if not settings.DEPENDENCY_GUARD_ENABLED:
+        return
+    if accounts_guard is None:
+        accounts_guard = _build_dependency_guard(
+            "accounts", settings.ACCOUNTS_LATENCY_TARGET_SECONDS, settings.ACCOUNTS_MAX_WAIT_SECONDS
+        )
+    if transfers_guard is None:
+        # El planificador espera su turno, pero sin que el timeout por pago corte una
+        # transferencia ya enviada: lo que no quepa se rechaza sin enviarse y se aplaza
+        transfers_guard = _build_dependency_guard(
+            "transfers",
+            settings.TRANSFERS_LATENCY_TARGET_SECONDS,
+            max(0.0, settings.SCHEDULER_PAYMENT_TIMEOUT_SECONDS - settings.TRANSFERS_HTTP_TIMEOUT_SECONDS),
+        )
+    logger.info("Dependency guards ready (failure_threshold=%s open=%ss concurrency=%s..%s)",
+                settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+                settings.ADAPTIVE_CONCURRENCY_MIN,
+                settings.ADAPTIVE_CONCURRENCY_MAX)
+
+def close_dependency_guards():
+    global accounts_guard, transfers_guard
+    accounts_guard = None
+    transfers_guard = None
+
+def dependency_guards() -> dict[str, DependencyGuard]:
+    return {g.name: g for g in (accounts_guard, transfers_guard) if g is not None}
+
+def init_account_cache():
+    global account_cache
+    if account_cache is not None or not settings.ACCOUNT_CACHE_ENABLED:
+        return
+    account_cache = AsyncTTLCache(
+        max_entries=settings.ACCOUNT_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.ACCOUNT_CACHE_TTL_SECONDS,
+        negative_ttl_seconds=settings.ACCOUNT_CACHE_NEGATIVE_TTL_SECONDS,
+    )
+    logger.info("Account cache ready (max_entries=%s ttl=%ss negative_ttl=%ss)",
+                settings.ACCOUNT_CACHE_MAX_ENTRIES,
+                settings.ACCOUNT_CACHE_TTL_SECONDS,
+                settings.ACCOUNT_CACHE_NEGATIVE_TTL_SECONDS)
+
+def close_account_cache():
+    global account_cache
+    if account_cache is None:
+        return
+    logger.info("Account cache stats: %s", account_cache.stats())
+    account_cache = None
+
+def init_wakeup_timer():
+    global wakeup_timer
+    if wakeup_timer is None:
+        wakeup_timer = WakeupTimer()
+
+def close_wakeup_timer():
+    global wakeup_timer
+    wakeup_timer = None
+
+def init_rate_limiter():
+    global rate_limiter
+    if rate_limiter is not None or not settings.RATE_LIMIT_ENABLED:
+        return
+    if settings.RATE_LIMIT_BACKEND == "mongo":
+        rate_limiter = SharedRateLimiter(
+            RateLimitRepository(db),
+            settings.RATE_LIMIT_WINDOW_SECONDS,
+            lease_size=settings.RATE_LIMIT_SHARED_LEASE_SIZE,
+            max_keys=settings.RATE_LIMIT_MAX_KEYS,
+            eviction_interval_seconds=settings.RATE_LIMIT_EVICTION_INTERVAL_SECONDS,
+            backend_retry_seconds=settings.RATE_LIMIT_SHARED_RETRY_SECONDS,
+        )
+        rate_limiter.start()
+    elif settings.RATE_LIMIT_ALGORITHM == "fixed_window":
+        rate_limiter = InMemoryFixedWindowRateLimiter(settings.RATE_LIMIT_WINDOW_SECONDS)
+    else:
+        rate_limiter = SlidingWindowRateLimiter(
+            settings.RATE_LIMIT_WINDOW_SECONDS,
+            max_keys=settings.RATE_LIMIT_MAX_KEYS,
+            eviction_interval_seconds=settings.RATE_LIMIT_EVICTION_INTERVAL_SECONDS,
+        )
+        rate_limiter.start()
+    logger.info(
+        "Rate limit enabled (backend=%s algorithm=%s window=%ss)",
+        settings.RATE_LIMIT_BACKEND,
+        settings.RATE_LIMIT_ALGORITHM,
+        settings.RATE_LIMIT_WINDOW_SECONDS
+    )
+
+async def close_rate_limiter():
+    global rate_limiter
+    if isinstance(rate_limiter, (SlidingWindowRateLimiter, SharedRateLimiter)):
+        await rate_limiter.close()
+    rate_limiter = None
@@ -0,0 +1,106 @@
+import asyncio
+import heapq
+from collections import deque
+from typing import Deque, Dict, Generic, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+class _Flow(Generic[T]):
+    __slots__ = ("items", "weight", "finish", "in_flight", "scheduled")
+
+    def __init__(self, weight: float):
+        self.items: Deque[T] = deque()
+        self.weight = weight
+        self.finish = 0.0
+        self.in_flight = 0
+        self.scheduled = False
+
+class FairDispatchQueue(Generic[T]):
+    """
+    Cola de reparto justo entre claves (cuentas) con weighted fair queuing.
+
+    - Cada clave es un flujo FIFO: sus elementos salen en el orden en que se
+      añadieron y nunca hay más de `max_in_flight_per_key` de la misma clave
+      en curso (1 por defecto: orden estricto).
+    - Entre claves se elige la de menor tiempo de finalización virtual; cada
+      elemento servido avanza el de su clave en 1/peso, así que una clave
+      con miles de elementos no retrasa al resto y una de peso 2 se sirve el
+      doble de a menudo que una de peso 1 cuando ambas tienen trabajo.
+
+    Los productores llaman a `put` y finalmente a `close`; los consumidores
+    a `get` (None cuando no queda nada) y a `task_done` al terminar cada elemento.
+    """
+    def __init__(self, max_in_flight_per_key: int = 1):
+        self.max_in_flight_per_key = max(1, int(max_in_flight_per_key))
+        self._flows: Dict[str, _Flow[T]] = {}
+        self._ready: List[Tuple[float, int, str]] = []
+        self._sequence = 0
+        self._virtual_time = 0.0
+        self._size = 0
+        self._closed = False
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put(self, key: str, item: T, weight: float = 1.0) -> None:
+        flow = self._flows.get(key)
+        if flow is None:
+            flow = self._flows[key] = _Flow(max(weight, 1e-6))
+        flow.items.append(item)
+        self._size += 1
+        self._activate(key, flow)
+
+    def close(self) -> None:
+        """No habrá más `put`: `get` devuelve None en cuanto se vacíe."""
+        self._closed = True
+        self._notify()
+
+    async def get(self) -> Tuple[str, T] | None:
+        while True:
+            while self._ready:
+                _, _, key = heapq.heappop(self._ready)
+                flow = self._flows[key]
+                flow.scheduled = False
+                flow.in_flight += 1
+                self._virtual_time = max(self._virtual_time, flow.finish - 1 / flow.weight)
+                self._size -= 1
+                item = flow.items.popleft()
+                self._activate(key, flow)
+                self._notify()
+                return key, item
+
+            if self._closed and self._size == 0:
+                return None
+            # Lo que queda pertenece a claves en curso (o aún no ha llegado)
+            self._changed.clear()
+            await self._changed.wait()
+
+    def task_done(self, key: str) -> None:
+        flow = self._flows[key]
+        flow.in_flight -= 1
+        if flow.items:
+            self._activate(key, flow)
+        elif not flow.in_flight:
+            # Sin trabajo pendiente: se olvida (si vuelve, empieza en el tiempo virtual actual)
+            del self._flows[key]
+        self._notify()
+
+    async def wait_below(self, size: int) -> None:
+        """Espera a que haya menos de `size` elementos por repartir (control de memoria)."""
+        while self._size >= size:
+            self._changed.clear()
+            await self._changed.wait()
+
+    def _activate(self, key: str, flow: _Flow[T]) -> None:
+        if flow.scheduled or not flow.items or flow.in_flight >= self.max_in_flight_per_key:
+            return
+        flow.scheduled = True
+        # Una clave que estuvo inactiva no acumula crédito: empieza en el tiempo virtual actual
+        flow.finish = max(flow.finish, self._virtual_time) + 1 / flow.weight
+        self._sequence += 1
+        heapq.heappush(self._ready, (flow.finish, self._sequence, key))
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
@@ -0,0 +1,290 @@
+import math
+import time
+import functools
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Registro de métricas en memoria con exposición en formato texto de Prometheus.
+#
+# Para que registrar sea barato en el camino caliente, cada combinación de
+# etiquetas se resuelve una vez a un objeto hijo (`metric.labels(...)`) que
+# solo suma a enteros/floats; no hay locks porque todo corre en el bucle asyncio.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} espera las etiquetas {self.labelnames}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        ...
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.value += amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in self._children.items()
+        ]
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Callable[[], float] | None = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """El valor se calcula al exportar (p. ej. tamaño de una caché)."""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.value += amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._default.set_function(function)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, child in self._children.items():
+            try:
+                value = child.get()
+            except Exception:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(float(value))}")
+        return lines
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return _Timer(self._default)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# Scheduler
+SCHEDULER_TICK_SECONDS = REGISTRY.histogram(
+    "scheduler_tick_duration_seconds", "Duración de cada pasada del planificador.",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+SCHEDULER_DUE_PAYMENTS = REGISTRY.histogram(
+    "scheduler_due_payments", "Pagos vencidos procesados por pasada.",
+    buckets=(0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000))
+SCHEDULER_PAYMENTS = REGISTRY.counter(
+    "scheduler_payments_total", "Pagos ejecutados por el planificador por resultado.", ["outcome"])
+SCHEDULER_JOBS = REGISTRY.counter(
+    "scheduler_execution_jobs_total", "Trabajos del outbox de ejecuciones por resultado (succeeded, retried, deferred, dead).", ["outcome"])
+SCHEDULER_CATCHUP = REGISTRY.counter(
+    "scheduler_catchup_occurrences_total", "Ocurrencias perdidas recuperadas (enqueued) o descartadas por antigüedad (expired).", ["outcome"])
+SCHEDULER_DISPATCH_DELAY_SECONDS = REGISTRY.histogram(
+    "scheduler_dispatch_delay_seconds", "Tiempo desde el inicio del reparto hasta el envío de cada transferencia.",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800))
+SCHEDULER_WAKEUP_ENTRIES = REGISTRY.gauge(
+    "scheduler_wakeup_timer_entries", "Pagos con hora de ejecución cargada en el temporizador.")
+
+# Dependencias HTTP
+TRANSFER_SECONDS = REGISTRY.histogram(
+    "transfers_request_duration_seconds", "Latencia de las llamadas al Transfers Service.", ["outcome"])
+ACCOUNTS_SECONDS = REGISTRY.histogram(
+    "accounts_request_duration_seconds", "Latencia de las llamadas al Accounts Service.", ["outcome"])
+ACCOUNT_CACHE_STATS = REGISTRY.gauge(
+    "account_cache_stats", "Estadísticas de la caché de suscripciones (size, hits, misses, coalesced, evictions).", ["stat"])
+
+DEPENDENCY_CIRCUIT_STATE = REGISTRY.gauge(
+    "dependency_circuit_state", "Estado del circuit breaker por dependencia (0=closed, 1=half_open, 2=open).", ["dependency"])
+DEPENDENCY_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    "dependency_concurrency_limit", "Límite de concurrencia adaptativo por dependencia.", ["dependency"])
+DEPENDENCY_IN_FLIGHT = REGISTRY.gauge(
+    "dependency_in_flight_requests", "Llamadas en curso por dependencia.", ["dependency"])
+DEPENDENCY_REJECTIONS = REGISTRY.counter(
+    "dependency_rejections_total", "Llamadas rechazadas sin enviarse por dependencia y motivo.", ["dependency", "reason"])
+
+# Mongo
+MONGO_OPERATION_SECONDS = REGISTRY.histogram(
+    "mongo_operation_duration_seconds", "Duración de las operaciones de los repositorios.", ["operation", "outcome"])
+
+# API
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP por endpoint.", ["endpoint", "method", "status"])
+RATE_LIMIT_DECISIONS = REGISTRY.counter(
+    "rate_limit_decisions_total", "Decisiones del rate limiter por endpoint.", ["endpoint", "decision"])
+RATE_LIMIT_KEYS = REGISTRY.gauge(
+    "rate_limit_tracked_keys", "Claves retenidas por el rate limiter local.")
+
+def timed(histogram: Histogram, operation: str | None = None):
+    """
+    Decorador para corrutinas: observa la duración en `histogram` con las
+    etiquetas (operation, outcome=ok|error).
+    """
+    def decorator(func):
+        name = operation or func.__name__
+        ok = histogram.labels(name, "ok")
+        error = histogram.labels(name, "error")
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException:
+                error.observe(time.perf_counter() - started)
+                raise
+            ok.observe(time.perf_counter() - started)
+            return result
+        return wrapper
+    return decorator
@@ -1,77 +1,170 @@
 import time
+import socket
+import struct
+import asyncio
 import datetime
-import threading
+import statistics
 from logging import getLogger
-import ntplib
 
 logger = getLogger(__name__)
 
+# Segundos entre 1900-01-01 (epoch NTP) y 1970-01-01
+NTP_EPOCH_DELTA = 2_208_988_800
+NTP_PORT = 123
+_PACKET = struct.Struct("!B B b b 11I")
 
-class NtpClock:
-    def __init__(self, server: str, refresh_seconds: int = 60, timeout: int = 3):
-        self.server = server
-        self.refresh_seconds = refresh_seconds
-        self.timeout = timeout
 
-        self._offset = 0.0
-        self._lock = threading.Lock()
+def _to_ntp(epoch: float) -> tuple[int, int]:
+    seconds = int(epoch) + NTP_EPOCH_DELTA
+    fraction = int((epoch % 1) * 2**32)
+    return seconds & 0xFFFFFFFF, fraction
 
-        self._stop = threading.Event()
-        self._thread: threading.Thread = None
 
-        logger.info("Inicializando NtpClock (server=%s refresh=%ss timeout=%ss)",
-                    self.server, self.refresh_seconds, self.timeout)
+def _from_ntp(seconds: int, fraction: int) -> float:
+    return seconds - NTP_EPOCH_DELTA + fraction / 2**32
 
-        self._sync_safe(initial=True)
 
-        self._thread = threading.Thread(target=self._loop, daemon=True, name="ntp-clock")
-        self._thread.start()
+class NtpSample:
+    __slots__ = ("server", "base", "delay", "stratum")
 
-    def _loop(self):
-        while not self._stop.is_set():
-            self._stop.wait(self.refresh_seconds)
-            if self._stop.is_set():
-                break
-            self._sync_safe(initial=False)
+    def __init__(self, server: str, base: float, delay: float, stratum: int):
+        self.server = server
+        self.base = base      # epoch UTC - time.monotonic()
+        self.delay = delay
+        self.stratum = stratum
 
-    def stop(self):
-        logger.info("Parando NtpClock (server=%s)", self.server)
-        self._stop.set()
 
-    def _sync_safe(self, initial: bool):
-        try:
-            self._sync_once()
-        except Exception as e:
-            msg = "Sync inicial NTP fallido" if initial else "Error refrescando NTP"
-            logger.warning("%s (%s): %s", msg, self.server, e, exc_info=True)
+class _NtpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, request: bytes, reply: asyncio.Future):
+        self.request = request
+        self.reply = reply
+        self.sent_at = 0.0
 
-    def _sync_once(self):
-        client = ntplib.NTPClient()
-        t0 = time.time()
-        response = client.request(self.server, version=4, timeout=self.timeout)
-        t1 = time.time()
+    def connection_made(self, transport):
+        self.sent_at = time.monotonic()
+        transport.sendto(self.request)
 
-        offset = response.tx_time - time.time()
-        rtt = t1 - t0
+    def datagram_received(self, data, addr):
+        if not self.reply.done():
+            self.reply.set_result((data, time.monotonic()))
 
-        with self._lock:
-            self._offset = offset
+    def error_received(self, exc):
+        if not self.reply.done():
+            self.reply.set_exception(exc)
 
-        logger.info("NTP sync OK (server=%s offset=%.6fs rtt=%.3fs stratum=%s)",
-                    self.server, offset, rtt, getattr(response, "stratum", None))
 
-        logger.debug("NTP details: delay=%s dispersion=%s tx_time=%s",
-                     getattr(response, "delay", None),
-                     getattr(response, "root_dispersion", None),
-                     getattr(response, "tx_time", None))
+class NtpClock:
+    """
+    Reloj UTC corregido por NTP.
+
+    La hora se calcula como `time.monotonic() + base`, así que la lectura no
+    toma locks y no salta si el reloj del sistema se ajusta. `base` parte de
+    `time.time()` (arranque inmediato) y se refina en segundo plano con
+    consultas SNTP asíncronas a todos los servidores, usando la mediana.
+    """
+    def __init__(self, servers: list[str] | str, refresh_seconds: int = 60, timeout: float = 3):
+        if isinstance(servers, str):
+            servers = [s.strip() for s in servers.split(",") if s.strip()]
+        self.servers = servers
+        self.refresh_seconds = refresh_seconds
+        self.timeout = timeout
+
+        self._base = time.time() - time.monotonic()
+        self.synced = False
+        self.last_sync_monotonic: float | None = None
+        self._task: asyncio.Task | None = None
+
+        logger.info("Inicializando NtpClock (servers=%s refresh=%ss timeout=%ss)",
+                    ",".join(self.servers), self.refresh_seconds, self.timeout)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    def stop(self) -> None:
+        logger.info("Parando NtpClock (servers=%s)", ",".join(self.servers))
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.sync_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                msg = "Error refrescando NTP" if self.synced else "Sync inicial NTP fallido"
+                logger.warning("%s (%s): %s", msg, ",".join(self.servers), e)
+            await asyncio.sleep(self.refresh_seconds)
+
+    async def sync_once(self) -> list[NtpSample]:
+        results = await asyncio.gather(
+            *(self._query(server) for server in self.servers),
+            return_exceptions=True
+        )
+        samples = [r for r in results if isinstance(r, NtpSample)]
+        for server, r in zip(self.servers, results):
+            if isinstance(r, BaseException):
+                logger.debug("NTP server %s failed: %r", server, r)
+        if not samples:
+            raise RuntimeError("ningún servidor NTP respondió")
+
+        base = statistics.median(s.base for s in samples)
+        self._base = base
+        self.synced = True
+        self.last_sync_monotonic = time.monotonic()
+
+        logger.info("NTP sync OK (servers=%s/%s offset=%.6fs delay=%.3fs)",
+                    len(samples), len(self.servers), self.offset_seconds(),
+                    statistics.median(s.delay for s in samples))
+        return samples
+
+    async def _query(self, server: str) -> NtpSample:
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(server, NTP_PORT, type=socket.SOCK_DGRAM)
+        family, _, _, _, address = infos[0]
+
+        # Cabecera cliente: LI=0 VN=4 Mode=3. El servidor devuelve nuestro
+        # transmit timestamp como origin, lo que permite validar la respuesta
+        tx_seconds, tx_fraction = _to_ntp(time.time())
+        request = _PACKET.pack(0x23, 0, 0, 0, *([0] * 9), tx_seconds, tx_fraction)
+
+        reply: asyncio.Future = loop.create_future()
+        transport, protocol = await loop.create_datagram_endpoint(
+            lambda: _NtpProtocol(request, reply), remote_addr=address[:2], family=family
+        )
+        try:
+            data, received_at = await asyncio.wait_for(reply, self.timeout)
+        finally:
+            transport.close()
+
+        if len(data) < _PACKET.size:
+            raise ValueError("respuesta NTP truncada")
+        fields = _PACKET.unpack_from(data)
+        flags, stratum = fields[0], fields[1]
+        words = fields[4:]
+        origin = (words[5], words[6])
+        if origin != (tx_seconds, tx_fraction):
+            raise ValueError("respuesta NTP no corresponde a la petición")
+        if flags >> 6 == 3 or not 0 < stratum < 16:
+            raise ValueError(f"servidor NTP no sincronizado (stratum={stratum})")
+
+        server_received = _from_ntp(words[7], words[8])
+        server_sent = _from_ntp(words[9], words[10])
+        sent_at = protocol.sent_at
+
+        # Offset respecto al reloj monotónico (RFC 4330)
+        base = ((server_received - sent_at) + (server_sent - received_at)) / 2
+        delay = (received_at - sent_at) - (server_sent - server_received)
+        return NtpSample(server, base, delay, stratum)
 
     def now_epoch(self) -> float:
-        with self._lock:
-            return time.time() + self._offset
+        return time.monotonic() + self._base
 
     def now_utc(self) -> datetime.datetime:
         return datetime.datetime.fromtimestamp(self.now_epoch(), tz=datetime.timezone.utc)
 
     def offset_seconds(self) -> float:
-        with self._lock:
-            return self._offset
+        """Diferencia entre la hora NTP y el reloj del sistema."""
+        return self.now_epoch() - time.time()
@@ -1,7 +1,13 @@
+import math
 import time
 import asyncio
+import itertools
+from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Dict, Tuple, Optional
+from logging import getLogger
+
+logger = getLogger(__name__)
 
 @dataclass(frozen=True)
 class RateLimitResult:
@@ -45,6 +51,9 @@ class InMemoryFixedWindowRateLimiter:
             remaining = max(0, limit - count)
             return RateLimitResult(True, limit, remaining, reset_in)
 
+    def __len__(self) -> int:
+        return len(self._buckets)
+
     async def cleanup(self) -> None:
         now = int(time.time())
         wstart = self._window_start(now)
@@ -54,3 +63,271 @@ class InMemoryFixedWindowRateLimiter:
             keys_to_delete = [k for k, (ws, _) in self._buckets.items() if ws < threshold]
             for k in keys_to_delete:
                 self._buckets.pop(k, None)
+
+class _PeriodicEviction:
+    """Tarea en segundo plano que llama a `cleanup()` cada `eviction_interval_seconds`."""
+    _eviction_task: Optional[asyncio.Task] = None
+    eviction_interval_seconds: float = 30.0
+
+    def start(self) -> None:
+        if self._eviction_task is None:
+            self._eviction_task = asyncio.create_task(self._eviction_loop())
+
+    async def close(self) -> None:
+        task, self._eviction_task = self._eviction_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _eviction_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.eviction_interval_seconds)
+            await self.cleanup()
+
+class SlidingWindowRateLimiter(_PeriodicEviction):
+    """
+    Limitador de ventana deslizante aproximada (contador de la ventana actual
+    + contador de la anterior ponderado por el solape).
+
+    No usa locks: en asyncio la lectura-modificación-escritura de `allow` no
+    cede el control al bucle, así que es atómica. El número de claves está
+    acotado por `max_keys` (se expulsan las más antiguas) y una tarea en
+    segundo plano elimina las claves inactivas.
+    """
+    def __init__(self, window_seconds: int, max_keys: int = 100_000, eviction_interval_seconds: float = 30.0):
+        self.window_seconds = max(1, int(window_seconds))
+        self.max_keys = max(1, int(max_keys))
+        self.eviction_interval_seconds = eviction_interval_seconds
+
+        # key -> [window_index, current_count, previous_count]
+        # El orden de inserción del dict se usa como orden de antigüedad:
+        # cada cambio de ventana reinserta la clave al final.
+        self._buckets: Dict[str, list] = {}
+        self._eviction_task: Optional[asyncio.Task] = None
+        self.evictions = 0
+
+    async def allow(self, key: str, limit: int) -> RateLimitResult:
+        return self.hit(key, limit)
+
+    def hit(self, key: str, limit: int, now: Optional[float] = None) -> RateLimitResult:
+        if now is None:
+            now = time.monotonic()
+        window = self.window_seconds
+        index = int(now // window)
+        elapsed = now - index * window
+
+        limit = max(1, int(limit))
+        if not key:
+            key = "anonymous"
+
+        buckets = self._buckets
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= self.max_keys:
+                # Se expulsa por lotes: recorrer el dict desde el principio
+                # tras muchos borrados es caro
+                self._evict_oldest(max(len(buckets) - self.max_keys + 1, self.max_keys // 100))
+            bucket = buckets[key] = [index, 0, 0]
+        elif bucket[0] != index:
+            # Nueva ventana: la actual pasa a ser la anterior (o 0 si hubo un hueco)
+            previous = bucket[1] if bucket[0] == index - 1 else 0
+            del buckets[key]
+            bucket = buckets[key] = [index, 0, previous]
+
+        previous_weight = bucket[2] * (1.0 - elapsed / window)
+        estimated = previous_weight + bucket[1]
+
+        if estimated + 1 > limit:
+            return RateLimitResult(False, limit, 0, self._retry_after(bucket, limit, elapsed))
+
+        bucket[1] += 1
+        remaining = max(0, int(limit - estimated - 1))
+        return RateLimitResult(True, limit, remaining, max(1, math.ceil(window - elapsed)))
+
+    def _retry_after(self, bucket: list, limit: int, elapsed: float) -> int:
+        window = self.window_seconds
+        _, current, previous = bucket
+        if current + 1 <= limit and previous:
+            # Basta con que el peso de la ventana anterior baje lo suficiente
+            wait = window * (1.0 - (limit - current - 1) / previous) - elapsed
+        else:
+            # Hay que esperar a la siguiente ventana y a que la actual pese menos
+            wait = (window - elapsed) + window * max(0.0, 1.0 - (limit - 1) / current)
+        return max(1, math.ceil(wait))
+
+    def _evict_oldest(self, count: int) -> None:
+        buckets = self._buckets
+        for key in list(itertools.islice(buckets, count)):
+            del buckets[key]
+        self.evictions += count
+
+    async def cleanup(self, now: Optional[float] = None) -> int:
+        """Elimina las claves sin tráfico en las dos últimas ventanas."""
+        if now is None:
+            now = time.monotonic()
+        threshold = int(now // self.window_seconds) - 1
+        stale = [k for k, bucket in self._buckets.items() if bucket[0] < threshold]
+        for k in stale:
+            self._buckets.pop(k, None)
+        return len(stale)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class RateLimitBackend(ABC):
+    """
+    Almacén compartido de contadores por ventana fija (entre workers/réplicas).
+
+    `increment` suma `amount` al contador de `key` en la ventana que empieza
+    en `window_start` y devuelve el total resultante. El contador debe
+    caducar solo (TTL) pasados `ttl_seconds`.
+    """
+    @abstractmethod
+    async def increment(self, key: str, window_start: int, amount: int, ttl_seconds: int) -> int:
+        ...
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Sustituto local de un backend compartido (tests, benchmarks, un solo proceso)."""
+    def __init__(self):
+        self._counters: Dict[Tuple[str, int], Tuple[int, float]] = {}
+        self.calls = 0
+
+    async def increment(self, key: str, window_start: int, amount: int, ttl_seconds: int) -> int:
+        self.calls += 1
+        now = time.time()
+        count, expires_at = self._counters.get((key, window_start), (0, 0.0))
+        if expires_at and expires_at <= now:
+            count = 0
+        count += amount
+        self._counters[(key, window_start)] = (count, expires_at or now + ttl_seconds)
+        return count
+
+class SharedRateLimiter(_PeriodicEviction):
+    """
+    Limitador de ventana fija sobre un `RateLimitBackend` compartido.
+
+    Para no pagar un viaje de red por petición, cada proceso reserva la cuota
+    por bloques (`lease_size`, como mucho una décima parte del límite) y la
+    consume localmente; las peticiones concurrentes de una misma clave
+    comparten una única reserva en curso. La cuota reservada y no usada se pierde al cambiar de
+    ventana, así que el límite global nunca se supera. Si el backend falla se
+    recurre a un limitador local por proceso en lugar de rechazar peticiones,
+    y no se vuelve a probar hasta pasados `backend_retry_seconds`: con el
+    backend caído cada intento podría tardar hasta el timeout del driver.
+    """
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        window_seconds: int,
+        lease_size: int = 10,
+        max_keys: int = 100_000,
+        eviction_interval_seconds: float = 30.0,
+        backend_retry_seconds: float = 5.0,
+    ):
+        self.backend = backend
+        self.window_seconds = max(1, int(window_seconds))
+        self.lease_size = max(1, int(lease_size))
+        self.max_keys = max(1, int(max_keys))
+        self.eviction_interval_seconds = eviction_interval_seconds
+        self.fallback = SlidingWindowRateLimiter(window_seconds, max_keys=max_keys)
+
+        # key -> [window_start, cuota local disponible, total global conocido]
+        self._leases: Dict[str, list] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._backend_down = False
+        self.backend_retry_seconds = max(0.0, backend_retry_seconds)
+        self._backend_retry_at = 0.0
+        self._eviction_task: Optional[asyncio.Task] = None
+        self.backend_errors = 0
+
+    async def allow(self, key: str, limit: int) -> RateLimitResult:
+        now = time.time()
+        window = self.window_seconds
+        wstart = int(now) - (int(now) % window)
+        reset_in = max(1, math.ceil(wstart + window - now))
+
+        limit = max(1, int(limit))
+        if not key:
+            key = "anonymous"
+
+        while True:
+            lease = self._lease(key, wstart)
+            if lease[1] > 0:
+                lease[1] -= 1
+                return RateLimitResult(True, limit, self._remaining(lease, limit), reset_in)
+            if lease[2] >= limit:
+                return RateLimitResult(False, limit, 0, reset_in)
+
+            # Una sola reserva en curso por clave; el resto espera y reintenta
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            await asyncio.shield(inflight)
+
+        if self._backend_down and time.monotonic() < self._backend_retry_at:
+            return await self.fallback.allow(key, limit)
+
+        amount = max(1, min(self.lease_size, limit // 10))
+        inflight = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            total = await self.backend.increment(key, wstart, amount, 2 * window)
+        except Exception as e:
+            self.backend_errors += 1
+            self._backend_retry_at = time.monotonic() + self.backend_retry_seconds
+            if not self._backend_down:
+                self._backend_down = True
+                logger.warning("Rate limit backend unavailable, using local limits")
+            logger.debug(e)
+            return await self.fallback.allow(key, limit)
+        finally:
+            self._inflight.pop(key, None)
+            inflight.set_result(None)
+
+        if self._backend_down:
+            self._backend_down = False
+            logger.info("Rate limit backend available again")
+
+        granted = max(0, min(amount, limit - (total - amount)))
+        lease = self._leases.get(key)
+        if lease is None or lease[0] != wstart:
+            # La ventana cambió o la entrada se expulsó durante la espera
+            return RateLimitResult(granted > 0, limit, max(0, granted - 1), reset_in)
+
+        lease[2] = max(lease[2], total)
+        if granted == 0:
+            return RateLimitResult(False, limit, 0, reset_in)
+
+        lease[1] += granted - 1
+        return RateLimitResult(True, limit, self._remaining(lease, limit), reset_in)
+
+    def _lease(self, key: str, wstart: int) -> list:
+        leases = self._leases
+        lease = leases.get(key)
+        if lease is None or lease[0] != wstart:
+            if lease is None and len(leases) >= self.max_keys:
+                for old in list(itertools.islice(leases, max(1, self.max_keys // 100))):
+                    del leases[old]
+            leases.pop(key, None)
+            lease = leases[key] = [wstart, 0, 0]
+        return lease
+
+    @staticmethod
+    def _remaining(lease: list, limit: int) -> int:
+        return max(0, limit - lease[2]) + lease[1]
+
+    async def cleanup(self, now: Optional[float] = None) -> int:
+        if now is None:
+            now = time.time()
+        current = int(now) - (int(now) % self.window_seconds)
+        stale = [k for k, lease in self._leases.items() if lease[0] < current]
+        for k in stale:
+            self._leases.pop(k, None)
+        await self.fallback.cleanup()
+        return len(stale)
+
+    def __len__(self) -> int:
+        return len(self._leases)
+
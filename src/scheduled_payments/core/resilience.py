@@ -0,0 +1,240 @@
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_DEFAULT_WAIT = object()
+
+class DependencyUnavailableError(Exception):
+    """La llamada se rechazó sin enviarse: se puede reintentar más tarde sin riesgo."""
+    def __init__(self, dependency: str, reason: str, retry_after: float):
+        self.dependency = dependency
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"{dependency} no disponible ({reason}), reintentar en {retry_after:.1f}s")
+
+class CircuitBreaker:
+    """
+    Circuit breaker por número de fallos consecutivos.
+
+    - closed:    las llamadas pasan; `failure_threshold` fallos seguidos lo abren.
+    - open:      se rechaza todo durante `open_seconds`.
+    - half_open: se dejan pasar hasta `half_open_probes` llamadas de prueba;
+                 si salen bien se cierra y, si alguna falla, se vuelve a abrir.
+    """
+    def __init__(self, failure_threshold: int, open_seconds: float, half_open_probes: int = 1):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, int(half_open_probes))
+
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            return HALF_OPEN
+        return self._state
+
+    def retry_after(self) -> float:
+        if self._state != OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def try_acquire(self) -> bool:
+        """True si la llamada puede hacerse (en half_open, ocupa un hueco de prueba)."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == OPEN:
+            return False
+        if self._state == OPEN:
+            self._state = HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+        if self._probes >= self.half_open_probes:
+            return False
+        self._probes += 1
+        return True
+
+    def record_success(self) -> None:
+        if self._state == HALF_OPEN:
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._state = CLOSED
+                logger.info("Circuit breaker cerrado tras %s pruebas correctas", self._probe_successes)
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+            self._open()
+
+    def release(self) -> None:
+        """La llamada autorizada no llegó a hacerse (sin resultado)."""
+        if self._state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def _open(self) -> None:
+        if self._state != OPEN:
+            self.opened += 1
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._failures = 0
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Límite de llamadas simultáneas ajustado con AIMD: sube 1/limit por cada
+    respuesta rápida con el límite en uso y se multiplica por `backoff` ante
+    un fallo o una latencia por encima de `latency_target_seconds` (como
+    mucho una vez por `latency_target_seconds`, para que una misma ráfaga
+    de errores no lo hunda al mínimo).
+
+    Quien no consigue hueco espera hasta `max_wait`; si no llega, se rechaza.
+    """
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target_seconds: float,
+        backoff: float = 0.7
+    ):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.latency_target_seconds = latency_target_seconds
+        self.backoff = backoff
+
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial_limit)))
+        self._last_decrease = 0.0
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for w in self._waiters if not w.done())
+
+    async def acquire(self, max_wait: float | None = None) -> bool:
+        if self.in_flight < self.limit and not self.waiting:
+            self.in_flight += 1
+            return True
+        if max_wait is not None and max_wait <= 0:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # El hueco se transfiere en `_wake` (in_flight ya incrementado)
+            await asyncio.wait_for(waiter, max_wait)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except BaseException:
+            # Cancelado justo después de recibir el hueco: se devuelve
+            if waiter.done() and not waiter.cancelled():
+                self.in_flight -= 1
+                self._wake()
+            raise
+
+    def release(self, latency_seconds: float | None, failed: bool) -> None:
+        """`latency_seconds` None: la llamada no llegó a hacerse (no ajusta el límite)."""
+        utilized = self.in_flight >= self.limit
+        self.in_flight -= 1
+        if latency_seconds is not None:
+            if failed or latency_seconds > self.latency_target_seconds:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.latency_target_seconds:
+                    self._last_decrease = now
+                    self._limit = max(self.min_limit, self._limit * self.backoff)
+            elif utilized:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+class DependencyGuard:
+    """
+    Protege las llamadas a un servicio externo con un circuit breaker y un
+    límite de concurrencia adaptativo. Las llamadas rechazadas no se envían
+    y lanzan `DependencyUnavailableError`.
+    """
+    def __init__(self, name: str, breaker: CircuitBreaker, limiter: AdaptiveConcurrencyLimiter, max_wait_seconds: float | None = None):
+        self.name = name
+        self.breaker = breaker
+        self.limiter = limiter
+        self.max_wait_seconds = max_wait_seconds
+        self.rejected = {"circuit_open": 0, "concurrency": 0}
+
+    async def call(
+        self,
+        func: Callable[[], Awaitable[Any]],
+        is_failure: Callable[[Any], bool] | None = None,
+        max_wait: float | None = _DEFAULT_WAIT
+    ) -> Any:
+        """
+        `is_failure` decide si una respuesta cuenta como fallo de la
+        dependencia (p. ej. 5xx); las excepciones siempre cuentan.
+        `max_wait` sustituye a la espera por defecto (None = sin límite).
+        """
+        if not self.breaker.try_acquire():
+            self.rejected["circuit_open"] += 1
+            raise DependencyUnavailableError(self.name, "circuit_open", self.breaker.retry_after())
+
+        wait = self.max_wait_seconds if max_wait is _DEFAULT_WAIT else max_wait
+        try:
+            acquired = await self.limiter.acquire(wait)
+        except BaseException:
+            self.breaker.release()
+            raise
+        if not acquired:
+            self.breaker.release()
+            self.rejected["concurrency"] += 1
+            raise DependencyUnavailableError(self.name, "concurrency", self.limiter.latency_target_seconds)
+
+        started = time.perf_counter()
+        try:
+            result = await func()
+        except BaseException:
+            # Incluye la cancelación por timeout del dispatcher: la dependencia va lenta
+            self.limiter.release(time.perf_counter() - started, failed=True)
+            self.breaker.record_failure()
+            raise
+
+        failed = bool(is_failure and is_failure(result))
+        self.limiter.release(time.perf_counter() - started, failed=failed)
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return result
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "retryAfterSeconds": round(self.breaker.retry_after(), 1),
+            "concurrencyLimit": self.limiter.limit,
+            "inFlight": self.limiter.in_flight,
+            "waiting": self.limiter.waiting,
+            "rejected": dict(self.rejected),
+        }
@@ -0,0 +1,72 @@
+import heapq
+import asyncio
+from typing import Dict, Iterable, List, Tuple
+
+class WakeupTimer:
+    """
+    Montículo (heap) de próximas fechas de ejecución (epoch UTC) por pago.
+
+    Las bajas y reprogramaciones son perezosas: la entrada vieja queda en el
+    heap y se descarta al llegar a la cima. `wait()` se despierta antes de
+    tiempo si se programa algo más temprano que lo que había.
+    """
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {}
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def schedule(self, key: str, due_epoch: float | None) -> None:
+        if due_epoch is None:
+            self.remove(key)
+            return
+
+        earliest = self.next_due()
+        self._due[key] = due_epoch
+        heapq.heappush(self._heap, (due_epoch, key))
+        self._compact()
+
+        if earliest is None or due_epoch < earliest:
+            self._changed.set()
+
+    def remove(self, key: str) -> None:
+        self._due.pop(key, None)
+
+    def replace_all(self, items: Iterable[Tuple[str, float]]) -> None:
+        self._due = dict(items)
+        self._heap = [(due, key) for key, due in self._due.items()]
+        heapq.heapify(self._heap)
+        self._changed.set()
+
+    def next_due(self) -> float | None:
+        while self._heap:
+            due, key = self._heap[0]
+            if self._due.get(key) == due:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def discard_due(self, now_epoch: float) -> int:
+        discarded = 0
+        while True:
+            due = self.next_due()
+            if due is None or due > now_epoch:
+                return discarded
+            _, key = heapq.heappop(self._heap)
+            self._due.pop(key, None)
+            discarded += 1
+
+    async def wait(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._changed.wait(), max(0.0, timeout))
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._changed.clear()
+
+    def _compact(self) -> None:
+        if len(self._heap) > 2 * len(self._due) + 1024:
+            self._heap = [(due, key) for key, due in self._due.items()]
+            heapq.heapify(self._heap)
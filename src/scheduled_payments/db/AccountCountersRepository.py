@@ -0,0 +1,138 @@
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import Awaitable, Callable
+
+from ..core.metrics import MONGO_OPERATION_SECONDS, timed
+
+class AccountCountersRepository:
+    """
+    Contador de pagos activos por cuenta ({_id: accountId, active: n}).
+    El límite de suscripción se aplica con un único incremento condicional.
+    """
+    def __init__(self, db):
+        self.collection = db["account_counters"]
+
+    @timed(MONGO_OPERATION_SECONDS, "account_counters.try_acquire")
+    async def try_acquire(
+        self,
+        account_id: str,
+        limit: int | None,
+        count_active: Callable[[], Awaitable[int]]
+    ) -> bool:
+        """
+        Suma un pago activo si la cuenta está por debajo de `limit` (None = sin límite).
+
+        Si no hay contador se inicializa con `count_active()`. Un contador que
+        ya existe nunca se rebaja aquí: el recuento no ve los huecos reservados
+        cuyo pago aún no se ha insertado, así que rebajarlo permitiría pasar del
+        límite con creaciones en paralelo. La desviación se corrige con `rebuild`.
+        """
+        counter_filter = {"_id": account_id}
+        if limit is not None:
+            counter_filter["active"] = {"$lt": limit}
+
+        for _ in range(2):
+            doc = await self.collection.find_one_and_update(
+                counter_filter,
+                {"$inc": {"active": 1}},
+                return_document=ReturnDocument.AFTER
+            )
+            if doc is not None:
+                return True
+            if not await self._ensure_counter(account_id, count_active):
+                return False
+
+        return False
+
+    @timed(MONGO_OPERATION_SECONDS, "account_counters.try_acquire_many")
+    async def try_acquire_many(
+        self,
+        account_id: str,
+        count: int,
+        limit: int | None,
+        count_active: Callable[[], Awaitable[int]]
+    ) -> int:
+        """
+        Reserva hasta `count` pagos activos de golpe y devuelve cuántos se
+        concedieron (los que caben por debajo de `limit`).
+
+        Primero intenta el incremento condicional completo; si no cabe todo,
+        concede los huecos libres con una comparación del valor actual. Igual
+        que `try_acquire`, solo inicializa el contador si no existe.
+        """
+        if count <= 0:
+            return 0
+
+        full_filter = {"_id": account_id}
+        if limit is not None:
+            full_filter["active"] = {"$lte": limit - count}
+        doc = await self.collection.find_one_and_update(full_filter, {"$inc": {"active": count}})
+        if doc is not None:
+            return count
+
+        for _ in range(5):
+            current = await self.collection.find_one({"_id": account_id})
+            if current is None:
+                await self._ensure_counter(account_id, count_active)
+                continue
+
+            active = current.get("active", 0)
+            grant = count if limit is None else min(count, limit - active)
+            if grant <= 0:
+                return 0
+
+            result = await self.collection.update_one({"_id": account_id, "active": active}, {"$inc": {"active": grant}})
+            if result.modified_count:
+                return grant
+
+        return 0
+
+    async def _ensure_counter(self, account_id: str, count_active: Callable[[], Awaitable[int]]) -> bool:
+        """Crea el contador si no existe; False si ya existía."""
+        if await self.collection.find_one({"_id": account_id}, {"_id": 1}) is not None:
+            return False
+        try:
+            await self.collection.insert_one({"_id": account_id, "active": await count_active()})
+        except DuplicateKeyError:
+            pass
+        return True
+
+    @timed(MONGO_OPERATION_SECONDS, "account_counters.rebuild")
+    async def rebuild(self, counts: dict[str, int], batch_size: int) -> int:
+        """
+        Fija cada contador al recuento real (`counts`: accountId -> pagos
+        activos; las cuentas que no aparecen quedan a 0). Es una reparación
+        fuera de línea: con altas en curso el recuento no ve las reservas
+        pendientes. Devuelve cuántos contadores cambiaron.
+        """
+        ops = [
+            UpdateOne({"_id": account_id, "active": {"$ne": active}}, {"$set": {"active": active}})
+            for account_id, active in counts.items()
+        ]
+        async for doc in self.collection.find({"active": {"$ne": 0}}, {"_id": 1}):
+            if doc["_id"] not in counts:
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"active": 0}}))
+
+        changed = 0
+        batch_size = max(1, batch_size)
+        for i in range(0, len(ops), batch_size):
+            result = await self.collection.bulk_write(ops[i:i + batch_size], ordered=False)
+            changed += result.modified_count
+        return changed
+
+    async def release(self, account_id: str, count: int = 1) -> None:
+        await self.apply_deltas({account_id: -count})
+
+    @timed(MONGO_OPERATION_SECONDS, "account_counters.apply_deltas")
+    async def apply_deltas(self, deltas: dict[str, int]) -> None:
+        ops = [
+            UpdateOne({"_id": account_id}, self._inc_not_negative(delta))
+            for account_id, delta in deltas.items()
+            if delta
+        ]
+        if ops:
+            await self.collection.bulk_write(ops, ordered=False)
+
+    @staticmethod
+    def _inc_not_negative(delta: int) -> list[dict]:
+        return [{"$set": {"active": {"$max": [0, {"$add": [{"$ifNull": ["$active", 0]}, delta]}]}}}]
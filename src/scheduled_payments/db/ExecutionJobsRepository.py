@@ -0,0 +1,267 @@
+from ..models.ScheduledPayments import ScheduledPaymentView, OnceSchedule
+from ..core.metrics import MONGO_OPERATION_SECONDS, timed
+from datetime import datetime, timezone, timedelta
+from dataclasses import dataclass, field
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+import random
+import uuid
+
+JOB_PENDING = "pending"
+JOB_PROCESSING = "processing"
+JOB_SUCCEEDED = "succeeded"
+JOB_DEAD = "dead"
+JOB_CANCELLED = "cancelled"
+
+JOB_CLAIM_FIELDS = {"claimedBy": "", "claimToken": "", "claimExpiresAt": ""}
+
+DUPLICATE_KEY = 11000
+
+@dataclass(frozen=True)
+class ExecutionJob:
+    id: str
+    paymentId: str
+    accountId: str
+    occurrenceDate: str
+    attempts: int
+    transfer: dict
+    authToken: str | None = None
+    claimToken: str | None = None
+
+@dataclass(frozen=True)
+class JobClaim:
+    token: str
+    found: int
+    jobs: list[ExecutionJob] = field(default_factory=list)
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 6
+    base_seconds: float = 30.0
+    max_seconds: float = 3600.0
+
+    def next_attempt_at(self, attempts: int, now: datetime) -> datetime | None:
+        """Backoff exponencial con jitter; None si ya no quedan intentos."""
+        if attempts >= self.max_attempts:
+            return None
+        delay = min(self.max_seconds, self.base_seconds * 2 ** (attempts - 1))
+        return now + timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+class JobResults:
+    """
+    Buffer de resultados de los trabajos de un tick. Se vuelca con
+    `bulk_write` desordenado; cada actualización exige el claimToken con el
+    que se reclamó el trabajo. `retries` guarda los reintentos programados
+    (id, nextAttemptAt) para avisar al temporizador del planificador.
+    """
+    def __init__(self, repository: "ExecutionJobsRepository", batch_size: int, policy: RetryPolicy):
+        self._repo = repository
+        self.batch_size = max(1, int(batch_size))
+        self.policy = policy
+        self._ops: list[UpdateOne] = []
+        self.retries: list[tuple[str, datetime]] = []
+        self.dead = 0
+
+    def __len__(self) -> int:
+        return len(self._ops)
+
+    def _update(self, job: ExecutionJob, fields: dict) -> None:
+        self._ops.append(UpdateOne(
+            {"_id": job.id, "claimToken": job.claimToken},
+            {"$set": fields, "$unset": JOB_CLAIM_FIELDS}
+        ))
+
+    def record_success(self, job: ExecutionJob, now: datetime) -> None:
+        self._update(job, {"status": JOB_SUCCEEDED, "attempts": job.attempts + 1, "updatedAt": now, "executedAt": now})
+
+    def record_failure(self, job: ExecutionJob, error: str, now: datetime) -> None:
+        attempts = job.attempts + 1
+        next_attempt = self.policy.next_attempt_at(attempts, now)
+        if next_attempt is None:
+            self.record_dead(job, error, now, attempts)
+            return
+        self.retries.append((job.id, next_attempt))
+        self._update(job, {
+            "status": JOB_PENDING, "attempts": attempts, "nextAttemptAt": next_attempt,
+            "lastError": error, "updatedAt": now,
+        })
+
+    def record_deferred(self, job: ExecutionJob, until: datetime, reason: str, now: datetime) -> None:
+        """No se llegó a enviar: vuelve a la cola sin consumir un intento."""
+        self.retries.append((job.id, until))
+        self._update(job, {"status": JOB_PENDING, "nextAttemptAt": until, "lastError": reason, "updatedAt": now})
+
+    def record_dead(self, job: ExecutionJob, error: str, now: datetime, attempts: int | None = None) -> None:
+        self.dead += 1
+        self._update(job, {
+            "status": JOB_DEAD, "attempts": attempts if attempts is not None else job.attempts + 1,
+            "lastError": error, "updatedAt": now,
+        })
+
+    async def flush(self) -> int:
+        ops, self._ops = self._ops, []
+        await self._repo._bulk_write(ops, self.batch_size)
+        return len(ops)
+
+class ExecutionJobsRepository:
+    """
+    Outbox de ejecuciones: un documento por ocurrencia vencida de un pago.
+    El _id es la clave de idempotencia "<paymentId>:<YYYY-MM-DD>", de modo
+    que encolar dos veces la misma ocurrencia no tiene efecto.
+    """
+    def __init__(self, db):
+        self.collection = db["payment_executions"]
+
+    @staticmethod
+    def occurrence_date(payment: ScheduledPaymentView, executed_at: datetime) -> str:
+        if isinstance(payment.schedule, OnceSchedule):
+            day = payment.schedule.executionDate
+        else:
+            day = executed_at
+        if day.tzinfo is not None:
+            day = day.astimezone(timezone.utc)
+        return day.strftime("%Y-%m-%d")
+
+    @classmethod
+    def job_id(cls, payment: ScheduledPaymentView, executed_at: datetime) -> str:
+        return f"{payment.id}:{cls.occurrence_date(payment, executed_at)}"
+
+    @timed(MONGO_OPERATION_SECONDS, "payment_executions.enqueue")
+    async def enqueue(
+        self,
+        payments: list[ScheduledPaymentView],
+        now: datetime,
+        occurrence_at: dict[str, datetime] | None = None,
+        attempt_at: dict[str, datetime] | None = None
+    ) -> int:
+        """
+        Crea un trabajo por pago (ocurrencia de `now`, o la indicada por id en
+        `occurrence_at`), a ejecutar ya o en el instante de `attempt_at`.
+        Devuelve cuántos son nuevos; los duplicados se ignoran.
+        """
+        if not payments:
+            return 0
+        occurrence_at = occurrence_at or {}
+        attempt_at = attempt_at or {}
+        docs = []
+        for p in payments:
+            executed_at = occurrence_at.get(p.id, now)
+            docs.append({
+                "_id": self.job_id(p, executed_at),
+                "paymentId": p.id,
+                "accountId": p.accountId,
+                "occurrenceDate": self.occurrence_date(p, executed_at),
+                "status": JOB_PENDING,
+                "attempts": 0,
+                "nextAttemptAt": attempt_at.get(p.id, now),
+                "createdAt": now,
+                "updatedAt": now,
+                "transfer": {
+                    "sender": p.accountId,
+                    "receiver": p.beneficiary.iban,
+                    "quantity": p.amount.value,
+                    "currency": p.amount.currency,
+                },
+                "authToken": p.authToken,
+            })
+
+        try:
+            result = await self.collection.insert_many(docs, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY for err in errors):
+                raise
+            return e.details.get("nInserted", len(docs) - len(errors))
+
+    @timed(MONGO_OPERATION_SECONDS, "payment_executions.claim_due_jobs")
+    async def claim_due_jobs(self, now: datetime, owner: str, lease_seconds: int, limit: int) -> JobClaim:
+        due_filter = {"status": JOB_PENDING, "nextAttemptAt": {"$lte": now}}
+        cursor = self.collection.find(due_filter, {"_id": 1}).sort("nextAttemptAt", 1).limit(max(1, int(limit)))
+        ids = [doc["_id"] async for doc in cursor]
+        token = str(uuid.uuid4())
+        if not ids:
+            return JobClaim(token, 0)
+
+        await self.collection.update_many(
+            {**due_filter, "_id": {"$in": ids}},
+            {"$set": {
+                "status": JOB_PROCESSING,
+                "claimedBy": owner,
+                "claimToken": token,
+                "claimExpiresAt": now + timedelta(seconds=lease_seconds),
+            }}
+        )
+
+        jobs = [
+            ExecutionJob(
+                id=doc["_id"],
+                paymentId=doc["paymentId"],
+                accountId=doc["accountId"],
+                occurrenceDate=doc["occurrenceDate"],
+                attempts=doc.get("attempts", 0),
+                transfer=doc["transfer"],
+                authToken=doc.get("authToken"),
+                claimToken=token,
+            )
+            async for doc in self.collection.find({"_id": {"$in": ids}, "claimToken": token}).sort("nextAttemptAt", 1)
+        ]
+        return JobClaim(token, len(ids), jobs)
+
+    @timed(MONGO_OPERATION_SECONDS, "payment_executions.expire_abandoned")
+    async def expire_abandoned(self, now: datetime) -> int:
+        """
+        Trabajos en curso cuyo lease caducó (la réplica cayó durante la
+        transferencia): el resultado es desconocido, así que no se reintentan.
+        """
+        result = await self.collection.update_many(
+            {"status": JOB_PROCESSING, "claimExpiresAt": {"$lte": now}},
+            {
+                "$set": {"status": JOB_DEAD, "lastError": "lease caducado con resultado desconocido", "updatedAt": now},
+                "$unset": JOB_CLAIM_FIELDS,
+            }
+        )
+        return result.modified_count
+
+    @timed(MONGO_OPERATION_SECONDS, "payment_executions.cancel_pending")
+    async def cancel_pending(self, payment_ids: list[str], reason: str, now: datetime) -> int:
+        """
+        Cancela las ejecuciones pendientes (nuevas o reintentos) de los pagos.
+        Las que están en curso no se tocan: su resultado se registra igualmente.
+        """
+        if not payment_ids:
+            return 0
+        result = await self.collection.update_many(
+            {"paymentId": {"$in": list(payment_ids)}, "status": JOB_PENDING},
+            {"$set": {"status": JOB_CANCELLED, "lastError": reason, "updatedAt": now}}
+        )
+        return result.modified_count
+
+    @timed(MONGO_OPERATION_SECONDS, "payment_executions.find_due_times")
+    async def find_due_times(self, until: datetime, limit: int) -> list[tuple[str, datetime]]:
+        cursor = self.collection.find(
+            {"status": JOB_PENDING, "nextAttemptAt": {"$lte": until}},
+            {"_id": 1, "nextAttemptAt": 1}
+        ).sort("nextAttemptAt", 1).limit(max(1, int(limit)))
+        return [(doc["_id"], doc["nextAttemptAt"]) async for doc in cursor]
+
+    @timed(MONGO_OPERATION_SECONDS, "payment_executions.extend_leases")
+    async def extend_leases(self, claim_tokens: list[str], now: datetime, lease_seconds: int) -> int:
+        if not claim_tokens:
+            return 0
+        result = await self.collection.update_many(
+            {"status": JOB_PROCESSING, "claimToken": {"$in": list(claim_tokens)}},
+            {"$set": {"claimExpiresAt": now + timedelta(seconds=lease_seconds)}}
+        )
+        return result.modified_count
+
+    def results(self, batch_size: int, policy: RetryPolicy) -> JobResults:
+        return JobResults(self, batch_size, policy)
+
+    @timed(MONGO_OPERATION_SECONDS, "payment_executions.bulk_write")
+    async def _bulk_write(self, ops: list[UpdateOne], batch_size: int) -> int:
+        matched = 0
+        for i in range(0, len(ops), batch_size):
+            result = await self.collection.bulk_write(ops[i:i + batch_size], ordered=False)
+            matched += result.matched_count
+        return matched
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+
+from ..core.rate_limiter import RateLimitBackend
+from ..core.metrics import MONGO_OPERATION_SECONDS, timed
+
+class RateLimitRepository(RateLimitBackend):
+    """
+    Contadores de rate limit compartidos entre réplicas.
+    Un documento por clave y ventana ({_id: "<key>|<window_start>", count, expiresAt});
+    el índice TTL sobre expiresAt los borra cuando dejan de servir.
+    """
+    def __init__(self, db):
+        self.collection = db["rate_limits"]
+
+    @timed(MONGO_OPERATION_SECONDS, "rate_limits.increment")
+    async def increment(self, key: str, window_start: int, amount: int, ttl_seconds: int) -> int:
+        expires_at = datetime.fromtimestamp(window_start, timezone.utc) + timedelta(seconds=ttl_seconds)
+        doc = await self.collection.find_one_and_update(
+            {"_id": f"{key}|{window_start}"},
+            {"$inc": {"count": amount}, "$setOnInsert": {"expiresAt": expires_at}},
+            upsert=True,
+            projection={"_id": 0, "count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["count"]
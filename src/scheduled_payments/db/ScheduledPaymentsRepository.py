@@ -1,28 +1,150 @@
-from ..models.ScheduledPayments import ScheduledPaymentCreate, ScheduledPaymentUpdate, ScheduledPaymentView, OnceSchedule, WeeklySchedule, MonthlySchedule, ScheduledPaymentUpcomingView
+from ..models.ScheduledPayments import ScheduledPaymentCreate, ScheduledPaymentUpdate, ScheduledPaymentView, OnceSchedule, WeeklySchedule, MonthlySchedule, ScheduledPaymentUpcomingView, Beneficiary, Amount
+from ..core.compiled_schedule import Instant, compile_schedule, to_us, from_us, ONCE, US_PER_DAY
+from ..core.metrics import MONGO_OPERATION_SECONDS, timed
+from .ExecutionJobsRepository import DUPLICATE_KEY
 from datetime import datetime, timezone, timedelta
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+import heapq
+import uuid
+
+CLAIM_FIELDS = {"claimedBy": "", "claimToken": "", "claimExpiresAt": ""}
+
+SCHEDULE_MODELS = {"ONCE": OnceSchedule, "WEEKLY": WeeklySchedule, "MONTHLY": MonthlySchedule}
+
+# Campos públicos de ScheduledPaymentView (sin _id ni campos internos del planificador)
+VIEW_PROJECTION = {
+    "_id": 0, "id": 1, "isActive": 1, "lastExecutionAt": 1, "authToken": 1, "accountId": 1,
+    "description": 1, "beneficiary": 1, "amount": 1, "schedule": 1, "nextExecutionAt": 1,
+}
+
+# Lo mínimo que necesita el planificador para decidir y enviar la transferencia
+SCHEDULER_PROJECTION = {
+    "_id": 0, "id": 1, "isActive": 1, "lastExecutionAt": 1, "authToken": 1, "accountId": 1,
+    "beneficiary.iban": 1, "amount": 1, "schedule": 1, "nextExecutionAt": 1,
+}
+
+@dataclass(frozen=True)
+class PaymentClaim:
+    token: str
+    found: int
+    payments: list[ScheduledPaymentView] = field(default_factory=list)
+    # Ocurrencias perdidas más antiguas que la ventana de recuperación (se saltan)
+    expired: int = 0
+
+@dataclass(frozen=True)
+class BulkInsertResult:
+    # Posición en la lista de entrada -> pago insertado / código de error de Mongo
+    inserted: dict[int, ScheduledPaymentView] = field(default_factory=dict)
+    errors: dict[int, int] = field(default_factory=dict)
+
+class ExecutionResults:
+    """
+    Buffer de ejecuciones confirmadas de un tick del planificador
+    (actualiza `lastExecutionAt`). Se vuelca con `bulk_write` desordenado
+    en lotes de `batch_size`.
+    """
+    def __init__(self, repository: "ScheduledPaymentRepository", batch_size: int):
+        self._repo = repository
+        self.batch_size = max(1, int(batch_size))
+        self._ops: list[UpdateOne] = []
+
+    def __len__(self) -> int:
+        return len(self._ops)
+
+    def record_success(self, payment_id: str, execution_time: datetime) -> None:
+        # Un reintento tardío no retrocede la última ejecución
+        self._ops.append(UpdateOne(
+            {"id": payment_id, "$or": [{"lastExecutionAt": None}, {"lastExecutionAt": {"$lt": execution_time}}]},
+            {"$set": {"lastExecutionAt": execution_time}}
+        ))
+
+    async def flush(self) -> int:
+        ops, self._ops = self._ops, []
+        await self._repo._bulk_write(ops, self.batch_size)
+        return len(ops)
 
 class ScheduledPaymentRepository:
     """
     
     """
-    def __init__(self, db):
+    def __init__(self, db, unique_ids: bool = False):
         self.collection = db["scheduled_payments"]
+        # Sin el índice único confirmado, los duplicados se buscan antes de insertar
+        self.unique_ids = unique_ids
     
-    async def insert_scheduled_payment(self, data: ScheduledPaymentCreate) -> ScheduledPaymentView | None:
-        existing = await self.collection.find_one({"id": data.id})
-        
-        if existing:
-            return None
-        
+    @timed(MONGO_OPERATION_SECONDS)
+    async def insert_scheduled_payment(self, data: ScheduledPaymentCreate, now: datetime | None = None) -> ScheduledPaymentView | None:
         scheduled_payment_doc = data.model_dump(by_alias=True)
+        scheduled_payment_doc["nextExecutionAt"] = self.next_due_at(data, now or datetime.now(timezone.utc))
         
-        result = await self.collection.insert_one(scheduled_payment_doc)
-        created_doc = await self.collection.find_one({"_id": result.inserted_id})
-        
-        created_doc["_id"] = str(created_doc["_id"])
+        if not self.unique_ids and await self.collection.find_one({"id": data.id}, {"_id": 1}):
+            return None
+
+        # Con el índice único, el DuplicateKeyError detecta los duplicados (409)
+        try:
+            await self.collection.insert_one(scheduled_payment_doc)
+        except DuplicateKeyError:
+            return None
         
-        return ScheduledPaymentView.model_validate(created_doc)
+        # Se devuelve lo mismo que se leería de Mongo, sin volver a consultarlo
+        return ScheduledPaymentView.model_validate(self._as_stored(scheduled_payment_doc))
     
+    @timed(MONGO_OPERATION_SECONDS)
+    async def insert_scheduled_payments(self, payments: list[ScheduledPaymentCreate], now: datetime | None = None) -> BulkInsertResult:
+        """
+        Inserta varios pagos con un único `insert_many` desordenado: los que
+        fallan (p. ej. id duplicado, código 11000) no impiden el resto.
+        """
+        now = now or datetime.now(timezone.utc)
+        docs = []
+        for payment in payments:
+            doc = payment.model_dump(by_alias=True)
+            doc["nextExecutionAt"] = self.next_due_at(payment, now)
+            docs.append(doc)
+        if not docs:
+            return BulkInsertResult()
+
+        errors: dict[int, int] = {}
+        if not self.unique_ids:
+            errors = await self._find_duplicates(docs)
+        pending = [(i, doc) for i, doc in enumerate(docs) if i not in errors]
+        if pending:
+            try:
+                await self.collection.insert_many([doc for _, doc in pending], ordered=False)
+            except BulkWriteError as e:
+                errors.update({pending[err["index"]][0]: err.get("code", 0) for err in e.details.get("writeErrors", [])})
+
+        inserted = {
+            i: self._construct_view(self._as_stored(doc))
+            for i, doc in enumerate(docs)
+            if i not in errors
+        }
+        return BulkInsertResult(inserted, errors)
+
+    async def _find_duplicates(self, docs: list[dict]) -> dict[int, int]:
+        """
+        Posiciones con un id ya guardado o repetido en el lote, con el mismo
+        código que daría el índice único (11000).
+        """
+        ids = [doc["id"] for doc in docs]
+        existing = await self.find_existing_ids(ids)
+        errors: dict[int, int] = {}
+        for i, payment_id in enumerate(ids):
+            if payment_id in existing:
+                errors[i] = DUPLICATE_KEY
+            existing.add(payment_id)
+        return errors
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def find_existing_ids(self, ids: list[str], **extra) -> set[str]:
+        """Ids de la lista que ya están guardados (y cumplen `extra`)."""
+        cursor = self.collection.find({"id": {"$in": ids}, **extra}, {"_id": 0, "id": 1})
+        return {doc["id"] async for doc in cursor}
+
+    @timed(MONGO_OPERATION_SECONDS)
     async def find_scheduled_payment_by_id(self, scheduled_payment_id: str) -> ScheduledPaymentView | None:
         doc = await self.collection.find_one({"id": scheduled_payment_id})
         
@@ -31,47 +153,169 @@ class ScheduledPaymentRepository:
             return ScheduledPaymentView.model_validate(doc)
         return None
     
-    async def update_scheduled_payment(self, scheduled_payment_id: str, data: ScheduledPaymentUpdate) -> ScheduledPaymentView | None:
+    @timed(MONGO_OPERATION_SECONDS)
+    async def update_scheduled_payment(self, scheduled_payment_id: str, data: ScheduledPaymentUpdate, now: datetime | None = None) -> ScheduledPaymentView | None:
         update_data = data.model_dump(exclude_unset=True, exclude_none=True)
         
         if not update_data:
             return await self.find_scheduled_payment_by_id(scheduled_payment_id)
         
-        await self.collection.update_one(
+        if data.schedule is None:
+            update = {"$set": update_data}
+        else:
+            # Pipeline: nextExecutionAt depende de isActive/lastExecutionAt ya guardados
+            update_set = {field: {"$literal": value} for field, value in update_data.items()}
+            update_set["nextExecutionAt"] = self._next_due_expression(
+                data.schedule, now or datetime.now(timezone.utc)
+            )
+            update = [{"$set": update_set}]
+        
+        doc = await self.collection.find_one_and_update(
             {"id": scheduled_payment_id},
-            {"$set": update_data}
+            update,
+            projection=VIEW_PROJECTION,
+            return_document=ReturnDocument.AFTER
             )
         
-        return await self.find_scheduled_payment_by_id(scheduled_payment_id)
+        if doc is None:
+            return None
+        return ScheduledPaymentView.model_validate(doc)
     
-    async def delete_scheduled_payment(self, scheduled_payment_id: str) -> bool:
-        result = await self.collection.delete_one(
-            {"id": scheduled_payment_id}
+    @timed(MONGO_OPERATION_SECONDS)
+    async def delete_scheduled_payment(self, scheduled_payment_id: str) -> dict | None:
+        """Devuelve {accountId, isActive} del pago borrado, o None si no existía."""
+        return await self.collection.find_one_and_delete(
+            {"id": scheduled_payment_id},
+            projection={"_id": 0, "accountId": 1, "isActive": 1}
         )
-
-        return result.deleted_count == 1
     
-    async def find_payments_to_execute(self, now: datetime) -> list[ScheduledPaymentView]:
-        cursor = self.collection.find({"isActive": True})
-
-        results: list[ScheduledPaymentView] = []
+    @staticmethod
+    def _account_filter(account_id: str, frequency: str | None = None, **extra) -> dict:
+        query = {"accountId": account_id, **extra}
+        if frequency is not None:
+            query["schedule.frequency"] = frequency
+        return query
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def find_payment_ids_by_account_id(self, account_id: str, frequency: str | None = None, **extra) -> list[str]:
+        cursor = self.collection.find(self._account_filter(account_id, frequency, **extra), {"_id": 0, "id": 1})
+        return [doc["id"] async for doc in cursor]
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def deactivate_payments_by_account_id(self, account_id: str, frequency: str | None = None) -> int:
+        """Desactiva de una vez los pagos activos de la cuenta; devuelve cuántos cambiaron."""
+        result = await self.collection.update_many(
+            self._account_filter(account_id, frequency, isActive=True),
+            {"$set": {"isActive": False, "nextExecutionAt": None}}
+        )
+        return result.modified_count
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def reactivate_payments(self, next_execution: dict[str, datetime | None], batch_size: int) -> int:
+        """
+        Reactiva los pagos (id -> próxima ejecución) que sigan inactivos. La
+        próxima ejecución depende de la planificación de cada pago, así que
+        va un `bulk_write` desordenado por bloque en lugar de un update_many.
+        """
+        updates = [
+            UpdateOne({"id": payment_id, "isActive": False}, {"$set": {"isActive": True, "nextExecutionAt": due}})
+            for payment_id, due in next_execution.items()
+        ]
+        batch_size = max(1, batch_size)
+        modified = 0
+        for i in range(0, len(updates), batch_size):
+            result = await self.collection.bulk_write(updates[i:i + batch_size], ordered=False)
+            modified += result.modified_count
+        return modified
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def find_inactive_payments_by_account_id(
+        self,
+        account_id: str,
+        now: datetime,
+        frequency: str | None = None
+    ) -> list[ScheduledPaymentView]:
+        """
+        Pagos inactivos de la cuenta ordenados por id, ya marcados como activos
+        para calcular su próxima ejecución. Se excluyen los que están reservados
+        y los ONCE cuya fecha ya pasó: se ejecutaron, están en el outbox o
+        vencieron mientras estaban inactivos, y no volverán a ejecutarse.
+        """
+        query = self._account_filter(account_id, frequency, isActive=False, pendingExecutionAt={"$exists": False})
+        query["$nor"] = [{"schedule.frequency": "ONCE", "schedule.executionDate": {"$lte": self._to_utc_aware(now)}}]
+        cursor = self.collection.find(
+            query,
+            {"_id": 0, "id": 1, "accountId": 1, "lastExecutionAt": 1, "schedule": 1}
+        ).sort("id", 1)
+        return [self._construct_view(doc, isActive=True) async for doc in cursor]
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def delete_payments_by_account_id(self, account_id: str, frequency: str | None = None) -> tuple[int, int]:
+        """
+        Borra los pagos de la cuenta; devuelve (activos borrados, total borrados).
+        Los activos se borran aparte para ajustar el contador con el número exacto.
+        """
+        active = await self.collection.delete_many(self._account_filter(account_id, frequency, isActive=True))
+        rest = await self.collection.delete_many(self._account_filter(account_id, frequency))
+        return active.deleted_count, active.deleted_count + rest.deleted_count
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def find_due_times(self, until: datetime, limit: int) -> list[tuple[str, datetime]]:
+        cursor = self.collection.find(
+            {"isActive": True, "nextExecutionAt": {"$lte": self._to_utc_aware(until)}},
+            {"_id": 0, "id": 1, "nextExecutionAt": 1}
+        ).sort("nextExecutionAt", 1).limit(max(1, int(limit)))
+
+        return [(doc["id"], doc["nextExecutionAt"]) async for doc in cursor]
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def backfill_next_execution(self, now: datetime) -> int:
+        cursor = self.collection.find({"isActive": True, "nextExecutionAt": {"$exists": False}})
+
+        updates: list[UpdateOne] = []
         async for doc in cursor:
             payment = ScheduledPaymentView.model_validate(doc)
+            updates.append(UpdateOne(
+                {"id": payment.id},
+                {"$set": {"nextExecutionAt": self.next_due_at(payment, now)}}
+            ))
 
-            if self._should_execute(payment, now):
-                results.append(payment)
+        if updates:
+            await self.collection.bulk_write(updates, ordered=False)
 
-        return results
+        return len(updates)
     
-    async def find_payments_by_account_id(self, account_id: str) -> list[ScheduledPaymentView]:
-        cursor = self.collection.find({"accountId": account_id})
-        results: list[ScheduledPaymentView] = []
-
-        async for doc in cursor:
-            results.append(ScheduledPaymentView.model_validate(doc))
+    @timed(MONGO_OPERATION_SECONDS)
+    async def find_payments_by_account_id(
+        self,
+        account_id: str,
+        limit: int | None = None,
+        after: str | None = None
+    ) -> list[ScheduledPaymentView]:
+        cursor = self._account_cursor(account_id, limit, after)
+        return [self._construct_view(doc) async for doc in cursor]
 
-        return results
+    async def iter_payments_by_account_id(
+        self,
+        account_id: str,
+        limit: int | None = None,
+        after: str | None = None
+    ) -> AsyncIterator[ScheduledPaymentView]:
+        """Como `find_payments_by_account_id` pero documento a documento, sin montar la lista."""
+        async for doc in self._account_cursor(account_id, limit, after):
+            yield self._construct_view(doc)
+
+    def _account_cursor(self, account_id: str, limit: int | None, after: str | None):
+        # Paginación por clave (accountId, id): usa el índice accountId_id y no hace skip
+        query: dict = {"accountId": account_id}
+        if after is not None:
+            query["id"] = {"$gt": after}
+        cursor = self.collection.find(query, VIEW_PROJECTION).sort("id", 1)
+        if limit is not None:
+            cursor = cursor.limit(max(1, int(limit)))
+        return cursor
     
+    @timed(MONGO_OPERATION_SECONDS)
     async def find_upcoming_payments_for_account(
         self,
         account_id: str,
@@ -79,81 +323,281 @@ class ScheduledPaymentRepository:
         limit: int
     ) -> list[ScheduledPaymentUpcomingView]:
 
-        now = self._to_utc_aware(now)
+        now_us = to_us(self._to_utc_aware(now))
 
-        cursor = self.collection.find({"isActive": True, "accountId": account_id})
+        cursor = self.collection.find({"isActive": True, "accountId": account_id}, VIEW_PROJECTION)
 
-        upcoming: list[ScheduledPaymentUpcomingView] = []
+        candidates: list[tuple[int, dict]] = []
 
         async for doc in cursor:
-            payment = ScheduledPaymentView.model_validate(doc)
-            next_dt = self._next_execution(payment, now)
-            if next_dt is None:
+            last = doc.get("lastExecutionAt")
+            sched = self._construct_schedule(doc["schedule"])
+            next_us = compile_schedule(sched).next_upcoming(now_us, to_us(last) if last else None)
+            if next_us is None:
                 continue
+            doc["schedule"] = sched
+            candidates.append((next_us, doc))
+
+        # Solo se construyen las vistas que se van a devolver
+        return [
+            self._construct_view(doc, ScheduledPaymentUpcomingView, nextExecutionAt=from_us(next_us))
+            for next_us, doc in heapq.nsmallest(limit, candidates, key=lambda c: c[0])
+        ]
+
+
+
+    def _should_execute(self, payment: ScheduledPaymentView, now: datetime | Instant, catch_up_seconds: float = 0) -> bool:
+        """
+        Para los recurrentes la ocurrencia es la de `nextExecutionAt`: la de hoy
+        siempre y, si es de un día anterior (servicio caído, tick que cruzó la
+        medianoche), solo si cae dentro de los últimos `catch_up_seconds`.
+        """
+        if not isinstance(now, Instant):
+            now = Instant(self._to_utc_aware(now))
+        last_us = to_us(payment.lastExecutionAt) if payment.lastExecutionAt else None
+        sched = compile_schedule(payment.schedule)
+        if sched.kind == ONCE or payment.nextExecutionAt is None:
+            return sched.is_due(now, last_us)
+
+        due_us = to_us(payment.nextExecutionAt)
+        if due_us > now.us or not sched.is_occurrence(due_us):
+            return False
+        # Ventana por días completos, igual que la reprogramación de las que quedan fuera
+        return due_us // US_PER_DAY >= (now.us - int(catch_up_seconds * 1_000_000)) // US_PER_DAY
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def claim_due_payments(
+        self,
+        now: datetime,
+        owner: str,
+        lease_seconds: int,
+        limit: int,
+        catch_up_seconds: float = 0
+    ) -> PaymentClaim:
+        """
+        Reclama atómicamente (con lease) hasta `limit` pagos vencidos que no
+        estén reclamados por otra réplica o cuyo lease haya caducado.
+
+        Las ocurrencias perdidas dentro de `catch_up_seconds` se devuelven para
+        ejecutarlas; las más antiguas se saltan hasta la primera que entra en
+        la ventana (o la siguiente futura).
+        """
+        now = self._to_utc_aware(now)
+        due_filter = {
+            "isActive": True,
+            "nextExecutionAt": {"$lte": now},
+            "$or": [{"claimExpiresAt": None}, {"claimExpiresAt": {"$lte": now}}],
+        }
+
+        cursor = self.collection.find(due_filter, {"id": 1}).limit(max(1, int(limit)))
+        ids = [doc["id"] async for doc in cursor]
+        token = str(uuid.uuid4())
+        if not ids:
+            return PaymentClaim(token, 0)
+
+        await self.collection.update_many(
+            {**due_filter, "id": {"$in": ids}},
+            {"$set": {
+                "claimedBy": owner,
+                "claimToken": token,
+                "claimExpiresAt": now + timedelta(seconds=lease_seconds),
+            }}
+        )
 
-            upcoming.append(
-                ScheduledPaymentUpcomingView(**payment.model_dump(), nextExecutionAt=next_dt)
-            )
+        instant = Instant(now)
+        payments: list[ScheduledPaymentView] = []
+        stale: list[UpdateOne] = []
+        async for doc in self.collection.find({"id": {"$in": ids}, "claimToken": token}, SCHEDULER_PROJECTION):
+            payment = self._construct_view(doc)
 
-        upcoming.sort(key=lambda p: p.nextExecutionAt)
-        return upcoming[:limit]
+            if self._should_execute(payment, instant, catch_up_seconds):
+                payments.append(payment)
+            else:
+                stale.append(UpdateOne(
+                    {"id": payment.id, "claimToken": token},
+                    {
+                        "$set": {"nextExecutionAt": self.next_due_at(payment, now - timedelta(seconds=catch_up_seconds))},
+                        "$unset": CLAIM_FIELDS,
+                    }
+                ))
+
+        if stale:
+            await self.collection.bulk_write(stale, ordered=False)
+
+        return PaymentClaim(token, len(ids), payments, expired=len(stale))
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def reserve_executions(
+        self,
+        payments: list[ScheduledPaymentView],
+        now: datetime,
+        batch_size: int,
+        claim_token: str | None = None
+    ) -> list[ScheduledPaymentView]:
+        """
+        Antes de encolar la ejecución se avanza `nextExecutionAt` a la
+        ocurrencia siguiente a la reservada y se guarda esta en
+        `pendingExecutionAt`. Si el proceso cae antes de encolarla,
+        `find_unreleased_reservations` permite recuperarla (la clave de
+        idempotencia del outbox evita duplicados).
+
+        Los pagos ONCE se desactivan ya en la reserva.
+        Devuelve solo los pagos efectivamente reservados.
+        """
+        ops = []
+        for p in payments:
+            flt = {"id": p.id, "nextExecutionAt": p.nextExecutionAt}
+            if claim_token is not None:
+                flt["claimToken"] = claim_token
+            occurrence_at = self.occurrence_at(p, now)
+            reservation = {
+                "nextExecutionAt": self.next_due_after_execution(p, occurrence_at),
+                "pendingExecutionAt": occurrence_at,
+            }
+            if isinstance(p.schedule, OnceSchedule):
+                # Un ONCE deja de contar como activo en cuanto se reserva su única ejecución
+                reservation["isActive"] = False
+            ops.append(UpdateOne(flt, {"$set": reservation}))
+
+        matched = await self._bulk_write(ops, batch_size)
+        if matched == len(payments):
+            return payments
+
+        # Alguno cambió (o perdió el lease) entre la reclamación y la reserva
+        reserved_filter = {"id": {"$in": [p.id for p in payments]}, "pendingExecutionAt": {"$exists": True}}
+        if claim_token is not None:
+            reserved_filter["claimToken"] = claim_token
+        reserved_ids = {doc["id"] async for doc in self.collection.find(reserved_filter, {"id": 1})}
+        return [p for p in payments if p.id in reserved_ids]
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def release_reservations(self, ids: list[str], claim_token: str) -> None:
+        """Tras encolar las ejecuciones: quita la marca de reserva y el lease."""
+        if not ids:
+            return
+        await self.collection.update_many(
+            {"id": {"$in": ids}, "claimToken": claim_token},
+            {"$unset": {"pendingExecutionAt": "", **CLAIM_FIELDS}}
+        )
 
+    @timed(MONGO_OPERATION_SECONDS)
+    async def find_unreleased_reservations(self, now: datetime, limit: int) -> list[tuple[ScheduledPaymentView, datetime]]:
+        """Reservas de réplicas caídas antes de encolar (lease caducado)."""
+        cursor = self.collection.find(
+            {
+                "pendingExecutionAt": {"$exists": True},
+                "$or": [{"claimExpiresAt": None}, {"claimExpiresAt": {"$lte": self._to_utc_aware(now)}}],
+            },
+            {**SCHEDULER_PROJECTION, "pendingExecutionAt": 1}
+        ).limit(max(1, int(limit)))
+        return [(self._construct_view(doc), doc["pendingExecutionAt"]) async for doc in cursor]
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def clear_reservations(self, reservations: list[tuple[str, datetime]], batch_size: int) -> int:
+        """Quita las reservas recuperadas, solo si nadie las ha vuelto a reservar."""
+        ops = [
+            UpdateOne(
+                {"id": payment_id, "pendingExecutionAt": reserved_at},
+                {"$unset": {"pendingExecutionAt": "", **CLAIM_FIELDS}}
+            )
+            for payment_id, reserved_at in reservations
+        ]
+        return await self._bulk_write(ops, batch_size)
+
+    def execution_results(self, batch_size: int) -> ExecutionResults:
+        return ExecutionResults(self, batch_size)
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def _bulk_write(self, ops: list[UpdateOne], batch_size: int) -> int:
+        batch_size = max(1, int(batch_size))
+        matched = 0
+        for i in range(0, len(ops), batch_size):
+            result = await self.collection.bulk_write(ops[i:i + batch_size], ordered=False)
+            matched += result.matched_count
+        return matched
+
+    def next_due_at(self, payment: ScheduledPaymentCreate | ScheduledPaymentView, now: datetime) -> datetime | None:
+        if not payment.isActive:
+            return None
+        return self._next_due_at(payment.schedule, payment.lastExecutionAt, now)
 
+    @staticmethod
+    def occurrence_at(payment: ScheduledPaymentView, now: datetime) -> datetime:
+        """Instante de la ocurrencia que se ejecuta: la de `nextExecutionAt` (o `now` sin él)."""
+        if isinstance(payment.schedule, OnceSchedule):
+            return payment.schedule.executionDate
+        return payment.nextExecutionAt or now
 
-    def _should_execute(self, payment: ScheduledPaymentView, now: datetime) -> bool:
-        sched = payment.schedule
+    def next_due_after_execution(self, payment: ScheduledPaymentView, execution_time: datetime) -> datetime | None:
+        if isinstance(payment.schedule, OnceSchedule):
+            return None
+        return self.next_due_at(payment.model_copy(update={"lastExecutionAt": execution_time}), execution_time)
+
+    def _next_due_at(self, sched, last_execution_at: datetime | None, now: datetime) -> datetime | None:
+        """
+        Primer instante en el que `_should_execute` pasará a ser cierto.
+        Para pagos recurrentes es el inicio (UTC) del día de la ocurrencia,
+        acotado por startDate; la ocurrencia de hoy cuenta si aún no se ejecutó.
+        """
+        last_us = to_us(last_execution_at) if last_execution_at else None
+        due_us = compile_schedule(sched).next_due(to_us(now), last_us)
+        return from_us(due_us) if due_us is not None else None
+
+    def _construct_schedule(self, sched):
+        if not isinstance(sched, dict):
+            return sched
+        return SCHEDULE_MODELS[sched.get("frequency")].model_construct(**sched)
+
+    def _construct_view(self, doc: dict, view_cls=ScheduledPaymentView, **overrides):
+        """
+        Construye la vista sin validar: los documentos se validaron al
+        escribirse. Solo para lecturas de datos propios de la colección.
+        """
+        values = {k: doc[k] for k in view_cls.model_fields if k in doc}
+        if isinstance(values.get("beneficiary"), dict):
+            values["beneficiary"] = Beneficiary.model_construct(**values["beneficiary"])
+        if isinstance(values.get("amount"), dict):
+            values["amount"] = Amount.model_construct(**values["amount"])
+        if "schedule" in values:
+            values["schedule"] = self._construct_schedule(values["schedule"])
+        values.update(overrides)
+        return view_cls.model_construct(**values)
+
+    def _next_due_expression(self, sched, now: datetime) -> dict:
+        """
+        Expresión de agregación equivalente a `next_due_at` con el isActive y
+        lastExecutionAt del documento: los dos posibles resultados se calculan
+        aquí y Mongo elige según lo guardado.
+        """
         now = self._to_utc_aware(now)
-        today = now.date()
+        not_executed = self._next_due_at(sched, None, now)
 
-        # ONCE
         if isinstance(sched, OnceSchedule):
-            if payment.lastExecutionAt is not None:
-                return False
-            exec_dt = self._to_utc_aware(sched.executionDate)
-            return exec_dt <= now
-
-        # MONTHLY
-        if isinstance(sched, MonthlySchedule):
-            start = self._to_utc_aware(sched.startDate)
-            end = self._to_utc_aware(sched.endDate)
-            if now < start or now > end:
-                return False
-
-            if payment.lastExecutionAt:
-                last = self._to_utc_aware(payment.lastExecutionAt)
-                if last.date() == today:
-                    return False
-
-            return now.day == sched.dayOfMonth
-
-        # WEEKLY
-        if isinstance(sched, WeeklySchedule):
-            start = self._to_utc_aware(sched.startDate)
-            end = self._to_utc_aware(sched.endDate)
-            if now < start or now > end:
-                return False
-
-            if payment.lastExecutionAt:
-                last = self._to_utc_aware(payment.lastExecutionAt)
-                if last.date() == today:
-                    return False
-
-            weekday_name = now.strftime("%A").upper()
-            days = [d.upper() for d in sched.daysOfWeek]
-
-            return weekday_name in days
-
-        return False
-
-    async def mark_once_payment_executed(self, scheduled_payment_id: str, execution_time: datetime, deactivate: bool) -> None:
-        update = {"lastExecutionAt": execution_time}
-        if deactivate:
-            update["isActive"] = False
-
-        await self.collection.update_one(
-            {"id": scheduled_payment_id},
-            {"$set": update},
-        )
+            executed_condition = {"$gt": ["$lastExecutionAt", None]}
+            executed = None
+        else:
+            first_day = max(now, self._to_utc_aware(sched.startDate)).date()
+            threshold = datetime(first_day.year, first_day.month, first_day.day, tzinfo=timezone.utc)
+            executed_condition = {"$gte": ["$lastExecutionAt", threshold]}
+            executed = self._next_due_at(sched, threshold, now)
+
+        return {"$cond": [
+            {"$eq": ["$isActive", False]},
+            None,
+            {"$cond": [executed_condition, executed, not_executed]},
+        ]}
+
+    def _as_stored(self, value):
+        # Mongo guarda los datetimes en UTC con precisión de milisegundos y los devuelve naive
+        if isinstance(value, dict):
+            return {k: self._as_stored(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._as_stored(v) for v in value]
+        if isinstance(value, datetime):
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            return value.replace(microsecond=value.microsecond // 1000 * 1000)
+        return value
 
     def _to_utc_aware(self, dt: datetime) -> datetime:
         if dt.tzinfo is None:
@@ -161,86 +605,18 @@ class ScheduledPaymentRepository:
         return dt.astimezone(timezone.utc)
     
     def _next_execution(self, payment: ScheduledPaymentView, now: datetime) -> datetime | None:
-        sched = payment.schedule
-        now = self._to_utc_aware(now)
-
-        last_exec = self._to_utc_aware(payment.lastExecutionAt) if payment.lastExecutionAt else None
-
-        # ONCE
-        if isinstance(sched, OnceSchedule):
-            if payment.lastExecutionAt is not None:
-                return None
-            exec_dt = self._to_utc_aware(sched.executionDate)
-            return exec_dt if exec_dt >= now else None
-
-        # MONTHLY
-        if isinstance(sched, MonthlySchedule):
-            start = self._to_utc_aware(sched.startDate)
-            end = self._to_utc_aware(sched.endDate)
-            if now < start:
-                base = start
-            else:
-                base = now
-
-            for month_jump in range(0, 3): 
-                year = base.year
-                month = base.month + month_jump
-                while month > 12:
-                    month -= 12
-                    year += 1
-
-                day = sched.dayOfMonth
-                try:
-                    candidate = datetime(year, month, day, tzinfo=timezone.utc)
-                except ValueError:
-                    continue
-
-                if candidate < start or candidate > end:
-                    continue
-                if candidate < now:
-                    continue
-                if last_exec and last_exec.date() == candidate.date():
-                    continue
-
-                return candidate
-
-            return None
-
-        # WEEKLY
-        if isinstance(sched, WeeklySchedule):
-            start = self._to_utc_aware(sched.startDate)
-            end = self._to_utc_aware(sched.endDate)
-            if now > end:
-                return None
-
-            base = max(now, start)
-
-            days = [d.upper() for d in sched.daysOfWeek]
-            if not days:
-                return None
-
-            for i in range(0, 14):
-                candidate = (base + timedelta(days=i)).replace(
-                    hour=0, minute=0, second=0, microsecond=0
-                )
-                if candidate > end:
-                    break
-
-                weekday_name = candidate.strftime("%A").upper()
-                if weekday_name not in days:
-                    continue
-
-                if candidate < now:
-                    continue
-
-                if last_exec and last_exec.date() == candidate.date():
-                    continue
-
-                return candidate
-
-            return None
-
-        return None
+        last_us = to_us(payment.lastExecutionAt) if payment.lastExecutionAt else None
+        next_us = compile_schedule(payment.schedule).next_upcoming(to_us(now), last_us)
+        return from_us(next_us) if next_us is not None else None
 
+    @timed(MONGO_OPERATION_SECONDS)
     async def count_active_payments_by_account_id(self, account_id: str) -> int:
         return await self.collection.count_documents({"accountId": account_id, "isActive": True})
+
+    @timed(MONGO_OPERATION_SECONDS)
+    async def count_active_payments_by_account(self) -> dict[str, int]:
+        cursor = self.collection.aggregate([
+            {"$match": {"isActive": True}},
+            {"$group": {"_id": "$accountId", "active": {"$sum": 1}}},
+        ])
+        return {doc["_id"]: doc["active"] async for doc in cursor}
@@ -0,0 +1,107 @@
+from dataclasses import dataclass, field
+from logging import getLogger
+from pymongo.errors import OperationFailure
+
+logger = getLogger(__name__)
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    name: str
+    keys: list[tuple[str, int]]
+    options: dict = field(default_factory=dict)
+
+@dataclass
+class IndexReport:
+    created: list[str] = field(default_factory=list)
+    existing: list[str] = field(default_factory=list)
+    conflicts: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.conflicts
+
+# Claves del índice único sobre `id` de scheduled_payments
+UNIQUE_ID_KEYS = [("id", 1)]
+
+INDEXES: list[IndexSpec] = [
+    # find_one({"id"}), update/delete por id y detección de duplicados (409) al insertar
+    IndexSpec("scheduled_payments", "id_unique", UNIQUE_ID_KEYS, {"unique": True}),
+    # find_upcoming ({"isActive", "accountId"}) y count_documents({"accountId", "isActive"})
+    IndexSpec("scheduled_payments", "accountId_isActive", [("accountId", 1), ("isActive", 1)]),
+    # Listado por cuenta con paginación por cursor: {accountId, id: {$gt: after}} ordenado por id
+    IndexSpec("scheduled_payments", "accountId_id", [("accountId", 1), ("id", 1)]),
+    # Scheduler: {isActive: true, nextExecutionAt: {$lte: now}}
+    IndexSpec("scheduled_payments", "isActive_nextExecutionAt", [("isActive", 1), ("nextExecutionAt", 1)]),
+    # Recuperación tras caída: reservas que nunca llegaron al outbox
+    IndexSpec("scheduled_payments", "pendingExecutionAt", [("pendingExecutionAt", 1)], {"sparse": True}),
+    # Outbox de ejecuciones: {status: "pending", nextAttemptAt: {$lte: now}} y leases caducados
+    IndexSpec("payment_executions", "status_nextAttemptAt", [("status", 1), ("nextAttemptAt", 1)]),
+    IndexSpec("payment_executions", "status_claimExpiresAt", [("status", 1), ("claimExpiresAt", 1)]),
+    # Historial de ejecuciones de un pago
+    IndexSpec("payment_executions", "paymentId", [("paymentId", 1)]),
+    # Los contadores compartidos del rate limit caducan solos
+    IndexSpec("rate_limits", "expiresAt_ttl", [("expiresAt", 1)], {"expireAfterSeconds": 0}),
+]
+
+# Opciones que deben coincidir para que un índice existente se considere equivalente
+_COMPARED_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+def _options_match(spec: IndexSpec, info: dict) -> bool:
+    for option in _COMPARED_OPTIONS:
+        expected = spec.options.get(option)
+        actual = info.get(option)
+        if option in ("unique", "sparse"):
+            expected, actual = bool(expected), bool(actual)
+        if expected != actual:
+            return False
+    return True
+
+async def ensure_indexes(db, specs: list[IndexSpec] = INDEXES) -> IndexReport:
+    """
+    Crea los índices que falten. Es idempotente: los índices equivalentes
+    (mismas claves y opciones) se dejan tal cual y los que entran en conflicto
+    se reportan, nunca se borran.
+    """
+    report = IndexReport()
+    info_by_collection: dict[str, dict] = {}
+
+    for spec in specs:
+        if spec.collection not in info_by_collection:
+            info_by_collection[spec.collection] = await db[spec.collection].index_information()
+        existing = info_by_collection[spec.collection]
+        label = f"{spec.collection}.{spec.name}"
+
+        same_keys = [(name, info) for name, info in existing.items() if list(info["key"]) == spec.keys]
+        if same_keys:
+            name, info = same_keys[0]
+            if _options_match(spec, info):
+                report.existing.append(label)
+            else:
+                report.conflicts.append(f"{label} ('{name}' tiene las mismas claves con otras opciones)")
+            continue
+
+        if spec.name in existing:
+            report.conflicts.append(f"{label} (ya existe un índice con este nombre y otras claves)")
+            continue
+
+        try:
+            await db[spec.collection].create_index(spec.keys, name=spec.name, **spec.options)
+            report.created.append(label)
+        except OperationFailure as e:
+            # p. ej. valores duplicados que impiden crear un índice único
+            report.conflicts.append(f"{label} ({e})")
+
+    if report.created:
+        logger.info("Índices creados: %s", ", ".join(report.created))
+    if report.existing:
+        logger.debug("Índices ya existentes: %s", ", ".join(report.existing))
+    for conflict in report.conflicts:
+        logger.error("Conflicto de índice: %s", conflict)
+
+    return report
+
+async def has_unique_index(db, collection: str, keys: list[tuple[str, int]]) -> bool:
+    """True si la colección tiene un índice único con exactamente esas claves (sea cual sea su nombre)."""
+    info = await db[collection].index_information()
+    return any(list(index["key"]) == keys and index.get("unique") for index in info.values())
@@ -1,8 +1,17 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List, Literal, Union
-from datetime import datetime
+from pydantic import BaseModel, Field, ConfigDict, PlainSerializer
+from typing import Annotated, Optional, List, Literal, Union
+from datetime import datetime, timezone
 import uuid
 
+def _utc_isoformat(value: datetime) -> str:
+    # Mongo devuelve los datetimes naive (en UTC): todas las respuestas salen con "Z"
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+# datetime que en JSON siempre se serializa en UTC con zona horaria explícita
+UtcDatetime = Annotated[datetime, PlainSerializer(_utc_isoformat, return_type=str, when_used="json")]
+
 class Beneficiary(BaseModel):
     name: str = Field(..., description="Nombre del beneficiario del pago.")
     iban: str = Field(..., description="IBAN del beneficiario que recibirá la transferencia.")
@@ -14,18 +23,18 @@ class Amount(BaseModel):
 class MonthlySchedule(BaseModel):
     frequency: Literal["MONTHLY"] = Field("MONTHLY", description="Frecuencia mensual.")
     dayOfMonth: int = Field(..., ge=1, le=31, description="Día del mes en el que se ejecuta el pago (1-31).")
-    startDate: datetime = Field(..., description="Fecha de inicio del periodo de validez del pago.")
-    endDate: datetime = Field(..., description="Fecha de fin del periodo de validez del pago.")
+    startDate: UtcDatetime = Field(..., description="Fecha de inicio del periodo de validez del pago.")
+    endDate: UtcDatetime = Field(..., description="Fecha de fin del periodo de validez del pago.")
 
 class WeeklySchedule(BaseModel):
     frequency: Literal["WEEKLY"] = Field("WEEKLY", description="Frecuencia semanal.")
     daysOfWeek: List[str] = Field(..., description="Días de la semana en los que se ejecuta el pago (por ejemplo: ['MONDAY','FRIDAY']).")
-    startDate: datetime = Field(..., description="Fecha de inicio del periodo de validez del pago.")
-    endDate: datetime = Field(..., description="Fecha de fin del periodo de validez del pago.")
+    startDate: UtcDatetime = Field(..., description="Fecha de inicio del periodo de validez del pago.")
+    endDate: UtcDatetime = Field(..., description="Fecha de fin del periodo de validez del pago.")
 
 class OnceSchedule(BaseModel):
     frequency: Literal["ONCE"] = Field("ONCE", description="Pago de una única ejecución.")
-    executionDate: datetime = Field(..., description="Fecha/hora exacta en la que se ejecuta el pago.")
+    executionDate: UtcDatetime = Field(..., description="Fecha/hora exacta en la que se ejecuta el pago.")
 
 Schedule = Union[MonthlySchedule, WeeklySchedule, OnceSchedule]
 
@@ -34,7 +43,7 @@ class ScheduledPaymentBase(BaseModel):
         description="Identificador único del pago programado (UUID)."
     )
     isActive: bool = Field(True, description="Indica si el pago está activo y puede ejecutarse.")
-    lastExecutionAt: Optional[datetime] = Field(
+    lastExecutionAt: Optional[UtcDatetime] = Field(
         None,
         description="Marca temporal de la última ejecución (si se ha ejecutado alguna vez)."
     )
@@ -63,7 +72,10 @@ class ScheduledPaymentUpdate(BaseModel):
 
 class ScheduledPaymentView(ScheduledPaymentBase):
     """Vista completa de un pago programado."""
-    pass
+    nextExecutionAt: Optional[UtcDatetime] = Field(
+        None,
+        description="Próxima fecha/hora en la que el planificador ejecutará el pago (calculada por el servicio)."
+    )
 
 class ScheduledPaymentUpcomingView(ScheduledPaymentView):
-    nextExecutionAt: datetime = Field(..., description="Próxima fecha/hora calculada de ejecución.")
\ No newline at end of file
+    nextExecutionAt: UtcDatetime = Field(..., description="Próxima fecha/hora calculada de ejecución.")
\ No newline at end of file
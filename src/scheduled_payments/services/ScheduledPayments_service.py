@@ -1,16 +1,37 @@
 from ..models.ScheduledPayments import ScheduledPaymentCreate, ScheduledPaymentUpdate, ScheduledPaymentView, ScheduledPaymentUpcomingView
-from ..db.ScheduledPaymentsRepository import ScheduledPaymentRepository
+from ..db.ScheduledPaymentsRepository import ScheduledPaymentRepository, ExecutionResults, PaymentClaim
+from ..db.AccountCountersRepository import AccountCountersRepository
+from ..db.ExecutionJobsRepository import ExecutionJobsRepository, ExecutionJob, JobResults, RetryPolicy, DUPLICATE_KEY
 from ..core import extensions as ext
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 import httpx
 from logging import getLogger
 from ..core.config import settings
-from ..models.ScheduledPayments import OnceSchedule
 from urllib.parse import quote
+from ..core.dispatcher import BoundedDispatcher, DispatchStats
+from ..core.fair_queue import FairDispatchQueue
+from ..core import metrics
+from ..core.resilience import DependencyGuard, DependencyUnavailableError
+import os
+import socket
+import time
+from collections import Counter
+from dataclasses import dataclass, replace
+import asyncio
+from typing import AsyncIterator
 
 logger = getLogger(__name__)
 logger.setLevel(settings.LOG_LEVEL)
 
+SCHEDULER_OWNER = settings.SCHEDULER_INSTANCE_ID or f"{socket.gethostname()}-{os.getpid()}"
+
+# Respuestas del Transfers Service que se reintentan además de los 5xx
+RETRYABLE_STATUS = {408, 409, 423, 425, 429}
+
+def _is_overloaded(resp: httpx.Response) -> bool:
+    # Cuentan como fallo de la dependencia para el circuit breaker y el límite adaptativo
+    return resp.status_code >= 500 or resp.status_code == 429
+
 class AccountNotFoundError(Exception):
     pass
 
@@ -19,80 +40,610 @@ class SubscriptionLimitReachedError(Exception):
         self.subscription = subscription
         self.limit = limit
         super().__init__(f"Límite alcanzado para plan {subscription}: {limit}")
+# Resultado por pago de la creación masiva
+BULK_CREATED = "created"
+BULK_DUPLICATE = "duplicate"
+BULK_ACCOUNT_NOT_FOUND = "account_not_found"
+BULK_LIMIT_REACHED = "limit_reached"
+BULK_DEPENDENCY_UNAVAILABLE = "dependency_unavailable"
+BULK_ERROR = "error"
+
+@dataclass(frozen=True)
+class BulkCreateResult:
+    id: str
+    outcome: str
+    error: str | None = None
+    payment: ScheduledPaymentView | None = None
+
+@dataclass(frozen=True)
+class AccountOperationResult:
+    affected: int
+    cancelled_executions: int = 0
+    # Pagos que no se reactivaron por el límite de la suscripción
+    skipped: int = 0
+
 class ScheduledPaymentService:
-    def __init__(self, repository: ScheduledPaymentRepository | None = None):
-        self.repo = repository or ScheduledPaymentRepository(ext.db)
+    def __init__(
+        self,
+        repository: ScheduledPaymentRepository | None = None,
+        counters: AccountCountersRepository | None = None,
+        jobs: ExecutionJobsRepository | None = None
+    ):
+        self.repo = repository or ScheduledPaymentRepository(ext.db, ext.unique_ids_confirmed)
+        self.counters = counters or AccountCountersRepository(ext.db)
+        self.jobs = jobs or ExecutionJobsRepository(ext.db)
+        self._catch_up_cursor = datetime.min.replace(tzinfo=timezone.utc)
+        self.retry_policy = RetryPolicy(
+            max_attempts=settings.SCHEDULER_RETRY_MAX_ATTEMPTS,
+            base_seconds=settings.SCHEDULER_RETRY_BASE_SECONDS,
+            max_seconds=settings.SCHEDULER_RETRY_MAX_SECONDS,
+        )
     
     async def create_new_scheduled_payment(self, data: ScheduledPaymentCreate) -> ScheduledPaymentView:
 
         subscription = await self._get_account_subscription(data.accountId)
+        limit = self._subscription_limit(subscription)
 
-        limit = 1
-        current_active = None
+        logger.info("Validando límite de suscripción (accountId=%s subscription=%s)", data.accountId, subscription)
+        logger.debug("Límite de pagos activos=%s", limit)
 
-        match subscription:
-            case "basico":
-                limit = settings.SUBSCRIPTION_BASIC
-            case "premium":
-                limit = settings.SUBSCRIPTION_STUDENT
-            case "pro":
-                limit = settings.SUBSCRIPTION_PRO
-            case _:
-                limit = settings.SUBSCRIPTION_BASIC
+        # Reserva atómica de un hueco en el contador de la cuenta (sin carrera entre réplicas)
+        if data.isActive:
+            acquired = await self.counters.try_acquire(
+                data.accountId,
+                limit if limit and limit > 0 else None,
+                lambda: self.repo.count_active_payments_by_account_id(data.accountId)
+            )
+            if not acquired:
+                raise SubscriptionLimitReachedError(subscription, limit)
 
-        if limit and limit > 0:
-            current_active = await self.repo.count_active_payments_by_account_id(data.accountId)
-            if current_active >= limit:
-                raise SubscriptionLimitReachedError(subscription, limit)  
-            
-        new_scheduled_payment_doc = await self.repo.insert_scheduled_payment(data)
+        new_scheduled_payment_doc = None
+        try:
+            new_scheduled_payment_doc = await self.repo.insert_scheduled_payment(data, self._now())
+        finally:
+            if new_scheduled_payment_doc is None and data.isActive:
+                await self.counters.release(data.accountId)
+
+        if new_scheduled_payment_doc:
+            self._notify_wakeup_timer(new_scheduled_payment_doc.id, new_scheduled_payment_doc.nextExecutionAt)
 
-        logger.info("Validando límite de suscripción (accountId=%s subscription=%s)", data.accountId, subscription)
-        logger.debug("Pagos activos actuales=%s límite=%s", current_active, limit)
-        
         return new_scheduled_payment_doc
     
+    async def create_scheduled_payments_bulk(self, payments: list[ScheduledPaymentCreate]) -> list[BulkCreateResult]:
+        """
+        Alta masiva: la suscripción de cada cuenta se consulta una sola vez,
+        el límite de pagos activos se reserva por cuenta para todo el lote y
+        los pagos admitidos se insertan con `insert_many` desordenado por
+        bloques. Devuelve un resultado por pago, en el mismo orden.
+        """
+        results: list[BulkCreateResult | None] = [None] * len(payments)
+        by_account: dict[str, list[int]] = {}
+        for i, payment in enumerate(payments):
+            by_account.setdefault(payment.accountId, []).append(i)
+
+        semaphore = asyncio.Semaphore(max(1, settings.BULK_CREATE_ACCOUNT_CONCURRENCY))
+
+        async def admit(account_id: str, positions: list[int]) -> list[int]:
+            async with semaphore:
+                try:
+                    subscription = await self._get_account_subscription(account_id)
+                except AccountNotFoundError:
+                    outcome, error = BULK_ACCOUNT_NOT_FOUND, "La cuenta no existe"
+                except DependencyUnavailableError as e:
+                    outcome, error = BULK_DEPENDENCY_UNAVAILABLE, str(e)
+                except Exception:
+                    logger.exception("Error consultando la cuenta %s en alta masiva", account_id)
+                    outcome, error = BULK_ERROR, "No se pudo consultar la cuenta"
+                else:
+                    limit = self._subscription_limit(subscription)
+                    active = [i for i in positions if payments[i].isActive]
+                    granted = await self.counters.try_acquire_many(
+                        account_id,
+                        len(active),
+                        limit if limit and limit > 0 else None,
+                        lambda: self.repo.count_active_payments_by_account_id(account_id)
+                    )
+                    rejected = set(active[granted:])
+                    for i in rejected:
+                        results[i] = BulkCreateResult(
+                            payments[i].id, BULK_LIMIT_REACHED,
+                            f"Límite de pagos programados alcanzado para el plan {subscription} (máximo {limit})."
+                        )
+                    return [i for i in positions if i not in rejected]
+
+            for i in positions:
+                results[i] = BulkCreateResult(payments[i].id, outcome, error)
+            return []
+
+        admitted = await asyncio.gather(*(admit(a, positions) for a, positions in by_account.items()))
+        accepted = sorted(i for positions in admitted for i in positions)
+        logger.info(
+            "Alta masiva: %s pagos de %s cuentas, %s admitidos",
+            len(payments), len(by_account), len(accepted)
+        )
+
+        now = self._now()
+        batch_size = max(1, settings.BULK_CREATE_BATCH_SIZE)
+        for offset in range(0, len(accepted), batch_size):
+            chunk = accepted[offset:offset + batch_size]
+            released = Counter()
+            try:
+                inserted = await self.repo.insert_scheduled_payments([payments[i] for i in chunk], now)
+            except Exception:
+                logger.exception("Error insertando un bloque de %s pagos en alta masiva", len(chunk))
+                for i in chunk:
+                    results[i] = BulkCreateResult(payments[i].id, BULK_ERROR, "No se pudo crear el pago programado")
+                # Resultado desconocido: se devuelven los huecos de los pagos que no llegaron a guardarse
+                try:
+                    stored = await self.repo.find_existing_ids([payments[i].id for i in chunk])
+                except Exception:
+                    logger.exception("No se pudo comprobar qué pagos del bloque se guardaron; los huecos no se devuelven")
+                    continue
+                for i in chunk:
+                    if payments[i].isActive and payments[i].id not in stored:
+                        released[payments[i].accountId] += 1
+                if released:
+                    await self.counters.apply_deltas({account_id: -n for account_id, n in released.items()})
+                continue
+
+            for position, i in enumerate(chunk):
+                payment = inserted.inserted.get(position)
+                if payment is not None:
+                    results[i] = BulkCreateResult(payment.id, BULK_CREATED, payment=payment)
+                    self._notify_wakeup_timer(payment.id, payment.nextExecutionAt)
+                    continue
+                if inserted.errors.get(position) == DUPLICATE_KEY:
+                    results[i] = BulkCreateResult(payments[i].id, BULK_DUPLICATE, "Ya existe un pago programado con ese id")
+                else:
+                    results[i] = BulkCreateResult(payments[i].id, BULK_ERROR, "No se pudo crear el pago programado")
+                if payments[i].isActive:
+                    released[payments[i].accountId] += 1
+
+            if released:
+                await self.counters.apply_deltas({account_id: -n for account_id, n in released.items()})
+
+        return results
+
     async def get_scheduled_payment_by_id(self, scheduled_payment_id: str) -> ScheduledPaymentView | None:
         return await self.repo.find_scheduled_payment_by_id(scheduled_payment_id)
     
     async def update_scheduled_payment_details(self, scheduled_payment_id: str, data: ScheduledPaymentUpdate) -> ScheduledPaymentView | None:
-        return await self.repo.update_scheduled_payment(scheduled_payment_id, data)
+        previous_account_id = None
+        if data.accountId is not None:
+            # Cambio de cuenta: el pago activo pasa a contar en la nueva
+            current = await self.repo.find_scheduled_payment_by_id(scheduled_payment_id)
+            if current and current.isActive and current.accountId != data.accountId:
+                previous_account_id = current.accountId
+
+        updated = await self.repo.update_scheduled_payment(scheduled_payment_id, data, self._now())
+        if updated and data.schedule is not None:
+            self._notify_wakeup_timer(updated.id, updated.nextExecutionAt)
+        if updated and previous_account_id is not None:
+            await self.counters.apply_deltas({previous_account_id: -1, updated.accountId: 1})
+        return updated
     
     async def delete_scheduled_payment(self, scheduled_payment_id: str) -> bool:
-        return await self.repo.delete_scheduled_payment(scheduled_payment_id)
-    
-    async def get_scheduled_payments_by_account_id(self, account_id: str) -> list[ScheduledPaymentView]:
-        return await self.repo.find_payments_by_account_id(account_id)
+        deleted = await self.repo.delete_scheduled_payment(scheduled_payment_id)
+        if deleted is None:
+            return False
+        self._notify_wakeup_timer(scheduled_payment_id, None)
+        if deleted.get("isActive"):
+            await self.counters.release(deleted["accountId"])
+        return True
     
-    async def process_due_payments(self) -> None:
-        now = ext.ntp_clock.now_utc() if ext.ntp_clock else datetime.now(timezone.utc)
+    async def deactivate_account_payments(self, account_id: str, frequency: str | None = None) -> AccountOperationResult:
+        """
+        Desactiva de una vez los pagos activos de la cuenta (opcionalmente
+        solo los de una frecuencia) y cancela sus ejecuciones pendientes.
+        """
+        ids = await self.repo.find_payment_ids_by_account_id(account_id, frequency, isActive=True)
+        deactivated = await self.repo.deactivate_payments_by_account_id(account_id, frequency)
+        if deactivated:
+            await self.counters.release(account_id, deactivated)
+        cancelled = await self.jobs.cancel_pending(ids, "pago desactivado", self._now())
+        for payment_id in ids:
+            self._notify_wakeup_timer(payment_id, None)
 
-        payments = await self.repo.find_payments_to_execute(now)
+        logger.info(
+            "Pagos desactivados (accountId=%s frequency=%s): %s, ejecuciones canceladas: %s",
+            account_id, frequency, deactivated, cancelled
+        )
+        return AccountOperationResult(deactivated, cancelled)
+
+    async def reactivate_account_payments(self, account_id: str, frequency: str | None = None) -> AccountOperationResult:
+        """
+        Reactiva los pagos inactivos de la cuenta hasta el límite de su
+        suscripción (por orden de id), recalculando su próxima ejecución.
+        Las ocurrencias que vencieron mientras estaban inactivos no se ejecutan.
+        """
+        now = self._now()
+        payments = await self.repo.find_inactive_payments_by_account_id(account_id, now, frequency)
+        # Sin próxima ejecución (p. ej. endDate ya pasado) no ocupan hueco de la suscripción
+        due_at = {p.id: self.repo.next_due_at(p, now) for p in payments}
+        payments = [p for p in payments if due_at[p.id] is not None]
         if not payments:
-            return
+            return AccountOperationResult(0)
+
+        limit = self._subscription_limit(await self._get_account_subscription(account_id))
+        granted = await self.counters.try_acquire_many(
+            account_id,
+            len(payments),
+            limit if limit and limit > 0 else None,
+            lambda: self.repo.count_active_payments_by_account_id(account_id)
+        )
+
+        next_execution = {p.id: due_at[p.id] for p in payments[:granted]}
+        reactivated = None
+        try:
+            reactivated = await self.repo.reactivate_payments(next_execution, settings.SCHEDULER_BULK_WRITE_BATCH_SIZE)
+        finally:
+            if reactivated is None:
+                # Fallo a medias: solo se quedan los huecos de los pagos que sí quedaron activos
+                reactivated = len(await self.repo.find_existing_ids(list(next_execution), isActive=True))
+            if granted > reactivated:
+                # Otros ya estaban activos (reactivación concurrente) o no se llegaron a escribir
+                await self.counters.release(account_id, granted - reactivated)
+
+        for payment_id, due in next_execution.items():
+            self._notify_wakeup_timer(payment_id, due)
+
+        logger.info(
+            "Pagos reactivados (accountId=%s frequency=%s): %s, sin hueco en la suscripción: %s",
+            account_id, frequency, reactivated, len(payments) - granted
+        )
+        return AccountOperationResult(reactivated, skipped=len(payments) - granted)
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
+    async def delete_account_payments(self, account_id: str, frequency: str | None = None) -> AccountOperationResult:
+        """Borra de una vez los pagos de la cuenta y cancela sus ejecuciones pendientes."""
+        ids = await self.repo.find_payment_ids_by_account_id(account_id, frequency)
+        active, deleted = await self.repo.delete_payments_by_account_id(account_id, frequency)
+        if active:
+            await self.counters.release(account_id, active)
+        cancelled = await self.jobs.cancel_pending(ids, "pago eliminado", self._now())
+        for payment_id in ids:
+            self._notify_wakeup_timer(payment_id, None)
+
+        logger.info(
+            "Pagos eliminados (accountId=%s frequency=%s): %s, ejecuciones canceladas: %s",
+            account_id, frequency, deleted, cancelled
+        )
+        return AccountOperationResult(deleted, cancelled)
+
+    async def get_scheduled_payments_by_account_id(
+        self,
+        account_id: str,
+        limit: int | None = None,
+        after: str | None = None
+    ) -> tuple[list[ScheduledPaymentView], str | None]:
+        """
+        Pagos de la cuenta ordenados por id y cursor de la siguiente página
+        (None si es la última). Sin `limit` se devuelven todos.
+        """
+        if limit is None:
+            return await self.repo.find_payments_by_account_id(account_id, None, after), None
+        payments = await self.repo.find_payments_by_account_id(account_id, limit + 1, after)
+        if len(payments) <= limit:
+            return payments, None
+        payments = payments[:limit]
+        return payments, payments[-1].id
+
+    def stream_scheduled_payments_by_account_id(
+        self,
+        account_id: str,
+        limit: int | None = None,
+        after: str | None = None
+    ) -> AsyncIterator[ScheduledPaymentView]:
+        return self.repo.iter_payments_by_account_id(account_id, limit, after)
+    
+    async def rebuild_account_counters(self) -> int:
+        """
+        Reparación fuera de línea de los contadores de pagos activos (p. ej.
+        tras una caída entre un borrado y su liberación). Ejecutar sin altas
+        en curso: `quart --app scheduled_payments.app:create_app rebuild-account-counters`.
+        """
+        counts = await self.repo.count_active_payments_by_account()
+        changed = await self.counters.rebuild(counts, settings.SCHEDULER_BULK_WRITE_BATCH_SIZE)
+        logger.info("Contadores de pagos activos reconstruidos: %s cuentas, %s corregidos", len(counts), changed)
+        return changed
+
+    async def backfill_next_executions(self) -> int:
+        await self.recover_reservations()
+        return await self.repo.backfill_next_execution(self._now())
+
+    async def recover_reservations(self) -> int:
+        """
+        Encola las ejecuciones que una réplica reservó pero no llegó a encolar
+        (cayó entre `reserve_executions` y `enqueue`). La clave de idempotencia
+        del trabajo hace inofensivo encolar dos veces la misma ocurrencia.
+        """
+        now = self._now()
+        reserved = await self.repo.find_unreleased_reservations(now, settings.SCHEDULER_CLAIM_BATCH_SIZE)
+        if not reserved:
+            return 0
+
+        await self.jobs.enqueue([p for p, _ in reserved], now, {p.id: at for p, at in reserved})
+        await self.repo.clear_reservations(
+            [(p.id, at) for p, at in reserved], settings.SCHEDULER_BULK_WRITE_BATCH_SIZE
+        )
+        logger.warning("Recuperadas %s ejecuciones reservadas y no encoladas", len(reserved))
+        return len(reserved)
+
+    async def resync_wakeup_timer(self) -> int:
+        timer = ext.wakeup_timer
+        if timer is None:
+            return 0
+
+        until = datetime.fromtimestamp(
+            self._now().timestamp() + settings.SCHEDULER_WAKEUP_HORIZON_SECONDS, tz=timezone.utc
+        )
+        due_times = await self.repo.find_due_times(until, settings.SCHEDULER_WAKEUP_MAX_ENTRIES)
+        job_times = await self.jobs.find_due_times(until, settings.SCHEDULER_WAKEUP_MAX_ENTRIES)
+        timer.replace_all(
+            [(payment_id, self._epoch(due)) for payment_id, due in due_times]
+            + [(f"job:{job_id}", self._epoch(due)) for job_id, due in job_times]
+        )
+        return len(due_times) + len(job_times)
+
+    async def process_due_payments(self) -> DispatchStats | None:
+        """
+        1. Las ocurrencias vencidas se reservan y se encolan en el outbox
+           (`payment_executions`), un trabajo por ocurrencia.
+        2. Se drenan los trabajos vencidos: los nuevos y los reintentos.
+        """
+        now = self._now()
+        started = time.perf_counter()
+
+        await self.recover_reservations()
+        while True:
+            claim = await self.repo.claim_due_payments(
+                now,
+                owner=SCHEDULER_OWNER,
+                lease_seconds=settings.SCHEDULER_CLAIM_LEASE_SECONDS,
+                limit=settings.SCHEDULER_CLAIM_BATCH_SIZE,
+                catch_up_seconds=settings.SCHEDULER_CATCHUP_MAX_AGE_SECONDS,
+            )
+            if not claim.found:
+                break
+            if claim.expired:
+                metrics.SCHEDULER_CATCHUP.labels("expired").inc(claim.expired)
+                logger.warning(
+                    "%s pagos tenían ocurrencias perdidas fuera de la ventana de recuperación (%ss); se saltan",
+                    claim.expired, settings.SCHEDULER_CATCHUP_MAX_AGE_SECONDS
+                )
+            if claim.payments:
+                await self._enqueue_claimed(claim, now)
+
+        abandoned = await self.jobs.expire_abandoned(now)
+        if abandoned:
+            metrics.SCHEDULER_JOBS.labels("dead").inc(abandoned)
+            logger.error(
+                "%s ejecuciones con lease caducado pasan a dead-letter (resultado de la transferencia desconocido)",
+                abandoned
+            )
+
+        stats = await self._dispatch_jobs()
+
+        metrics.SCHEDULER_TICK_SECONDS.observe(time.perf_counter() - started)
+        if not stats.total:
+            metrics.SCHEDULER_DUE_PAYMENTS.observe(0)
+            return None
+
+        stats = replace(stats, elapsed_seconds=time.perf_counter() - started)
+        metrics.SCHEDULER_DUE_PAYMENTS.observe(stats.total)
+        metrics.SCHEDULER_PAYMENTS.labels("ok").inc(stats.succeeded)
+        metrics.SCHEDULER_PAYMENTS.labels("error").inc(stats.failed)
+        metrics.SCHEDULER_PAYMENTS.labels("timeout").inc(stats.timed_out)
+        logger.info(
+            "Tick del planificador: %s pagos en %.2fs (%.1f pagos/s, ok=%s error=%s timeout=%s)",
+            stats.total, stats.elapsed_seconds, stats.throughput,
+            stats.succeeded, stats.failed, stats.timed_out
+        )
+        return stats
+
+    async def _enqueue_claimed(self, claim: PaymentClaim, now: datetime) -> int:
+        batch_size = settings.SCHEDULER_BULK_WRITE_BATCH_SIZE
+        payments = await self.repo.reserve_executions(claim.payments, now, batch_size, claim.token)
+        if len(payments) != len(claim.payments):
+            logger.warning(
+                "Reservados %s de %s pagos (modificados durante el tick)", len(payments), len(claim.payments)
+            )
+
+        # Los ONCE reservados ya se han desactivado
+        once_deltas = Counter(p.accountId for p in payments if p.schedule.frequency == "ONCE")
+        await self.counters.apply_deltas({account_id: -n for account_id, n in once_deltas.items()})
+
+        occurrences = {p.id: self.repo.occurrence_at(p, now) for p in payments}
+        attempts = self._pace_catch_up(payments, occurrences, now)
+
+        enqueued = await self.jobs.enqueue(payments, now, occurrences, attempts)
+        await self.repo.release_reservations([p.id for p in payments], claim.token)
+        if enqueued != len(payments):
+            logger.warning("%s ejecuciones ya estaban encoladas", len(payments) - enqueued)
+        if attempts:
+            metrics.SCHEDULER_CATCHUP.labels("enqueued").inc(len(attempts))
+            logger.info("Recuperando %s ocurrencias perdidas (hasta %s)", len(attempts), max(attempts.values()))
             for p in payments:
-                payload = {
-                    "sender": p.accountId,
-                    "receiver": p.beneficiary.iban,
-                    "quantity": p.amount.value,
-                    "currency": p.amount.currency
-                }
-
-                headers = {}
-                if getattr(p, "authToken", None):
-                    headers["Authorization"] = p.authToken
-
-                resp = await client.post(settings.TRANSFER_SERVICE_URL, json=payload, headers=headers)
-
-                if 200 <= resp.status_code < 300:
-                    deactivate = isinstance(p.schedule, OnceSchedule)
-                    await self.repo.mark_once_payment_executed(p.id, now, deactivate)
-                else:
-                    logger.error(
-                        f"Transfer service error for payment {p.id}: {resp.status_code} {resp.text}"
+                if p.id in attempts:
+                    self._notify_wakeup_timer(f"job:{self.jobs.job_id(p, occurrences[p.id])}", attempts[p.id])
+        return enqueued
+
+    def _pace_catch_up(
+        self,
+        payments: list[ScheduledPaymentView],
+        occurrences: dict[str, datetime],
+        now: datetime
+    ) -> dict[str, datetime]:
+        """
+        Ocurrencias de días anteriores (recuperación): se reparten en el tiempo a
+        SCHEDULER_CATCHUP_MAX_PER_SECOND para no saturar el Transfers Service.
+        Las de hoy salen ya.
+        """
+        today = self._epoch(now) // 86400
+        attempts: dict[str, datetime] = {}
+        rate = settings.SCHEDULER_CATCHUP_MAX_PER_SECOND
+        for p in payments:
+            if p.schedule.frequency == "ONCE" or self._epoch(occurrences[p.id]) // 86400 >= today:
+                continue
+            if rate > 0:
+                self._catch_up_cursor = max(self._catch_up_cursor, now) + timedelta(seconds=1 / rate)
+                attempts[p.id] = self._catch_up_cursor
+            else:
+                attempts[p.id] = now
+        return attempts
+
+    async def _dispatch_jobs(self) -> DispatchStats:
+        """
+        Drena los trabajos vencidos a través de una cola justa por cuenta: se
+        siguen reclamando lotes mientras los workers envían y los trabajos de
+        una cuenta salen en orden, sin más de SCHEDULER_MAX_IN_FLIGHT_PER_ACCOUNT
+        transferencias simultáneas contra el mismo saldo.
+        """
+        batch_size = settings.SCHEDULER_BULK_WRITE_BATCH_SIZE
+        lease_seconds = settings.SCHEDULER_CLAIM_LEASE_SECONDS
+        job_results = self.jobs.results(batch_size, self.retry_policy)
+        payment_results = self.repo.execution_results(batch_size)
+        queue: FairDispatchQueue[ExecutionJob] = FairDispatchQueue(settings.SCHEDULER_MAX_IN_FLIGHT_PER_ACCOUNT)
+        tokens: list[str] = []
+        started = time.perf_counter()
+
+        async def produce():
+            try:
+                while True:
+                    await queue.wait_below(settings.SCHEDULER_FAIR_QUEUE_MAX_SIZE)
+                    # Reloj actual, no el del inicio del tick: tras un reparto largo
+                    # el lease ya estaría caducado y otra réplica mandaría el trabajo a dead
+                    claim = await self.jobs.claim_due_jobs(
+                        self._now(),
+                        owner=SCHEDULER_OWNER,
+                        lease_seconds=lease_seconds,
+                        limit=settings.SCHEDULER_CLAIM_BATCH_SIZE,
                     )
+                    if not claim.found:
+                        return
+                    tokens.append(claim.token)
+                    for job in claim.jobs:
+                        queue.put(job.accountId, job, self._account_weight(job.accountId))
+            finally:
+                queue.close()
+
+        async def housekeeping():
+            # Vuelca resultados y renueva el lease de lo que sigue en cola o en curso
+            while True:
+                await asyncio.sleep(max(1.0, lease_seconds / 3))
+                try:
+                    await job_results.flush()
+                    await payment_results.flush()
+                    await self.jobs.extend_leases(tokens, self._now(), lease_seconds)
+                except Exception as e:
+                    logger.error("Error renovando leases de ejecuciones: %s", e)
+
+        async def handle(job: ExecutionJob) -> bool:
+            metrics.SCHEDULER_DISPATCH_DELAY_SECONDS.observe(time.perf_counter() - started)
+            return await self._execute_job(job, job_results, payment_results)
+
+        dispatcher = BoundedDispatcher(
+            max_concurrency=settings.SCHEDULER_MAX_CONCURRENCY,
+            timeout_seconds=settings.SCHEDULER_PAYMENT_TIMEOUT_SECONDS,
+        )
+        producer = asyncio.create_task(produce())
+        maintainer = asyncio.create_task(housekeeping())
+        try:
+            stats = await dispatcher.run_queue(queue, handle, describe=lambda job: f"ejecución {job.id}")
+            await producer
+            return stats
+        finally:
+            maintainer.cancel()
+            if not producer.done():
+                producer.cancel()
+            await job_results.flush()
+            await payment_results.flush()
+            for job_id, next_attempt_at in job_results.retries:
+                self._notify_wakeup_timer(f"job:{job_id}", next_attempt_at)
+
+    def _account_weight(self, account_id: str) -> float:
+        # Solo con el plan ya cacheado: el reparto no debe generar llamadas al Accounts Service
+        weights = settings.SCHEDULER_PLAN_WEIGHTS
+        if not weights or ext.account_cache is None:
+            return 1.0
+        return weights.get(ext.account_cache.peek(account_id), 1.0)
+
+    async def _execute_job(
+        self,
+        job: ExecutionJob,
+        job_results: JobResults,
+        payment_results: ExecutionResults
+    ) -> bool:
+        """
+        Envía la transferencia del trabajo y registra el resultado. El reloj se
+        lee al registrarlo: el backoff y lastExecutionAt no parten del inicio
+        de un tick que puede llevar minutos en marcha.
+        """
+        # El Transfers Service puede deduplicar reintentos con la clave de idempotencia
+        headers = {"Idempotency-Key": job.id}
+        if job.authToken:
+            headers["Authorization"] = job.authToken
+
+        client = ext.get_transfers_http_client()
+
+        async def post():
+            started = time.perf_counter()
+            try:
+                resp = await client.post(settings.TRANSFER_SERVICE_URL, json=job.transfer, headers=headers)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                metrics.TRANSFER_SECONDS.labels("connect_error").observe(time.perf_counter() - started)
+                raise
+            except Exception:
+                metrics.TRANSFER_SECONDS.labels("error").observe(time.perf_counter() - started)
+                raise
+            metrics.TRANSFER_SECONDS.labels(f"{resp.status_code // 100}xx").observe(time.perf_counter() - started)
+            return resp
+
+        try:
+            resp = await self._call_dependency(ext.transfers_guard, post, _is_overloaded)
+        except DependencyUnavailableError as e:
+            # Rechazada sin enviarse (circuito abierto o sin hueco): se aplaza sin gastar un intento
+            now = self._now()
+            job_results.record_deferred(job, now + timedelta(seconds=max(1.0, e.retry_after)), str(e), now)
+            metrics.SCHEDULER_JOBS.labels("deferred").inc()
+            return False
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            # No llegó a enviarse: se puede reintentar sin riesgo
+            self._record_job_failure(job_results, job, f"{type(e).__name__}: {e}", self._now())
+            raise
+        except Exception as e:
+            # Pudo llegar a ejecutarse: no se reintenta automáticamente
+            job_results.record_dead(job, f"resultado desconocido: {type(e).__name__}: {e}", self._now())
+            metrics.SCHEDULER_JOBS.labels("dead").inc()
+            raise
+
+        now = self._now()
+        if not 200 <= resp.status_code < 300:
+            logger.error(
+                f"Transfer service error for payment {job.paymentId} (job {job.id}): {resp.status_code} {resp.text}"
+            )
+            error = f"HTTP {resp.status_code}: {resp.text[:500]}"
+            if resp.status_code in RETRYABLE_STATUS or resp.status_code >= 500:
+                self._record_job_failure(job_results, job, error, now)
+            else:
+                # Rechazo definitivo (datos inválidos, cuenta bloqueada...): reintentar no cambia nada
+                job_results.record_dead(job, error, now)
+                metrics.SCHEDULER_JOBS.labels("dead").inc()
+            return False
+
+        job_results.record_success(job, now)
+        payment_results.record_success(job.paymentId, now)
+        metrics.SCHEDULER_JOBS.labels("succeeded").inc()
+        return True
+
+    @staticmethod
+    def _record_job_failure(job_results: JobResults, job: ExecutionJob, error: str, now: datetime) -> None:
+        dead_before = job_results.dead
+        job_results.record_failure(job, error, now)
+        if job_results.dead > dead_before:
+            logger.error("Ejecución %s agotó sus %s intentos: pasa a dead-letter", job.id, job_results.policy.max_attempts)
+            metrics.SCHEDULER_JOBS.labels("dead").inc()
+        else:
+            metrics.SCHEDULER_JOBS.labels("retried").inc()
 
     async def get_upcoming_payments_for_account(
         self,
@@ -102,10 +653,73 @@ class ScheduledPaymentService:
     ) -> list[ScheduledPaymentUpcomingView]:
         return await self.repo.find_upcoming_payments_for_account(account_id, now, limit)
 
+    @staticmethod
+    async def _call_dependency(guard: DependencyGuard | None, func, is_failure):
+        if guard is None:
+            return await func()
+        try:
+            return await guard.call(func, is_failure)
+        except DependencyUnavailableError as e:
+            metrics.DEPENDENCY_REJECTIONS.labels(e.dependency, e.reason).inc()
+            raise
+
+    def _now(self) -> datetime:
+        return ext.ntp_clock.now_utc() if ext.ntp_clock else datetime.now(timezone.utc)
+
+    @staticmethod
+    def _epoch(dt: datetime) -> float:
+        # Mongo devuelve datetimes naive en UTC
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+
+    def _notify_wakeup_timer(self, scheduled_payment_id: str, next_execution_at: datetime | None) -> None:
+        timer = ext.wakeup_timer
+        if timer is None:
+            return
+        timer.schedule(
+            scheduled_payment_id,
+            self._epoch(next_execution_at) if next_execution_at else None
+        )
+
+    @staticmethod
+    def _subscription_limit(subscription: str) -> int:
+        match subscription:
+            case "basico":
+                return settings.SUBSCRIPTION_BASIC
+            case "premium":
+                return settings.SUBSCRIPTION_STUDENT
+            case "pro":
+                return settings.SUBSCRIPTION_PRO
+            case _:
+                return settings.SUBSCRIPTION_BASIC
+
     async def _get_account_subscription(self, account_id: str) -> str:
+        cache = ext.account_cache
+        if cache is None:
+            return await self._fetch_account_subscription(account_id)
+
+        return await cache.get_or_load(
+            account_id,
+            lambda: self._fetch_account_subscription(account_id),
+            negative=(AccountNotFoundError,),
+        )
+
+    async def _fetch_account_subscription(self, account_id: str) -> str:
         url = settings.ACCOUNTS_SERVICE_URL.replace("{iban}", quote(account_id, safe=""))
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            resp = await client.get(url)
+        client = ext.get_accounts_http_client()
+
+        async def get():
+            started = time.perf_counter()
+            try:
+                resp = await client.get(url)
+            except Exception:
+                metrics.ACCOUNTS_SECONDS.labels("error").observe(time.perf_counter() - started)
+                raise
+            metrics.ACCOUNTS_SECONDS.labels(f"{resp.status_code // 100}xx").observe(time.perf_counter() - started)
+            return resp
+
+        resp = await self._call_dependency(ext.accounts_guard, get, _is_overloaded)
 
         if resp.status_code == 404:
             logger.warning("Accounts service: cuenta no encontrada (account_id=%s)", account_id)
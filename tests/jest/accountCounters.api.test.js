@@ -0,0 +1,42 @@
+import {
+  BASE, useBackend, RUN_ID, paymentPayload, createPayment
+} from "./helpers.js"
+
+useBackend()
+
+// Las altas tienen rate limit por cuenta (5 por ventana): cada test usa su propia cuenta
+
+test("altas concurrentes en una cuenta básica no superan el límite del plan", async () => {
+  const accountId = `ES_BASIC_RACE_${RUN_ID}`
+  const responses = await Promise.all(
+    Array.from({ length: 5 }, () => createPayment(paymentPayload(accountId)))
+  )
+  const statuses = responses.map((r) => r.status).sort()
+  expect(statuses).toEqual([201, 403, 403, 403, 403])
+
+  const payments = await (await fetch(`${BASE}/accounts/${accountId}`)).json()
+  expect(payments.filter((p) => p.isActive)).toHaveLength(1)
+})
+
+test("altas concurrentes por debajo del límite se aceptan todas", async () => {
+  const accountId = `ES_PRO_RACE_${RUN_ID}`
+  const responses = await Promise.all(
+    Array.from({ length: 5 }, () => createPayment(paymentPayload(accountId)))
+  )
+  expect(responses.map((r) => r.status)).toEqual([201, 201, 201, 201, 201])
+
+  const payments = await (await fetch(`${BASE}/accounts/${accountId}`)).json()
+  expect(payments).toHaveLength(5)
+})
+
+test("borrar un pago activo devuelve su hueco al contador", async () => {
+  const accountId = `ES_BASIC_RELEASE_${RUN_ID}`
+  const first = paymentPayload(accountId)
+  expect((await createPayment(first)).status).toBe(201)
+  expect((await createPayment(paymentPayload(accountId))).status).toBe(403)
+
+  const deleted = await fetch(`${BASE}/${first.id}`, { method: "DELETE" })
+  expect(deleted.status).toBe(200)
+
+  expect((await createPayment(paymentPayload(accountId))).status).toBe(201)
+})
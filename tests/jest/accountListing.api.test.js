@@ -0,0 +1,89 @@
+import {
+  BASE, useBackend, RUN_ID, paymentPayload, createPayment
+} from "./helpers.js"
+
+useBackend()
+
+const ACCOUNT = `ES_PRO_LIST_${RUN_ID}`
+let ids = []
+
+beforeAll(async () => {
+  for (let i = 0; i < 3; i++) {
+    const payload = paymentPayload(ACCOUNT, { description: `Pago listado ${i}` })
+    const res = await createPayment(payload)
+    expect(res.status).toBe(201)
+    ids.push(payload.id)
+  }
+  ids = ids.sort()
+}, 60_000)
+
+test("GET /accounts/{iban} sin limit ni after devuelve todos los pagos ordenados por id", async () => {
+  const res = await fetch(`${BASE}/accounts/${ACCOUNT}`)
+  expect(res.status).toBe(200)
+  expect(res.headers.get("x-next-cursor")).toBeNull()
+  const data = await res.json()
+  expect(data.map((p) => p.id)).toEqual(ids)
+})
+
+test("GET /accounts/{iban}?limit pagina por cursor con X-Next-Cursor y Link", async () => {
+  const r1 = await fetch(`${BASE}/accounts/${ACCOUNT}?limit=2`)
+  expect(r1.status).toBe(200)
+  const page1 = await r1.json()
+  expect(page1.map((p) => p.id)).toEqual(ids.slice(0, 2))
+
+  const cursor = r1.headers.get("x-next-cursor")
+  expect(cursor).toBe(ids[1])
+  expect(r1.headers.get("link")).toMatch(/rel="next"/)
+  expect(r1.headers.get("link")).toMatch(`after=${cursor}`)
+
+  const r2 = await fetch(`${BASE}/accounts/${ACCOUNT}?limit=2&after=${encodeURIComponent(cursor)}`)
+  expect(r2.status).toBe(200)
+  const page2 = await r2.json()
+  expect(page2.map((p) => p.id)).toEqual(ids.slice(2))
+  expect(r2.headers.get("x-next-cursor")).toBeNull()
+})
+
+test("GET /accounts/{iban} valida limit y after", async () => {
+  for (const query of ["limit=0", "limit=aaa", "limit=501", "after="]) {
+    const res = await fetch(`${BASE}/accounts/${ACCOUNT}?${query}`)
+    expect(res.status).toBe(400)
+  }
+})
+
+test("GET /accounts/{iban} serializa las fechas en UTC con zona explícita", async () => {
+  const res = await fetch(`${BASE}/accounts/${ACCOUNT}?limit=1`)
+  const [payment] = await res.json()
+  expect(payment.nextExecutionAt).toMatch(/Z$/)
+  expect(payment.schedule.executionDate).toMatch(/Z$/)
+  expect(payment.nextExecutionAt).toBe(payment.schedule.executionDate)
+})
+
+test("GET /accounts/{iban}/stream exporta los pagos en NDJSON", async () => {
+  const res = await fetch(`${BASE}/accounts/${ACCOUNT}/stream`)
+  expect(res.status).toBe(200)
+  expect(res.headers.get("content-type")).toMatch("application/x-ndjson")
+
+  const lines = (await res.text()).split("\n").filter((line) => line.trim())
+  const payments = lines.map((line) => JSON.parse(line))
+  expect(payments.map((p) => p.id)).toEqual(ids)
+  expect(payments[0].accountId).toBe(ACCOUNT)
+  expect(payments[0].nextExecutionAt).toMatch(/Z$/)
+})
+
+test("GET /accounts/{iban}/stream respeta limit y after", async () => {
+  const res = await fetch(`${BASE}/accounts/${ACCOUNT}/stream?limit=1&after=${encodeURIComponent(ids[0])}`)
+  expect(res.status).toBe(200)
+  const lines = (await res.text()).split("\n").filter((line) => line.trim())
+  expect(lines.map((line) => JSON.parse(line).id)).toEqual([ids[1]])
+})
+
+test("GET /accounts/{iban}/stream de una cuenta sin pagos no devuelve líneas", async () => {
+  const res = await fetch(`${BASE}/accounts/ES_SIN_PAGOS_${RUN_ID}/stream`)
+  expect(res.status).toBe(200)
+  expect((await res.text()).trim()).toBe("")
+})
+
+test("GET /accounts/{iban}/stream valida limit", async () => {
+  const res = await fetch(`${BASE}/accounts/${ACCOUNT}/stream?limit=aaa`)
+  expect(res.status).toBe(400)
+})
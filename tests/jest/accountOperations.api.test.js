@@ -0,0 +1,143 @@
+import {
+  BASE, useBackend, sleep, RUN_ID, paymentPayload, createPayment, dueSoonPayload, transfersFrom, waitForExecution
+} from "./helpers.js"
+
+useBackend()
+
+const PRO_ACCOUNT = `ES_PRO_OPS_${RUN_ID}`
+const BASIC_ACCOUNT = `ES_BASIC_OPS_${RUN_ID}`
+
+function weeklyPayload(accountId) {
+  return paymentPayload(accountId, {
+    schedule: {
+      frequency: "WEEKLY",
+      daysOfWeek: ["MONDAY", "THURSDAY"],
+      startDate: new Date(Date.now() - 86_400_000).toISOString(),
+      endDate: new Date(Date.now() + 60 * 86_400_000).toISOString()
+    }
+  })
+}
+
+async function accountOperation(method, accountId, action = "", query = "") {
+  const res = await fetch(`${BASE}/accounts/${accountId}${action}${query}`, { method })
+  return { status: res.status, data: await res.json() }
+}
+
+async function listAccount(accountId) {
+  const res = await fetch(`${BASE}/accounts/${accountId}`)
+  return res.json()
+}
+
+beforeAll(async () => {
+  for (const payload of [paymentPayload(PRO_ACCOUNT), weeklyPayload(PRO_ACCOUNT), weeklyPayload(PRO_ACCOUNT)]) {
+    expect((await createPayment(payload)).status).toBe(201)
+  }
+}, 60_000)
+
+test("frequency inválida -> 400 en deactivate, reactivate y delete", async () => {
+  expect((await accountOperation("POST", PRO_ACCOUNT, "/deactivate", "?frequency=DAILY")).status).toBe(400)
+  expect((await accountOperation("POST", PRO_ACCOUNT, "/reactivate", "?frequency=DAILY")).status).toBe(400)
+  expect((await accountOperation("DELETE", PRO_ACCOUNT, "", "?frequency=DAILY")).status).toBe(400)
+})
+
+test("POST /accounts/{iban}/deactivate?frequency desactiva solo esa frecuencia", async () => {
+  const { status, data } = await accountOperation("POST", PRO_ACCOUNT, "/deactivate", "?frequency=weekly")
+  expect(status).toBe(200)
+  expect(data).toMatchObject({ accountId: PRO_ACCOUNT, operation: "deactivate", frequency: "WEEKLY", affected: 2 })
+
+  const payments = await listAccount(PRO_ACCOUNT)
+  for (const p of payments) {
+    const weekly = p.schedule.frequency === "WEEKLY"
+    expect(p.isActive).toBe(!weekly)
+    if (weekly) expect(p.nextExecutionAt).toBeNull()
+  }
+
+  const again = await accountOperation("POST", PRO_ACCOUNT, "/deactivate", "?frequency=WEEKLY")
+  expect(again.data.affected).toBe(0)
+})
+
+test("POST /accounts/{iban}/reactivate reactiva y recalcula la próxima ejecución", async () => {
+  const { status, data } = await accountOperation("POST", PRO_ACCOUNT, "/reactivate")
+  expect(status).toBe(200)
+  expect(data).toMatchObject({ operation: "reactivate", frequency: null, affected: 2, skipped: 0 })
+
+  const payments = await listAccount(PRO_ACCOUNT)
+  expect(payments.every((p) => p.isActive)).toBe(true)
+  expect(payments.every((p) => p.nextExecutionAt !== null)).toBe(true)
+})
+
+test("reactivate sin pagos inactivos no consulta la cuenta -> 0", async () => {
+  const { status, data } = await accountOperation("POST", `ES_SIN_PAGOS_${RUN_ID}`, "/reactivate")
+  expect(status).toBe(200)
+  expect(data.affected).toBe(0)
+})
+
+test("la desactivación libera hueco del plan y la reactivación lo respeta", async () => {
+  const first = paymentPayload(BASIC_ACCOUNT)
+  expect((await createPayment(first)).status).toBe(201)
+  expect((await createPayment(paymentPayload(BASIC_ACCOUNT))).status).toBe(403)
+
+  const deactivated = await accountOperation("POST", BASIC_ACCOUNT, "/deactivate")
+  expect(deactivated.data.affected).toBe(1)
+
+  // El pago desactivado ya no cuenta para el límite del plan básico
+  expect((await createPayment(paymentPayload(BASIC_ACCOUNT))).status).toBe(201)
+
+  const reactivated = await accountOperation("POST", BASIC_ACCOUNT, "/reactivate")
+  expect(reactivated.status).toBe(200)
+  expect(reactivated.data).toMatchObject({ affected: 0, skipped: 1 })
+
+  const stored = await (await fetch(`${BASE}/${first.id}`)).json()
+  expect(stored.isActive).toBe(false)
+})
+
+test("DELETE /accounts/{iban} elimina todos los pagos de la cuenta y libera el límite", async () => {
+  const { status, data } = await accountOperation("DELETE", BASIC_ACCOUNT)
+  expect(status).toBe(200)
+  expect(data).toMatchObject({ operation: "delete", affected: 2 })
+  expect(await listAccount(BASIC_ACCOUNT)).toEqual([])
+
+  expect((await createPayment(paymentPayload(BASIC_ACCOUNT))).status).toBe(201)
+})
+
+test("DELETE /accounts/{iban}?frequency elimina solo esa frecuencia", async () => {
+  const { data } = await accountOperation("DELETE", PRO_ACCOUNT, "", "?frequency=ONCE")
+  expect(data.affected).toBe(1)
+  const payments = await listAccount(PRO_ACCOUNT)
+  expect(payments).toHaveLength(2)
+  expect(payments.every((p) => p.schedule.frequency === "WEEKLY")).toBe(true)
+})
+
+test("desactivar la cuenta cancela la ejecución de un pago aún no vencido", async () => {
+  const accountId = `ES_PRO_OPS_CANCEL_${RUN_ID}`
+  const payload = dueSoonPayload(accountId, 4)
+  expect((await createPayment(payload)).status).toBe(201)
+
+  const res = await fetch(`${BASE}/accounts/${accountId}/deactivate`, { method: "POST" })
+  expect((await res.json()).affected).toBe(1)
+
+  await sleep(7000)
+  const stored = await (await fetch(`${BASE}/${payload.id}`)).json()
+  expect(stored.lastExecutionAt).toBeNull()
+  expect(await transfersFrom(accountId)).toHaveLength(0)
+}, 30_000)
+
+test("reactivate no recupera un pago ONCE ya ejecutado ni le da hueco del plan", async () => {
+  const accountId = `ES_BASIC_OPS_ONCE_${RUN_ID}`
+  // Ids ordenados: el ONCE iría primero en la reactivación (por orden de id)
+  const once = dueSoonPayload(accountId, 2, { id: `${RUN_ID}-1-once` })
+  const weekly = { ...weeklyPayload(accountId), id: `${RUN_ID}-2-weekly` }
+
+  expect((await createPayment(once)).status).toBe(201)
+  await waitForExecution(once.id)
+  expect((await createPayment(weekly)).status).toBe(201)
+
+  expect((await accountOperation("POST", accountId, "/deactivate")).data.affected).toBe(1)
+  const { data } = await accountOperation("POST", accountId, "/reactivate")
+  expect(data).toMatchObject({ affected: 1, skipped: 0 })
+
+  const stored = await (await fetch(`${BASE}/${once.id}`)).json()
+  expect(stored.isActive).toBe(false)
+  expect((await (await fetch(`${BASE}/${weekly.id}`)).json()).isActive).toBe(true)
+  expect(await transfersFrom(accountId)).toHaveLength(1)
+}, 40_000)
@@ -0,0 +1,85 @@
+import {
+  BASE, useBackend, RUN_ID, AUTH_HEADERS, paymentPayload
+} from "./helpers.js"
+
+useBackend()
+
+// El rate limit de /bulk es por IP (5 peticiones por ventana): este fichero hace 5
+const PRO_ACCOUNT = `ES_PRO_BULK_${RUN_ID}`
+const BASIC_ACCOUNT = `ES_BASIC_BULK_${RUN_ID}`
+
+async function bulk(body, headers = AUTH_HEADERS) {
+  return fetch(`${BASE}/bulk`, { method: "POST", headers, body })
+}
+
+test("POST /bulk sin token -> 401", async () => {
+  const res = await bulk(JSON.stringify([paymentPayload(PRO_ACCOUNT)]), { "Content-Type": "application/json" })
+  expect(res.status).toBe(401)
+})
+
+test("POST /bulk vacío o sin array -> 400", async () => {
+  expect((await bulk("[]")).status).toBe(400)
+  expect((await bulk(JSON.stringify(paymentPayload(PRO_ACCOUNT)))).status).toBe(400)
+})
+
+const created = []
+
+test("POST /bulk con array JSON devuelve el resultado de cada pago en orden", async () => {
+  const ok1 = paymentPayload(PRO_ACCOUNT)
+  const ok2 = paymentPayload(PRO_ACCOUNT, {
+    schedule: {
+      frequency: "WEEKLY",
+      daysOfWeek: ["MONDAY"],
+      startDate: new Date(Date.now() - 86_400_000).toISOString(),
+      endDate: new Date(Date.now() + 30 * 86_400_000).toISOString()
+    }
+  })
+  const invalid = { ...paymentPayload(PRO_ACCOUNT), amount: { value: -1, currency: "EUR" } }
+  const missingAccount = paymentPayload("NO_EXISTE")
+  const basic1 = paymentPayload(BASIC_ACCOUNT)
+  const basic2 = paymentPayload(BASIC_ACCOUNT)
+
+  const res = await bulk(JSON.stringify([ok1, ok2, invalid, missingAccount, basic1, basic2]))
+  expect(res.status).toBe(200)
+  const data = await res.json()
+
+  expect(data.total).toBe(6)
+  expect(data.created).toBe(3)
+  expect(data.failed).toBe(3)
+  expect(data.results.map((r) => r.index)).toEqual([0, 1, 2, 3, 4, 5])
+  expect(data.results.map((r) => r.status)).toEqual([201, 201, 400, 404, 201, 403])
+  expect(data.results[0].id).toBe(ok1.id)
+  expect(data.results[0].nextExecutionAt).toMatch(/Z$/)
+  expect(data.results[2].id).toBe(invalid.id)
+  expect(data.results[2].error).toMatch("amount")
+  expect(data.results[5].error).toMatch(/Límite/i)
+
+  const get = await fetch(`${BASE}/${ok2.id}`)
+  expect(get.status).toBe(200)
+  expect((await get.json()).schedule.frequency).toBe("WEEKLY")
+  created.push(ok1.id)
+})
+
+test("POST /bulk con NDJSON valida cada línea por separado y detecta duplicados", async () => {
+  const fresh = paymentPayload(PRO_ACCOUNT)
+  const duplicate = paymentPayload(PRO_ACCOUNT, { id: created[0] })
+  const body = [
+    JSON.stringify(fresh),
+    "{esto no es json",
+    "",
+    JSON.stringify(duplicate)
+  ].join("\n") + "\n"
+
+  const res = await bulk(body, { ...AUTH_HEADERS, "Content-Type": "application/x-ndjson" })
+  expect(res.status).toBe(200)
+  const data = await res.json()
+
+  expect(data.total).toBe(3)
+  expect(data.created).toBe(1)
+  expect(data.results.map((r) => r.status)).toEqual([201, 400, 409])
+  expect(data.results[1].error).toMatch(/JSON/)
+  expect(data.results[2].id).toBe(created[0])
+
+  const list = await fetch(`${BASE}/accounts/${PRO_ACCOUNT}`)
+  expect((await list.json()).length).toBe(3)
+})
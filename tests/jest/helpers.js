@@ -35,3 +35,106 @@ export function startBackendInProcess(envOverrides = {}) {
 
   return p
 }
+
+
+export const BASE = "http://localhost:8000/v1/scheduled-payments"
+
+// Mismo entorno que el stack in-process de CI (ver docker-compose.ci.yml)
+export const IN_PROCESS_ENV = {
+  MONGO_CONNECTION_STRING: "mongodb://localhost:27017",
+  MONGO_DATABASE_NAME: "scheduled_payments",
+  TRANSFER_SERVICE_URL: "http://localhost:8002/v1/transactions",
+  ACCOUNTS_SERVICE_URL: "http://localhost:8001/v1/account/{iban}",
+  SUBSCRIPTION_BASIC: "1",
+  SUBSCRIPTION_STUDENT: "10",
+  SUBSCRIPTION_PRO: "999999999",
+  LOG_LEVEL: "INFO",
+  LOG_FILE: "log.txt",
+  LOG_BACKUP_COUNT: "7",
+  NTP_SERVER: "pool.ntp.org",
+  NTP_REFRESH_SECONDS: "60",
+  NTP_TIMEOUT_SECONDS: "3",
+  SCHEDULER_INTERVAL_SECONDS: "60"
+}
+
+// Espera a que el proceso termine para que el siguiente fichero pueda usar el puerto
+export async function stopBackend(proc, timeoutMs = 10_000) {
+  if (!proc || proc.exitCode !== null || proc.signalCode !== null) return
+  const exited = new Promise((r) => proc.once("exit", r))
+  proc.kill("SIGTERM")
+  const timer = setTimeout(() => proc.kill("SIGKILL"), timeoutMs)
+  await exited
+  clearTimeout(timer)
+}
+
+// Arranca el backend (in-process) antes de los tests del fichero y lo para al final.
+// En out-of-process solo espera a que el contenedor esté sano.
+export function useBackend(envOverrides = {}) {
+  const target = process.env.JEST_TARGET || "inprocess"
+  let backendProc = null
+
+  beforeAll(async () => {
+    if (target === "inprocess") {
+      backendProc = startBackendInProcess({ ...IN_PROCESS_ENV, ...envOverrides })
+    }
+    await waitForHealthy(`${BASE}/health`)
+  }, 60_000)
+
+  afterAll(async () => {
+    await stopBackend(backendProc)
+  }, 15_000)
+}
+
+// Sufijo único por ejecución: Mongo conserva los datos entre ejecuciones
+export const RUN_ID = Date.now().toString(36).toUpperCase()
+
+export const AUTH_HEADERS = {
+  "Content-Type": "application/json",
+  "Authorization": "Bearer test-token"
+}
+
+export function paymentPayload(accountId, overrides = {}) {
+  return {
+    id: crypto.randomUUID(),
+    accountId,
+    description: "Pago prueba",
+    beneficiary: { name: "Pepe", iban: "ESBENEF_1" },
+    amount: { value: 10, currency: "EUR" },
+    schedule: { frequency: "ONCE", executionDate: new Date(Date.now() + 3600_000).toISOString() },
+    ...overrides
+  }
+}
+
+export async function createPayment(payload) {
+  return fetch(`${BASE}/`, {
+    method: "POST",
+    headers: AUTH_HEADERS,
+    body: JSON.stringify(payload)
+  })
+}
+
+export const TRANSFERS_URL = "http://localhost:8002/v1/transactions"
+
+// Transferencias que ha recibido el mock del Transfers Service desde una cuenta
+export async function transfersFrom(accountId) {
+  const res = await fetch(`${TRANSFERS_URL}?sender=${encodeURIComponent(accountId)}`)
+  return res.json()
+}
+
+// Pago ONCE que vence dentro de `seconds` segundos
+export function dueSoonPayload(accountId, seconds = 2, overrides = {}) {
+  return paymentPayload(accountId, {
+    schedule: { frequency: "ONCE", executionDate: new Date(Date.now() + seconds * 1000).toISOString() },
+    ...overrides
+  })
+}
+
+export async function waitForExecution(paymentId, timeoutMs = 20_000) {
+  const deadline = Date.now() + timeoutMs
+  while (Date.now() < deadline) {
+    const payment = await (await fetch(`${BASE}/${paymentId}`)).json()
+    if (payment.lastExecutionAt) return payment
+    await sleep(500)
+  }
+  throw new Error(`El pago ${paymentId} no se ejecutó en ${timeoutMs}ms`)
+}
@@ -0,0 +1,40 @@
+import {
+  useBackend, sleep, RUN_ID, createPayment, dueSoonPayload, transfersFrom, waitForExecution
+} from "./helpers.js"
+
+useBackend()
+
+test("un pago ONCE vencido se reclama y ejecuta una sola vez", async () => {
+  const accountId = `ES_PRO_EXEC_${RUN_ID}`
+  const payload = dueSoonPayload(accountId)
+  expect((await createPayment(payload)).status).toBe(201)
+
+  const executed = await waitForExecution(payload.id)
+  expect(executed.isActive).toBe(false)
+  expect(executed.nextExecutionAt).toBeNull()
+
+  // Ticks posteriores no vuelven a reclamar ni a enviar la transferencia
+  await sleep(3000)
+  const transfers = await transfersFrom(accountId)
+  expect(transfers).toHaveLength(1)
+  expect(transfers[0]).toMatchObject({ receiver: "ESBENEF_1", quantity: 10, currency: "EUR" })
+  expect(transfers[0].idempotencyKey).toBeTruthy()
+}, 40_000)
+
+test("los pagos vencidos de una misma cuenta se ejecutan todos, cada uno una vez", async () => {
+  const accountId = `ES_PRO_EXEC_MANY_${RUN_ID}`
+  const payloads = [dueSoonPayload(accountId), dueSoonPayload(accountId), dueSoonPayload(accountId)]
+  for (const payload of payloads) {
+    expect((await createPayment(payload)).status).toBe(201)
+  }
+
+  for (const payload of payloads) {
+    await waitForExecution(payload.id)
+  }
+
+  await sleep(2000)
+  const transfers = await transfersFrom(accountId)
+  expect(transfers).toHaveLength(3)
+  // Una clave de idempotencia (trabajo del outbox) distinta por pago
+  expect(new Set(transfers.map((t) => t.idempotencyKey)).size).toBe(3)
+}, 60_000)
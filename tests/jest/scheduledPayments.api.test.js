@@ -1,41 +1,6 @@
-import { startBackendInProcess, waitForHealthy, sleep } from "./helpers.js"
+import { BASE, useBackend } from "./helpers.js"
 
-const BASE = "http://localhost:8000/v1/scheduled-payments"
-
-const target = process.env.JEST_TARGET || "inprocess"
-let backendProc = null
-
-beforeAll(async () => {
-  if (target === "inprocess") {
-    backendProc = startBackendInProcess({
-      MONGO_CONNECTION_STRING: "mongodb://localhost:27017",
-      MONGO_DATABASE_NAME: "scheduled_payments",
-      TRANSFER_SERVICE_URL: "http://localhost:8002/v1/transactions",
-      ACCOUNTS_SERVICE_URL: "http://localhost:8001/v1/account/{iban}",
-      SUBSCRIPTION_BASIC: "1",
-      SUBSCRIPTION_STUDENT: "10",
-      SUBSCRIPTION_PRO: "999999999",
-      LOG_LEVEL: "INFO",
-      LOG_FILE: "log.txt",
-      LOG_BACKUP_COUNT: "7",
-      NTP_SERVER: "pool.ntp.org",
-      NTP_REFRESH_SECONDS: "60",
-      NTP_TIMEOUT_SECONDS: "3",
-      SCHEDULER_INTERVAL_SECONDS: "60"
-    })
-
-    await waitForHealthy(`${BASE}/health`)
-  } else {
-    await waitForHealthy(`${BASE}/health`)
-  }
-}, 60_000)
-
-afterAll(async () => {
-  if (backendProc) {
-    backendProc.kill("SIGTERM")
-    await sleep(500)
-  }
-})
+useBackend()
 
 test("GET /health -> ok", async () => {
   const res = await fetch(`${BASE}/health`)
@@ -1,10 +1,34 @@
 const http = require("http")
 
+// Transferencias recibidas, para que los tests comprueben qué se envió y cuántas veces
+const transactions = []
+
+function readBody(req) {
+  return new Promise((resolve) => {
+    let data = ""
+    req.on("data", (chunk) => (data += chunk))
+    req.on("end", () => resolve(data))
+  })
+}
+
 const server = http.createServer(async (req, res) => {
-  if (req.method === "POST" && req.url === "/v1/transactions") {
+  const url = new URL(req.url, "http://localhost")
+
+  if (req.method === "POST" && url.pathname === "/v1/transactions") {
+    let body = {}
+    try { body = JSON.parse(await readBody(req)) } catch {}
+    transactions.push({ ...body, idempotencyKey: req.headers["idempotency-key"] || null })
     res.writeHead(201, { "Content-Type": "application/json" })
     return res.end(JSON.stringify({ status: "ok" }))
   }
+
+  if (req.method === "GET" && url.pathname === "/v1/transactions") {
+    const sender = url.searchParams.get("sender")
+    const found = sender ? transactions.filter((t) => t.sender === sender) : transactions
+    res.writeHead(200, { "Content-Type": "application/json" })
+    return res.end(JSON.stringify(found))
+  }
+
   res.writeHead(404, { "Content-Type": "application/json" })
   res.end(JSON.stringify({ error: "not found" }))
 })
@@ -0,0 +1,127 @@
+import asyncio
+import types
+import unittest
+from unittest import mock
+
+from scheduled_payments.core import cache as cache_module
+from scheduled_payments.core.cache import AsyncTTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class AsyncTTLCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Solo se sustituye el reloj del módulo: el bucle asyncio sigue con el real
+        self.clock = FakeClock()
+        patcher = mock.patch.object(cache_module, "time", types.SimpleNamespace(monotonic=self.clock.monotonic))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def loader(value, calls):
+        async def load():
+            calls.append(value)
+            return value
+        return load
+
+    async def test_hit_within_ttl_does_not_reload(self):
+        cache, calls = AsyncTTLCache(10, ttl_seconds=60), []
+        self.assertEqual(await cache.get_or_load("a", self.loader("pro", calls)), "pro")
+        self.clock.now += 59
+        self.assertEqual(await cache.get_or_load("a", self.loader("basico", calls)), "pro")
+        self.assertEqual(calls, ["pro"])
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    async def test_expired_entry_is_reloaded(self):
+        cache, calls = AsyncTTLCache(10, ttl_seconds=60), []
+        await cache.get_or_load("a", self.loader("pro", calls))
+        self.clock.now += 60
+        self.assertIsNone(cache.peek("a"))
+        self.assertEqual(await cache.get_or_load("a", self.loader("basico", calls)), "basico")
+        self.assertEqual(calls, ["pro", "basico"])
+
+    async def test_lru_evicts_least_recently_used(self):
+        cache, calls = AsyncTTLCache(2, ttl_seconds=60), []
+        await cache.get_or_load("a", self.loader("A", calls))
+        await cache.get_or_load("b", self.loader("B", calls))
+        await cache.get_or_load("a", self.loader("A", calls))  # "a" pasa a ser la más reciente
+        await cache.get_or_load("c", self.loader("C", calls))
+
+        self.assertEqual(cache.peek("a"), "A")
+        self.assertIsNone(cache.peek("b"))
+        self.assertEqual(cache.peek("c"), "C")
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    async def test_concurrent_misses_share_one_load(self):
+        cache, calls = AsyncTTLCache(10, ttl_seconds=60), []
+        release = asyncio.Event()
+
+        async def slow():
+            calls.append("load")
+            await release.wait()
+            return "pro"
+
+        waiters = [asyncio.ensure_future(cache.get_or_load("a", slow)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+
+        self.assertEqual(await asyncio.gather(*waiters), ["pro"] * 5)
+        self.assertEqual(calls, ["load"])
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["coalesced"], 4)
+
+    async def test_cancelled_waiter_does_not_cancel_shared_load(self):
+        cache = AsyncTTLCache(10, ttl_seconds=60)
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "pro"
+
+        first = asyncio.ensure_future(cache.get_or_load("a", slow))
+        second = asyncio.ensure_future(cache.get_or_load("a", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+
+        self.assertEqual(await second, "pro")
+        self.assertEqual(cache.peek("a"), "pro")
+
+    async def test_negative_results_are_cached_for_their_own_ttl(self):
+        cache, calls = AsyncTTLCache(10, ttl_seconds=60, negative_ttl_seconds=5), []
+
+        async def missing():
+            calls.append("load")
+            raise LookupError("no existe")
+
+        for _ in range(2):
+            with self.assertRaises(LookupError):
+                await cache.get_or_load("a", missing, negative=(LookupError,))
+        self.assertEqual(calls, ["load"])
+
+        self.clock.now += 5
+        with self.assertRaises(LookupError):
+            await cache.get_or_load("a", missing, negative=(LookupError,))
+        self.assertEqual(calls, ["load", "load"])
+
+    async def test_other_errors_are_not_cached(self):
+        cache, calls = AsyncTTLCache(10, ttl_seconds=60, negative_ttl_seconds=5), []
+
+        async def failing():
+            calls.append("load")
+            raise ConnectionError("caído")
+
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                await cache.get_or_load("a", failing, negative=(LookupError,))
+        self.assertEqual(calls, ["load", "load"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import random
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from scheduled_payments.core.compiled_schedule import Instant, compile_schedule, from_us, to_us
+
+DAY_NAMES = ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY"]
+
+
+# Referencia: evaluación original sobre datetimes (ScheduledPaymentRepository._should_execute
+# y _next_execution antes de compilar las planificaciones).
+
+def _aware(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def reference_should_execute(sched, last: datetime | None, now: datetime) -> bool:
+    now = _aware(now)
+    today = now.date()
+
+    if sched.frequency == "ONCE":
+        if last is not None:
+            return False
+        return _aware(sched.executionDate) <= now
+
+    start, end = _aware(sched.startDate), _aware(sched.endDate)
+    if now < start or now > end:
+        return False
+    if last and _aware(last).date() == today:
+        return False
+
+    if sched.frequency == "MONTHLY":
+        return now.day == sched.dayOfMonth
+    return DAY_NAMES[now.weekday()] in [d.upper() for d in sched.daysOfWeek]
+
+
+def reference_next_execution(sched, last: datetime | None, now: datetime) -> datetime | None:
+    now = _aware(now)
+    last_exec = _aware(last) if last else None
+
+    if sched.frequency == "ONCE":
+        if last is not None:
+            return None
+        exec_dt = _aware(sched.executionDate)
+        return exec_dt if exec_dt >= now else None
+
+    start, end = _aware(sched.startDate), _aware(sched.endDate)
+
+    if sched.frequency == "MONTHLY":
+        base = start if now < start else now
+        for month_jump in range(0, 3):
+            year, month = base.year, base.month + month_jump
+            while month > 12:
+                month -= 12
+                year += 1
+            try:
+                candidate = datetime(year, month, sched.dayOfMonth, tzinfo=timezone.utc)
+            except ValueError:
+                continue
+            if candidate < start or candidate > end or candidate < now:
+                continue
+            if last_exec and last_exec.date() == candidate.date():
+                continue
+            return candidate
+        return None
+
+    if now > end:
+        return None
+    base = max(now, start)
+    days = [d.upper() for d in sched.daysOfWeek]
+    if not days:
+        return None
+    for i in range(0, 14):
+        candidate = (base + timedelta(days=i)).replace(hour=0, minute=0, second=0, microsecond=0)
+        if candidate > end:
+            break
+        if DAY_NAMES[candidate.weekday()] not in days:
+            continue
+        if candidate < now:
+            continue
+        if last_exec and last_exec.date() == candidate.date():
+            continue
+        return candidate
+    return None
+
+
+class CompiledScheduleEquivalenceTest(unittest.TestCase):
+    CASES = 3000
+    ORIGIN = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def setUp(self):
+        self.rng = random.Random(20240101)
+
+    def random_instant(self, span_days: int = 120) -> datetime:
+        # Una parte cae justo a medianoche, donde están los bordes de día
+        day = self.ORIGIN + timedelta(days=self.rng.randrange(span_days))
+        if self.rng.random() < 0.2:
+            return day
+        return day + timedelta(seconds=self.rng.randrange(86_400), microseconds=self.rng.randrange(1_000_000))
+
+    def random_schedule(self) -> SimpleNamespace:
+        frequency = self.rng.choice(["ONCE", "WEEKLY", "MONTHLY"])
+        if frequency == "ONCE":
+            return SimpleNamespace(frequency="ONCE", executionDate=self.random_instant())
+        start = self.random_instant()
+        end = start + timedelta(days=self.rng.randrange(0, 120), seconds=self.rng.randrange(86_400))
+        if self.rng.random() < 0.1:
+            # Mongo devuelve datetimes naive en UTC
+            start, end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+        if frequency == "MONTHLY":
+            return SimpleNamespace(frequency="MONTHLY", startDate=start, endDate=end,
+                                   dayOfMonth=self.rng.choice([1, 15, 28, 29, 30, 31]))
+        days = self.rng.sample(DAY_NAMES, self.rng.randrange(0, 4))
+        return SimpleNamespace(frequency="WEEKLY", startDate=start, endDate=end,
+                               daysOfWeek=[d.lower() if self.rng.random() < 0.2 else d for d in days])
+
+    def random_case(self):
+        sched = self.random_schedule()
+        now = self.random_instant()
+        if self.rng.random() < 0.2:
+            # Justo en los bordes de la planificación
+            bounds = [sched.executionDate] if sched.frequency == "ONCE" else [sched.startDate, sched.endDate]
+            now = _aware(self.rng.choice(bounds))
+        last = None
+        if self.rng.random() < 0.5:
+            last = now - timedelta(seconds=self.rng.randrange(3 * 86_400))
+        elif self.rng.random() < 0.3:
+            # Recién ejecutado: esa ocurrencia ya no cuenta
+            last = now
+        return sched, last, now
+
+    def test_is_due_matches_reference(self):
+        for _ in range(self.CASES):
+            sched, last, now = self.random_case()
+            compiled = compile_schedule(sched)
+            actual = compiled.is_due(Instant(now), to_us(last) if last else None)
+            self.assertEqual(actual, reference_should_execute(sched, last, now), (sched, last, now))
+
+    def test_next_upcoming_matches_reference(self):
+        for _ in range(self.CASES):
+            sched, last, now = self.random_case()
+            compiled = compile_schedule(sched)
+            next_us = compiled.next_upcoming(to_us(now), to_us(last) if last else None)
+            actual = from_us(next_us) if next_us is not None else None
+            self.assertEqual(actual, reference_next_execution(sched, last, now), (sched, last, now))
+
+    def test_next_due_is_first_due_day(self):
+        for _ in range(self.CASES):
+            sched, last, now = self.random_case()
+            compiled = compile_schedule(sched)
+            due_us = compiled.next_due(to_us(now), to_us(last) if last else None)
+            if sched.frequency == "ONCE":
+                expected = None if last else to_us(_aware(sched.executionDate))
+                self.assertEqual(due_us, expected, (sched, last, now))
+                continue
+
+            # Ningún día entre `now` y la ocurrencia devuelta está pendiente
+            limit = from_us(due_us) if due_us is not None else _aware(sched.endDate)
+            day = _aware(now).replace(hour=0, minute=0, second=0, microsecond=0)
+            while day < limit.replace(hour=0, minute=0, second=0, microsecond=0):
+                probe = max(day, _aware(now), _aware(sched.startDate))
+                if probe.date() == day.date():
+                    self.assertFalse(reference_should_execute(sched, last, probe), (sched, last, now, probe))
+                day += timedelta(days=1)
+
+            if due_us is not None:
+                self.assertTrue(reference_should_execute(sched, last, from_us(due_us)), (sched, last, now))
+                self.assertTrue(compiled.is_occurrence(due_us), (sched, last, now))
+
+
+class CompiledScheduleTest(unittest.TestCase):
+    def test_same_schedule_is_compiled_once(self):
+        start, end = datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 6, 1, tzinfo=timezone.utc)
+        a = SimpleNamespace(frequency="MONTHLY", startDate=start, endDate=end, dayOfMonth=5)
+        b = SimpleNamespace(frequency="MONTHLY", startDate=start, endDate=end, dayOfMonth=5)
+        self.assertIs(compile_schedule(a), compile_schedule(b))
+
+    def test_monthly_skips_months_without_that_day(self):
+        sched = SimpleNamespace(frequency="MONTHLY", startDate=datetime(2024, 1, 1, tzinfo=timezone.utc),
+                                endDate=datetime(2024, 12, 31, tzinfo=timezone.utc), dayOfMonth=31)
+        due = compile_schedule(sched).next_due(to_us(datetime(2024, 2, 1, tzinfo=timezone.utc)), None)
+        self.assertEqual(from_us(due), datetime(2024, 3, 31, tzinfo=timezone.utc))
+
+
+if __name__ == "__main__":
+    unittest.main()
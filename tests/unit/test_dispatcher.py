@@ -0,0 +1,88 @@
+import asyncio
+import unittest
+
+from scheduled_payments.core import dispatcher as dispatcher_module
+from scheduled_payments.core.dispatcher import BoundedDispatcher
+from scheduled_payments.core.fair_queue import FairDispatchQueue
+
+
+def filled_queue(items: list[tuple[str, object]]) -> FairDispatchQueue:
+    queue = FairDispatchQueue()
+    for key, item in items:
+        queue.put(key, item)
+    queue.close()
+    return queue
+
+
+class BoundedDispatcherTest(unittest.IsolatedAsyncioTestCase):
+    async def test_counts_each_outcome(self):
+        async def handler(item):
+            if item == "error":
+                raise RuntimeError("fallo")
+            if item == "slow":
+                await asyncio.sleep(1)
+            return item == "ok"
+
+        queue = filled_queue([("a", "ok"), ("b", "ok"), ("c", "rejected"), ("d", "error"), ("e", "slow")])
+        with self.assertLogs(dispatcher_module.logger, "ERROR") as logs:
+            stats = await BoundedDispatcher(4, timeout_seconds=0.05).run_queue(queue, handler)
+
+        self.assertEqual((stats.total, stats.succeeded, stats.failed, stats.timed_out), (5, 2, 2, 1))
+        self.assertEqual(len(logs.records), 2)
+
+    async def test_never_exceeds_max_concurrency(self):
+        running, peak = 0, 0
+
+        async def handler(item):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+            return True
+
+        queue = filled_queue([(f"k{i}", i) for i in range(40)])
+        stats = await BoundedDispatcher(5, timeout_seconds=1).run_queue(queue, handler)
+
+        self.assertEqual(stats.succeeded, 40)
+        self.assertEqual(peak, 5)
+
+    async def test_items_of_a_key_run_one_at_a_time_in_order(self):
+        seen: dict[str, list] = {}
+        running: set[str] = set()
+
+        async def handler(item):
+            key, n = item
+            self.assertNotIn(key, running)
+            running.add(key)
+            await asyncio.sleep(0.001)
+            seen.setdefault(key, []).append(n)
+            running.discard(key)
+            return True
+
+        queue = filled_queue([(key, (key, n)) for n in range(5) for key in ("a", "b", "c")])
+        await BoundedDispatcher(4, timeout_seconds=1).run_queue(queue, handler)
+
+        self.assertEqual(seen, {key: [0, 1, 2, 3, 4] for key in ("a", "b", "c")})
+
+    async def test_consumes_items_added_while_running(self):
+        queue = FairDispatchQueue()
+        handled = []
+
+        async def handler(item):
+            handled.append(item)
+            return True
+
+        async def produce():
+            for i in range(10):
+                queue.put(f"k{i % 3}", i)
+                await asyncio.sleep(0)
+            queue.close()
+
+        stats, _ = await asyncio.gather(BoundedDispatcher(2, timeout_seconds=1).run_queue(queue, handler), produce())
+        self.assertEqual(stats.total, 10)
+        self.assertEqual(sorted(handled), list(range(10)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+from collections import Counter
+
+from scheduled_payments.core.fair_queue import FairDispatchQueue
+
+
+class FairDispatchQueueTest(unittest.IsolatedAsyncioTestCase):
+    async def drain(self, queue: FairDispatchQueue, count: int) -> list:
+        """Saca `count` elementos completando cada uno antes de pedir el siguiente."""
+        served = []
+        for _ in range(count):
+            key, item = await queue.get()
+            served.append((key, item))
+            queue.task_done(key)
+        return served
+
+    async def test_items_of_a_key_keep_their_order(self):
+        queue = FairDispatchQueue()
+        for i in range(5):
+            queue.put("a", i)
+
+        self.assertEqual([item for _, item in await self.drain(queue, 5)], [0, 1, 2, 3, 4])
+
+    async def test_large_key_does_not_delay_the_others(self):
+        queue = FairDispatchQueue()
+        for i in range(100):
+            queue.put("big", i)
+        for i in range(3):
+            queue.put("small", i)
+
+        keys = [key for key, _ in await self.drain(queue, 6)]
+        self.assertEqual(Counter(keys), {"big": 3, "small": 3})
+
+    async def test_weights_share_service_proportionally(self):
+        queue = FairDispatchQueue()
+        for i in range(30):
+            queue.put("pro", i, weight=2.0)
+            queue.put("basic", i, weight=1.0)
+
+        keys = Counter(key for key, _ in await self.drain(queue, 30))
+        self.assertEqual(keys, {"pro": 20, "basic": 10})
+
+    async def test_idle_key_does_not_accumulate_credit(self):
+        queue = FairDispatchQueue()
+        for i in range(10):
+            queue.put("a", i)
+        await self.drain(queue, 6)
+
+        for i in range(10):
+            queue.put("late", i)
+        keys = [key for key, _ in await self.drain(queue, 4)]
+        self.assertEqual(Counter(keys), {"a": 2, "late": 2})
+
+    async def test_in_flight_cap_per_key(self):
+        queue = FairDispatchQueue(max_in_flight_per_key=2)
+        for i in range(3):
+            queue.put("a", i)
+        queue.put("b", 0)
+
+        first = [await queue.get() for _ in range(3)]
+        self.assertEqual(Counter(key for key, _ in first), {"a": 2, "b": 1})
+
+        # El tercero de "a" espera a que termine uno de los dos en curso
+        pending = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0)
+        self.assertFalse(pending.done())
+
+        queue.task_done("a")
+        self.assertEqual(await pending, ("a", 2))
+
+    async def test_get_waits_for_put_and_ends_after_close(self):
+        queue = FairDispatchQueue()
+        pending = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0)
+        self.assertFalse(pending.done())
+
+        queue.put("a", 0)
+        self.assertEqual(await pending, ("a", 0))
+        queue.task_done("a")
+
+        queue.close()
+        self.assertIsNone(await queue.get())
+
+    async def test_close_keeps_serving_what_is_queued(self):
+        queue = FairDispatchQueue()
+        queue.put("a", 0)
+        queue.put("a", 1)
+        queue.close()
+
+        self.assertEqual(await self.drain(queue, 2), [("a", 0), ("a", 1)])
+        self.assertIsNone(await queue.get())
+
+    async def test_wait_below_blocks_until_consumers_catch_up(self):
+        queue = FairDispatchQueue()
+        for i in range(3):
+            queue.put(str(i), i)
+
+        waiting = asyncio.ensure_future(queue.wait_below(2))
+        await asyncio.sleep(0)
+        self.assertFalse(waiting.done())
+
+        await queue.get()
+        await asyncio.sleep(0)
+        self.assertFalse(waiting.done())
+        await queue.get()
+        await asyncio.wait_for(waiting, 1)
+        self.assertEqual(len(queue), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from scheduled_payments.core import ntp_clock as ntp_module
+from scheduled_payments.core.ntp_clock import NtpClock, NtpSample, _PACKET, _from_ntp, _to_ntp
+
+
+class FakeNtpServer(asyncio.DatagramProtocol):
+    """Servidor SNTP local que responde con la hora del sistema desplazada `offset` segundos."""
+
+    def __init__(self, offset: float = 0.0, stratum: int = 2, echo_origin: bool = True):
+        self.offset = offset
+        self.stratum = stratum
+        self.echo_origin = echo_origin
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        words = _PACKET.unpack_from(data)[4:]
+        origin = (words[9], words[10]) if self.echo_origin else (0, 0)
+        received = _to_ntp(time.time() + self.offset)
+        sent = _to_ntp(time.time() + self.offset)
+        reply = _PACKET.pack(0x24, self.stratum, 0, 0, *([0] * 5), *origin, *received, *sent)
+        self.transport.sendto(reply, addr)
+
+
+class NtpClockTest(unittest.IsolatedAsyncioTestCase):
+    async def start_server(self, **kwargs) -> int:
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: FakeNtpServer(**kwargs), local_addr=("127.0.0.1", 0))
+        self.addCleanup(transport.close)
+        return transport.get_extra_info("sockname")[1]
+
+    def clock(self, servers: list[str]) -> NtpClock:
+        with self.assertLogs(ntp_module.logger, "INFO"):
+            return NtpClock(servers, timeout=1)
+
+    def test_ntp_timestamps_round_trip(self):
+        epoch = 1_700_000_000.25
+        self.assertAlmostEqual(_from_ntp(*_to_ntp(epoch)), epoch, places=6)
+
+    def test_starts_from_system_clock_without_network(self):
+        clock = self.clock(["ntp.invalid"])
+        self.assertFalse(clock.synced)
+        self.assertLess(abs(clock.offset_seconds()), 0.01)
+
+    async def test_sync_uses_median_of_answering_servers(self):
+        clock = self.clock(["a", "b", "c", "d"])
+        system_base = time.time() - time.monotonic()
+        answers = {
+            "a": NtpSample("a", system_base + 1.0, 0.01, 2),
+            "b": NtpSample("b", system_base + 2.0, 0.01, 2),
+            "c": NtpSample("c", system_base + 30.0, 0.01, 2),
+            "d": OSError("sin respuesta"),
+        }
+
+        async def query(server):
+            answer = answers[server]
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        with mock.patch.object(clock, "_query", query), self.assertLogs(ntp_module.logger, "INFO"):
+            samples = await clock.sync_once()
+
+        self.assertEqual(len(samples), 3)
+        self.assertTrue(clock.synced)
+        self.assertAlmostEqual(clock.offset_seconds(), 2.0, delta=0.05)
+
+    async def test_sync_fails_when_no_server_answers(self):
+        clock = self.clock(["a", "b"])
+
+        async def query(server):
+            raise OSError("sin respuesta")
+
+        with mock.patch.object(clock, "_query", query), self.assertRaises(RuntimeError):
+            await clock.sync_once()
+        self.assertFalse(clock.synced)
+        self.assertLess(abs(clock.offset_seconds()), 0.01)
+
+    async def test_query_measures_offset_against_sntp_server(self):
+        port = await self.start_server(offset=100.0)
+        clock = self.clock(["127.0.0.1"])
+
+        with mock.patch.object(ntp_module, "NTP_PORT", port):
+            sample = await clock._query("127.0.0.1")
+
+        self.assertAlmostEqual(sample.base - (time.time() - time.monotonic()), 100.0, delta=0.05)
+        self.assertGreaterEqual(sample.delay, 0)
+        self.assertEqual(sample.stratum, 2)
+
+    async def test_query_rejects_reply_to_another_request(self):
+        port = await self.start_server(echo_origin=False)
+        clock = self.clock(["127.0.0.1"])
+
+        with mock.patch.object(ntp_module, "NTP_PORT", port), self.assertRaises(ValueError):
+            await clock._query("127.0.0.1")
+
+    async def test_query_rejects_unsynchronized_server(self):
+        port = await self.start_server(stratum=0)
+        clock = self.clock(["127.0.0.1"])
+
+        with mock.patch.object(ntp_module, "NTP_PORT", port), self.assertRaises(ValueError):
+            await clock._query("127.0.0.1")
+
+
+if __name__ == "__main__":
+    unittest.main()
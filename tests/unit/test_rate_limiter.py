@@ -0,0 +1,162 @@
+import asyncio
+import types
+import unittest
+from unittest import mock
+
+from scheduled_payments.core import rate_limiter as rate_limiter_module
+from scheduled_payments.core.rate_limiter import (
+    InMemoryRateLimitBackend,
+    RateLimitBackend,
+    SharedRateLimiter,
+    SlidingWindowRateLimiter,
+)
+
+
+class SlidingWindowRateLimiterTest(unittest.IsolatedAsyncioTestCase):
+    WINDOW = 60
+
+    def test_allows_up_to_limit_within_a_window(self):
+        limiter = SlidingWindowRateLimiter(self.WINDOW)
+        results = [limiter.hit("a", 3, now=600.0) for _ in range(4)]
+
+        self.assertEqual([r.allowed for r in results], [True, True, True, False])
+        self.assertEqual([r.remaining for r in results], [2, 1, 0, 0])
+
+    def test_keys_are_independent(self):
+        limiter = SlidingWindowRateLimiter(self.WINDOW)
+        self.assertTrue(limiter.hit("a", 1, now=600.0).allowed)
+        self.assertFalse(limiter.hit("a", 1, now=600.0).allowed)
+        self.assertTrue(limiter.hit("b", 1, now=600.0).allowed)
+
+    def test_previous_window_weighs_by_overlap(self):
+        limiter = SlidingWindowRateLimiter(self.WINDOW)
+        for _ in range(10):
+            self.assertTrue(limiter.hit("a", 10, now=600.0).allowed)
+
+        # A un cuarto de la ventana siguiente la anterior pesa 7.5: caben 2 más
+        allowed = [limiter.hit("a", 10, now=675.0).allowed for _ in range(3)]
+        self.assertEqual(allowed, [True, True, False])
+
+    def test_gap_of_a_whole_window_resets_the_count(self):
+        limiter = SlidingWindowRateLimiter(self.WINDOW)
+        for _ in range(10):
+            limiter.hit("a", 10, now=600.0)
+
+        allowed = [limiter.hit("a", 10, now=730.0).allowed for _ in range(10)]
+        self.assertTrue(all(allowed))
+
+    def test_retry_after_points_to_when_a_request_fits(self):
+        limiter = SlidingWindowRateLimiter(self.WINDOW)
+        for _ in range(10):
+            limiter.hit("a", 10, now=600.0)
+        limiter.hit("a", 10, now=660.0)
+
+        rejected = limiter.hit("a", 10, now=660.0)
+        self.assertFalse(rejected.allowed)
+        self.assertTrue(limiter.hit("a", 10, now=660.0 + rejected.reset_in_seconds).allowed)
+
+    def test_max_keys_evicts_oldest(self):
+        limiter = SlidingWindowRateLimiter(self.WINDOW, max_keys=3)
+        for key in ("a", "b", "c", "d"):
+            limiter.hit(key, 1, now=600.0)
+
+        self.assertEqual(len(limiter), 3)
+        self.assertEqual(limiter.evictions, 1)
+        # "a" se expulsó: vuelve a empezar con el contador a cero
+        self.assertTrue(limiter.hit("a", 1, now=600.0).allowed)
+
+    async def test_cleanup_drops_idle_keys(self):
+        limiter = SlidingWindowRateLimiter(self.WINDOW)
+        limiter.hit("idle", 1, now=600.0)
+        limiter.hit("active", 1, now=700.0)
+
+        self.assertEqual(await limiter.cleanup(now=730.0), 1)
+        self.assertEqual(len(limiter), 1)
+
+    async def test_empty_key_is_limited_as_anonymous(self):
+        limiter = SlidingWindowRateLimiter(self.WINDOW)
+        self.assertTrue((await limiter.allow("", 1)).allowed)
+        self.assertFalse((await limiter.allow("", 1)).allowed)
+
+
+class FailingBackend(RateLimitBackend):
+    def __init__(self):
+        self.calls = 0
+        self.down = True
+
+    async def increment(self, key, window_start, amount, ttl_seconds):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("mongo caído")
+        return amount
+
+
+class SharedRateLimiterTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Reloj del módulo fijo a mitad de ventana; el bucle asyncio sigue con el real
+        self.now = 1_000_020.0
+        clock = types.SimpleNamespace(time=lambda: self.now, monotonic=lambda: self.now)
+        patcher = mock.patch.object(rate_limiter_module, "time", clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_backend_without_increment_cannot_be_built(self):
+        class Incomplete(RateLimitBackend):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    async def test_global_limit_holds_across_processes(self):
+        backend = InMemoryRateLimitBackend()
+        replicas = [SharedRateLimiter(backend, 60, lease_size=5) for _ in range(3)]
+
+        allowed = 0
+        for _ in range(20):
+            for limiter in replicas:
+                allowed += (await limiter.allow("a", 30)).allowed
+        self.assertEqual(allowed, 30)
+
+    async def test_quota_is_reserved_in_leases(self):
+        backend = InMemoryRateLimitBackend()
+        limiter = SharedRateLimiter(backend, 60, lease_size=10)
+
+        for _ in range(10):
+            self.assertTrue((await limiter.allow("a", 100)).allowed)
+        self.assertEqual(backend.calls, 1)
+
+    async def test_concurrent_requests_share_one_reservation(self):
+        backend = InMemoryRateLimitBackend()
+        limiter = SharedRateLimiter(backend, 60, lease_size=10)
+
+        results = await asyncio.gather(*(limiter.allow("a", 100) for _ in range(10)))
+        self.assertTrue(all(r.allowed for r in results))
+        self.assertEqual(backend.calls, 1)
+
+    async def test_backend_failure_falls_back_to_local_limits(self):
+        backend = FailingBackend()
+        limiter = SharedRateLimiter(backend, 60, backend_retry_seconds=5)
+
+        with self.assertLogs(rate_limiter_module.logger, "WARNING"):
+            allowed = [(await limiter.allow("a", 3)).allowed for _ in range(4)]
+        self.assertEqual(allowed, [True, True, True, False])
+        self.assertEqual(limiter.backend_errors, 1)
+
+    async def test_backend_is_retried_only_after_cool_down(self):
+        backend = FailingBackend()
+        limiter = SharedRateLimiter(backend, 60, backend_retry_seconds=5)
+
+        with self.assertLogs(rate_limiter_module.logger, "WARNING"):
+            await limiter.allow("a", 100)
+            await limiter.allow("b", 100)
+        self.assertEqual(backend.calls, 1)
+
+        self.now += 5
+        backend.down = False
+        self.assertTrue((await limiter.allow("c", 100)).allowed)
+        self.assertEqual(backend.calls, 2)
+        self.assertFalse(limiter._backend_down)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+import asyncio
+import types
+import unittest
+from unittest import mock
+
+from scheduled_payments.core import resilience as resilience_module
+from scheduled_payments.core.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    DependencyGuard,
+    DependencyUnavailableError,
+)
+
+
+class FakeClockMixin:
+    def setUp(self):
+        # Solo se sustituye el reloj del módulo: el bucle asyncio sigue con el real
+        self.now = 1000.0
+        clock = types.SimpleNamespace(monotonic=lambda: self.now, perf_counter=lambda: self.now)
+        patcher = mock.patch.object(resilience_module, "time", clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class CircuitBreakerTest(FakeClockMixin, unittest.TestCase):
+    def open_breaker(self, **kwargs) -> CircuitBreaker:
+        breaker = CircuitBreaker(failure_threshold=3, open_seconds=10, **kwargs)
+        for _ in range(3):
+            self.assertTrue(breaker.try_acquire())
+            breaker.record_failure()
+        return breaker
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, open_seconds=10)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.opened, 1)
+        self.assertFalse(breaker.try_acquire())
+
+    def test_half_open_after_open_seconds(self):
+        breaker = self.open_breaker()
+        self.now += 6
+        self.assertEqual(breaker.state, OPEN)
+        self.assertAlmostEqual(breaker.retry_after(), 4)
+
+        self.now += 4
+        self.assertEqual(breaker.state, HALF_OPEN)
+
+    def test_half_open_allows_limited_probes(self):
+        breaker = self.open_breaker(half_open_probes=2)
+        self.now += 10
+
+        self.assertTrue(breaker.try_acquire())
+        self.assertTrue(breaker.try_acquire())
+        self.assertFalse(breaker.try_acquire())
+
+        breaker.release()
+        self.assertTrue(breaker.try_acquire())
+
+    def test_successful_probes_close_the_breaker(self):
+        breaker = self.open_breaker(half_open_probes=2)
+        self.now += 10
+
+        breaker.try_acquire()
+        breaker.try_acquire()
+        breaker.record_success()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.try_acquire())
+
+    def test_failed_probe_reopens_the_breaker(self):
+        breaker = self.open_breaker(half_open_probes=2)
+        self.now += 10
+
+        breaker.try_acquire()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.opened, 2)
+        self.assertAlmostEqual(breaker.retry_after(), 10)
+
+
+class AdaptiveConcurrencyLimiterTest(FakeClockMixin, unittest.IsolatedAsyncioTestCase):
+    def limiter(self, initial: int = 4) -> AdaptiveConcurrencyLimiter:
+        return AdaptiveConcurrencyLimiter(initial, min_limit=2, max_limit=5, latency_target_seconds=1.0, backoff=0.5)
+
+    async def test_grows_additively_only_when_limit_is_in_use(self):
+        limiter = self.limiter(initial=2)
+
+        await limiter.acquire()
+        limiter.release(0.1, failed=False)
+        self.assertEqual(limiter._limit, 2)
+
+        await limiter.acquire()
+        await limiter.acquire()
+        limiter.release(0.1, failed=False)
+        self.assertEqual(limiter._limit, 2.5)
+
+    async def test_never_grows_above_max_limit(self):
+        limiter = self.limiter(initial=5)
+        for _ in range(20):
+            for _ in range(limiter.limit):
+                await limiter.acquire()
+            for _ in range(limiter.in_flight):
+                limiter.release(0.1, failed=False)
+        self.assertEqual(limiter.limit, 5)
+
+    async def test_shrinks_multiplicatively_on_failure_or_slow_response(self):
+        limiter = self.limiter(initial=4)
+
+        await limiter.acquire()
+        limiter.release(0.1, failed=True)
+        self.assertEqual(limiter._limit, 2)
+
+        self.now += 1
+        limiter._limit = 4
+        await limiter.acquire()
+        limiter.release(2.0, failed=False)
+        self.assertEqual(limiter._limit, 2)
+
+    async def test_one_decrease_per_latency_target_and_floor_at_min_limit(self):
+        limiter = self.limiter(initial=5)
+        for _ in range(3):
+            await limiter.acquire()
+        for _ in range(3):
+            limiter.release(0.1, failed=True)
+        self.assertEqual(limiter._limit, 2.5)
+
+        self.now += 1
+        await limiter.acquire()
+        limiter.release(0.1, failed=True)
+        self.assertEqual(limiter.limit, 2)
+
+    async def test_call_not_made_does_not_adjust_limit(self):
+        limiter = self.limiter(initial=4)
+        await limiter.acquire()
+        limiter.release(None, failed=True)
+        self.assertEqual(limiter._limit, 4)
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_waiter_receives_released_slot(self):
+        limiter = self.limiter(initial=2)
+        await limiter.acquire()
+        await limiter.acquire()
+
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        self.assertEqual(limiter.waiting, 1)
+
+        limiter.release(0.1, failed=False)
+        self.assertTrue(await waiter)
+        self.assertEqual(limiter.in_flight, 2)
+
+    async def test_acquire_gives_up_after_max_wait(self):
+        limiter = self.limiter(initial=2)
+        await limiter.acquire()
+        await limiter.acquire()
+
+        self.assertFalse(await limiter.acquire(max_wait=0))
+        self.assertFalse(await limiter.acquire(max_wait=0.01))
+        self.assertEqual(limiter.in_flight, 2)
+
+
+class DependencyGuardTest(FakeClockMixin, unittest.IsolatedAsyncioTestCase):
+    def guard(self) -> DependencyGuard:
+        return DependencyGuard(
+            "accounts",
+            CircuitBreaker(failure_threshold=2, open_seconds=10),
+            AdaptiveConcurrencyLimiter(1, min_limit=1, max_limit=4, latency_target_seconds=1.0),
+            max_wait_seconds=0,
+        )
+
+    async def test_failures_open_the_circuit_and_reject_without_calling(self):
+        guard, calls = self.guard(), []
+
+        async def failing():
+            calls.append(1)
+            raise ConnectionError("caído")
+
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                await guard.call(failing)
+
+        with self.assertRaises(DependencyUnavailableError) as rejected:
+            await guard.call(failing)
+        self.assertEqual(rejected.exception.reason, "circuit_open")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(guard.snapshot()["rejected"], {"circuit_open": 1, "concurrency": 0})
+
+    async def test_is_failure_counts_responses_as_failures(self):
+        guard = self.guard()
+
+        async def server_error():
+            return 503
+
+        for _ in range(2):
+            self.assertEqual(await guard.call(server_error, is_failure=lambda status: status >= 500), 503)
+        self.assertEqual(guard.breaker.state, OPEN)
+
+    async def test_rejects_when_no_concurrency_slot_is_free(self):
+        guard = self.guard()
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return 200
+
+        first = asyncio.ensure_future(guard.call(slow))
+        await asyncio.sleep(0)
+        with self.assertRaises(DependencyUnavailableError) as rejected:
+            await guard.call(slow)
+        self.assertEqual(rejected.exception.reason, "concurrency")
+
+        release.set()
+        self.assertEqual(await first, 200)
+        self.assertEqual(guard.limiter.in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()